@@ -0,0 +1,162 @@
+"""
+Модуль контроля нагрузки (admission control).
+
+Запросы делятся на классы:
+  - interactive: шаги мастера (GET/POST /stepN) - не ограничиваются;
+  - poll: опрос /api/* со страницы step6 - token bucket на клиента
+    и общий лимит одновременно обрабатываемых запросов;
+  - download: /download/* - token bucket на клиента;
+  - expensive: сборка zip и сброс с бэкапом - дополнительно ограничены
+    количеством одновременных выполнений.
+
+Фоновые классы (poll, download) дополнительно делят общий бюджет запросов
+в секунду на весь сервер. При его исчерпании клиент сразу получает 429 с
+Retry-After, пропорциональным числу активных клиентов: 500 вкладок step6
+растягивают опрос так, чтобы суммарно укладываться в бюджет, и процессор
+остаётся свободным для шагов мастера.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+INTERACTIVE = 'interactive'
+POLL = 'poll'
+DOWNLOAD = 'download'
+
+# Классы, которые делят общий бюджет и лимит одновременных запросов (низкий приоритет)
+LOW_PRIORITY_CLASSES = (POLL, DOWNLOAD)
+
+# За какой период клиент считается активным при расчёте Retry-After, секунды
+ACTIVE_CLIENT_WINDOW = 10.0
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated_at')
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic() if now is None else now
+
+    def take(self, now=None):
+        """
+        Забирает один токен.
+
+        Returns:
+            float: 0, если токен получен, иначе через сколько секунд он появится
+        """
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class Rejected(Exception):
+    """Запрос отклонён, retry_after - рекомендуемая пауза в секундах"""
+
+    def __init__(self, retry_after, reason):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+    @property
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionController:
+    """
+    Решает, пропускать ли запрос.
+
+    Args:
+        limits: {класс: (rate в секунду, burst)} для token bucket на клиента
+        low_priority_rate: общий бюджет запросов poll/download в секунду на весь сервер
+        low_priority_slots: сколько запросов классов poll/download обрабатывается одновременно
+        expensive_slots: {имя ресурса: сколько одновременных выполнений}
+        max_clients: сколько клиентов помнить (самые давние вытесняются)
+    """
+
+    def __init__(self, limits, low_priority_rate=100, low_priority_slots=8, expensive_slots=None,
+                 max_clients=10000):
+        self.limits = dict(limits)
+        self.low_priority_rate = low_priority_rate
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._low_priority_bucket = TokenBucket(low_priority_rate, low_priority_rate)
+        self._active_clients = 0
+        self._active_counted_at = 0.0
+        self._low_priority = threading.BoundedSemaphore(low_priority_slots)
+        self._expensive = {name: threading.BoundedSemaphore(slots)
+                           for name, slots in (expensive_slots or {}).items()}
+
+    def _check_rate(self, client_id, request_class):
+        limit = self.limits.get(request_class)
+        if limit is None:
+            return
+        key = (client_id, request_class)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = TokenBucket(*limit)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+            retry_after = bucket.take()
+        if retry_after:
+            raise Rejected(retry_after, 'Слишком частые запросы')
+
+    def _overload_retry_after(self):
+        """
+        Пауза для клиента при исчерпании общего бюджета: за это время все активные
+        клиенты успевают сделать по запросу, не превышая low_priority_rate.
+        """
+        with self._lock:
+            now = time.monotonic()
+            # Пересчитываем не чаще раза в секунду - это проход по всем клиентам
+            if now - self._active_counted_at >= 1.0:
+                since = now - ACTIVE_CLIENT_WINDOW
+                self._active_clients = len({client_id for (client_id, request_class), bucket in self._buckets.items()
+                                            if request_class in LOW_PRIORITY_CLASSES and bucket.updated_at >= since})
+                self._active_counted_at = now
+            active = self._active_clients
+        return max(1.0, active / self.low_priority_rate)
+
+    def admit(self, client_id, request_class, expensive=None):
+        """
+        Пропускает запрос или бросает Rejected.
+
+        Returns:
+            list: захваченные семафоры - их нужно передать в release()
+        """
+        self._check_rate(client_id, request_class)
+
+        acquired = []
+        if request_class in LOW_PRIORITY_CLASSES:
+            with self._lock:
+                over_budget = self._low_priority_bucket.take() > 0
+            if over_budget or not self._low_priority.acquire(blocking=False):
+                raise Rejected(self._overload_retry_after(), 'Сервер занят, повторите позже')
+            acquired.append(self._low_priority)
+
+        if expensive is not None and expensive in self._expensive:
+            semaphore = self._expensive[expensive]
+            if not semaphore.acquire(blocking=False):
+                self.release(acquired)
+                raise Rejected(2, 'Операция уже выполняется, повторите позже')
+            acquired.append(semaphore)
+
+        return acquired
+
+    @staticmethod
+    def release(acquired):
+        for semaphore in reversed(acquired):
+            semaphore.release()
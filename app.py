@@ -1,29 +1,134 @@
-from flask import Flask, render_template, request, redirect, url_for, session, send_from_directory, Response, send_file
+from flask import Flask, render_template, request, redirect, url_for, session, send_from_directory, Response, send_file, g
 import json
 import os
-import zipfile
-from io import BytesIO
 from datetime import datetime
 from collections import OrderedDict
 from result_processer import process_results
+from extract_fields_description import load_fields_snapshot, read_snapshot_hash
+from field_search import FieldSearchIndex
+from wizard_state import (apply_patch, bump_structure, bump_version, get_structure, get_version, PatchError,
+                          STRUCTURE_KEY, VERSION_KEY, VersionConflict)
+from examples_import import import_examples
+from crawl_plan import build_crawl_plan, iter_page_urls, iter_batches, DEFAULT_CONCURRENCY, MAX_EXPORT_PAGES
+from server_session import FileSession, FileSessionInterface, SessionTooLarge
+from admission import AdmissionController, Rejected, INTERACTIVE, POLL, DOWNLOAD
+from workspaces import WorkspaceManager
+from segmented_log import SegmentedLog, parse_time
+from code_snapshots import CodeSnapshots
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-this-in-production'  # Важно для работы сессий
+# Данные мастера храним на сервере: при массовом импорте примеров они не помещаются в cookie.
+# Статике сессия не нужна - её файл для /content/ и /static/ не читается
+# Версии состояния мастера - счётчики: правки из параллельных запросов складываются (см. server_session)
+app.session_interface = FileSessionInterface('data/sessions', skip_paths=('/content/', app.static_url_path + '/'),
+                                             counter_keys=(VERSION_KEY, STRUCTURE_KEY))
 
 # Создаем папку data, если её нет
 os.makedirs('data', exist_ok=True) 
 
+# Контроль нагрузки: опрос /api/* и скачивания не должны вытеснять шаги мастера
+# (отключается через app.config['ADMISSION_ENABLED'] = False)
+app.config.setdefault('ADMISSION_ENABLED', True)
+admission = AdmissionController(
+    limits={
+        POLL: (5, 20),        # 5 запросов в секунду на клиента, всплеск до 20
+        DOWNLOAD: (1, 5),
+    },
+    low_priority_rate=100,    # на весь сервер
+    low_priority_slots=8,
+    expensive_slots={'zip': 2, 'reset_backup': 1},
+)
+
+# Рабочие папки сессий для артефактов генерации (квота - APSP_WORKSPACES_QUOTA_MB).
+# Индекс и фоновая очистка запускаются при первом обращении, а не при импорте
+WORKSPACES_DIR = 'content_files/workspaces'
+workspaces = WorkspaceManager(
+    WORKSPACES_DIR,
+    quota_bytes=int(os.environ.get('APSP_WORKSPACES_QUOTA_MB', '512')) * 1024 * 1024,
+    sweep_interval=60.0,
+)
+
+# Версии result_code.ts, отданные клиентам: по ним /api/result_code?since= строит патч
+code_snapshots = CodeSnapshots()
+
+# Сервис генерации парсеров (если задан APSP_GENERATOR_URL): лог и результаты
+# приходят из него напрямую, иначе step6 читает файлы из content_files/
+generation_jobs = None
+if os.environ.get('APSP_GENERATOR_URL'):
+    from generation_client import GenerationClient, GenerationJobs
+    generation_jobs = GenerationJobs(GenerationClient(os.environ['APSP_GENERATOR_URL']))
+
 # Путь к JSON файлу
 JSON_FILE = 'data/submissions.json'
 FIELDS_DESCRIPTIONS_FILE = 'fields_descriptions.json'
+# Бинарный снапшот реестра полей (собирается при деплое: python extract_fields_description.py --snapshot)
+FIELDS_SNAPSHOT_FILE = 'fields_descriptions.snapshot'
+FIELDS_SOURCE_FILE = 'add_files/Fields_static.ts'
+
+# Кеш описаний полей в памяти процесса: ключ - mtime файлов, из которых они загружены;
+# hash - хеш Fields_static.ts, по которому собран реестр
+_fields_cache = {'key': None, 'fields': {}, 'hash': None}
+# Индекс поиска полей для шага 1 (пересобирается при смене хеша Fields_static.ts)
+_field_index = None
+
+# Поля, которые не показываются на шаге 1 (вместо них - stock)
+STEP1_HIDDEN_FIELDS = ('InStock_trigger', 'OutOfStock_trigger')
+# Сколько полей шаг 1 показывает сразу, остальные подгружаются через /api/fields/search
+STEP1_PAGE_SIZE = 40
+# Обязательные поля шага 1 (всегда выбраны)
+STEP1_REQUIRED_FIELDS = ('name', 'link', 'price', 'stock', 'timestamp')
+
+
+def _file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
 
 def load_fields_descriptions():
-    """Загрузка описаний полей из JSON файла"""
-    if os.path.exists(FIELDS_DESCRIPTIONS_FILE):
-        with open(FIELDS_DESCRIPTIONS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data.get('fields', {})
-    return {}
+    """Загрузка описаний полей (снапшот -> JSON файл), с кешированием в памяти"""
+    cache_key = (
+        _file_mtime(FIELDS_SNAPSHOT_FILE),
+        _file_mtime(FIELDS_DESCRIPTIONS_FILE),
+        _file_mtime(FIELDS_SOURCE_FILE),
+    )
+    if _fields_cache['key'] == cache_key:
+        return _fields_cache['fields']
+
+    fields = None
+    source_hash = None
+    if cache_key[0] is not None:
+        fields = load_fields_snapshot(FIELDS_SNAPSHOT_FILE, FIELDS_SOURCE_FILE)
+        if fields is not None:
+            source_hash = read_snapshot_hash(FIELDS_SNAPSHOT_FILE)
+
+    if fields is None:
+        fields = {}
+        if cache_key[1] is not None:
+            with open(FIELDS_DESCRIPTIONS_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                fields = data.get('fields', {})
+                source_hash = data.get('hash')
+
+    _fields_cache['key'] = cache_key
+    _fields_cache['fields'] = fields
+    _fields_cache['hash'] = source_hash
+    return fields
+
+
+def get_field_index():
+    """Индекс поиска полей шага 1: строится один раз на хеш Fields_static.ts"""
+    global _field_index
+    fields = load_fields_descriptions()
+    # Без хеша (реестр без исходника) индекс привязан к самому объекту реестра
+    version = _fields_cache['hash'] or id(fields)
+    index = _field_index
+    if index is None or index.source_hash != version:
+        index = _field_index = FieldSearchIndex(
+            {k: v for k, v in fields.items() if k not in STEP1_HIDDEN_FIELDS}, version)
+    return index
 
 def save_to_json(data):
     """Сохранение данных в JSON файл"""
@@ -63,6 +168,21 @@ def sanitize_text(value):
     return value.replace('"', r'\"')
 
 
+def form_values(data):
+    """
+    Сохранённые данные для повторного показа в форме: обратное к sanitize_text
+    экранирование кавычек (\" -> "). Иначе каждое сохранение формы или
+    автосохранение экранировало бы уже экранированные кавычки ещё раз.
+    """
+    if isinstance(data, str):
+        return data.replace(r'\"', '"')
+    if isinstance(data, dict):
+        return OrderedDict((key, form_values(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return [form_values(value) for value in data]
+    return data
+
+
 def reorder_result_json(result_json, selected_fields):
     """
     Приводит сохраненный result_json к стабильному порядку ключей,
@@ -119,6 +239,147 @@ def reorder_result_json(result_json, selected_fields):
 
     return ordered_result
 
+def get_first_search_request():
+    """
+    Первый поисковый запрос мастера: из отредактированного на шаге 4 JSON,
+    иначе из данных шага 3.
+    """
+    result_json = session.get('result_json') or session.get('search_requests_data') or {}
+    search_requests = result_json.get('search_requests') or []
+    if search_requests and isinstance(search_requests[0], dict):
+        return search_requests[0]
+    return {}
+
+
+def get_generation_job():
+    """Текущая генерация пользователя (None, если сервис генерации не подключен)"""
+    if generation_jobs is None:
+        return None
+    job_id = session.get('generation_job_id')
+    return generation_jobs.get(job_id) if job_id else None
+
+
+def resolve_artifact(name):
+    """
+    Путь к выходному файлу генерации (result_code.ts, output.log, message_global.txt).
+
+    Если у сессии есть рабочая папка, файл ищется только в ней (O(1) по индексу
+    WorkspaceManager), иначе - в общей папке content_files/.
+    """
+    workspace_id = session.get('workspace_id')
+    if workspace_id:
+        return workspaces.resolve(workspace_id, name)
+    path = os.path.join('content_files', name)
+    return path if os.path.isfile(path) else None
+
+
+_legacy_log = None
+
+
+def get_session_log():
+    """
+    Лог генерации сессии (SegmentedLog): из рабочей папки сессии,
+    иначе - из общего content_files/output.log (индекс строится заново при изменении файла).
+    """
+    global _legacy_log
+    workspace_id = session.get('workspace_id')
+    if workspace_id:
+        return workspaces.open_log(workspace_id, create=False)
+
+    path = os.path.join('content_files', 'output.log')
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _legacy_log
+    if cached is None or cached[0] != key:
+        cached = _legacy_log = (key, SegmentedLog.from_file(path))
+    return cached[1]
+
+
+def save_generation_artifacts(workspace_id, generation_log, result):
+    """
+    Дописывает лог и сохраняет результаты генерации в рабочую папку сессии.
+    Если папку уже удалили (новая генерация, очистка), результаты не нужны.
+    """
+    if generation_log.closed:
+        return
+    try:
+        generation_log.flush()
+    except OSError as e:
+        print(f'Ошибка записи лога генерации в {workspace_id}: {e}')
+    if result is not None and not generation_log.closed:
+        workspaces.write(workspace_id, 'result_code.ts', result.get('result_code', ''))
+        workspaces.write(workspace_id, 'message_global.txt', result.get('message_global', ''))
+
+
+def json_response(data, status=200):
+    """JSON-ответ с сохранением порядка ключей (jsonify сортирует ключи)"""
+    return Response(json.dumps(data, ensure_ascii=False), mimetype='application/json; charset=utf-8', status=status)
+
+
+def classify_request():
+    """Класс запроса для контроля нагрузки и имя "дорогого" ресурса (если есть)"""
+    path = request.path
+    if path.startswith('/api/fields/'):
+        # Поиск полей на шаге 1 - часть интерактивной работы с мастером, а не фоновый опрос
+        return INTERACTIVE, None
+    if path.startswith('/api/'):
+        # Опрос - только GET, изменения состояния мастера идут как интерактивные
+        return (POLL if request.method == 'GET' else INTERACTIVE), None
+    if path.startswith('/download/'):
+        return DOWNLOAD, ('zip' if request.endpoint == 'download_all_files_zip' else None)
+    if request.endpoint == 'reset' and request.args.get('full') == '1':
+        return INTERACTIVE, 'reset_backup'
+    return INTERACTIVE, None
+
+
+@app.before_request
+def admission_control():
+    """Token bucket на клиента и лимиты одновременных запросов (см. admission.py)"""
+    if not app.config['ADMISSION_ENABLED'] or request.endpoint in (None, 'content', 'static'):
+        return None
+
+    request_class, expensive = classify_request()
+    if request_class == INTERACTIVE and expensive is None:
+        return None
+
+    # Ключ клиента - проверенный sid (подпись cookie проверена в open_session):
+    # подставляя случайные cookie, лимит на клиента не обойти
+    client_id = session.sid if isinstance(session, FileSession) and not session.new else request.remote_addr
+    try:
+        g.admission_acquired = admission.admit(client_id, request_class, expensive)
+    except Rejected as e:
+        response = Response(e.reason, mimetype='text/plain; charset=utf-8', status=429)
+        response.headers['Retry-After'] = e.retry_after_header
+        return response
+    return None
+
+
+@app.after_request
+def admission_release_on_close(response):
+    """
+    Слоты освобождаются, когда ответ полностью отдан: у потоковых ответов
+    (/api/log, /api/crawl_plan?format=txt) тело генерируется уже после teardown_request.
+    """
+    acquired = g.pop('admission_acquired', None)
+    if acquired:
+        if response.is_streamed:
+            response.call_on_close(lambda: admission.release(acquired))
+        else:
+            admission.release(acquired)
+    return response
+
+
+@app.teardown_request
+def admission_release(exc=None):
+    # Ответ не был сформирован (исключение в обработчике) - освобождаем сразу
+    acquired = g.pop('admission_acquired', None)
+    if acquired:
+        admission.release(acquired)
+
+
 @app.route('/')
 def index():
     """Главная страница - перенаправление на нулевой шаг"""
@@ -169,9 +430,6 @@ def step1():
     
     # Отображаем форму с сохраненными данными (если есть)
     # На первом шаге показываем только "stock", а не триггеры
-    # Фильтруем поля для отображения: убираем триггеры, оставляем stock
-    fields_for_display = {k: v for k, v in fields.items() 
-                         if k not in ['InStock_trigger', 'OutOfStock_trigger']}
     
     # Восстанавливаем selected_fields для отображения: если есть триггеры, заменяем их на stock
     selected_fields = session.get('selected_fields', [])
@@ -187,8 +445,20 @@ def step1():
     if has_triggers and 'stock' not in selected_fields_for_display:
         selected_fields_for_display.append('stock')
     
+    # Сразу показываем первую страницу полей и уже выбранные поля,
+    # остальные подгружаются поиском и прокруткой через /api/fields/search
+    field_index = get_field_index()
+    first_page, fields_total = field_index.search('', STEP1_PAGE_SIZE)
+    fields_for_display = OrderedDict((item['key'], item['description']) for item in first_page)
+    for field_key in list(STEP1_REQUIRED_FIELDS) + selected_fields_for_display:
+        if field_key in fields and field_key not in fields_for_display and field_key not in STEP1_HIDDEN_FIELDS:
+            fields_for_display[field_key] = fields[field_key]
+
     return render_template('step1.html', 
                          fields=fields_for_display,
+                         fields_total=fields_total,
+                         page_size=STEP1_PAGE_SIZE,
+                         required_fields=STEP1_REQUIRED_FIELDS,
                          selected_fields=selected_fields_for_display)
 
 #region step2
@@ -212,60 +482,116 @@ def step2():
             print(f'  - {field}')
         print('=' * 30 + '\n')
     
+    # Создаем словарь описаний только для выбранных полей
+    fields_descriptions = {field_key: fields.get(field_key, field_key) 
+                          for field_key in selected_fields}
+    
     if request.method == 'POST':
-        # Собираем данные примеров из формы
-        # Формат полей: example_{номер}_{field_key}
-        examples_data = {}
-        
-        # Определяем количество примеров по форме
-        example_numbers = set()
-        for key in request.form.keys():
-            if key.startswith('example_'):
-                parts = key.split('_', 2)
-                if len(parts) >= 3:
-                    example_numbers.add(parts[1])
-        
-        # Сортируем номера примеров
-        sorted_example_numbers = sorted([int(num) for num in example_numbers])
+        bulk_file = request.files.get('examples_file')
+        bulk_text = request.form.get('examples_bulk', '')
         
-        # Формируем список примеров
-        examples_list = []
-        for example_num in sorted_example_numbers:
-            # Используем OrderedDict для сохранения порядка полей
-            example_dict = OrderedDict()
-            for field_key in selected_fields:
-                field_name = f'example_{example_num}_{field_key}'
-                field_value = sanitize_text(request.form.get(field_name, ''))
-                # Добавляем все поля, даже с пустыми значениями
-                example_dict[field_key] = field_value
+        if (bulk_file and bulk_file.filename) or bulk_text.strip():
+            # Массовый импорт примеров из CSV/TSV/JSONL (файл имеет приоритет над вставкой)
+            source = bulk_file.stream if bulk_file and bulk_file.filename else bulk_text
+            result_json, import_errors, import_error_count = import_examples(
+                source,
+                selected_fields,
+                sanitize_text,
+                fields_descriptions=fields,
+                fmt=request.form.get('examples_format') or None,
+                filename=bulk_file.filename if bulk_file else None,
+            )
             
-            # Добавляем все примеры, даже если все поля пустые
-            examples_list.append(example_dict)
-        
-        # Формируем итоговый JSON с сохранением порядка ключей
-        result_json = OrderedDict([
-            ("simple", examples_list)
-        ])
-        
-        # Выводим результат в консоль
-        print('\n=== Результаты заполнения полей (шаг 2) ===')
-        print(json.dumps(result_json, ensure_ascii=False, indent=2, sort_keys=False))
-        print('=' * 30 + '\n')
+            print('\n=== Массовый импорт примеров (шаг 2) ===')
+            print(f'Примеров: {len(result_json["simple"])}, ошибок: {import_error_count}')
+            print('=' * 30 + '\n')
+            
+            if import_error_count:
+                # Показываем ошибки по строкам и остаёмся на шаге 2
+                return render_template('step2.html',
+                                     selected_fields=selected_fields,
+                                     fields_descriptions=fields_descriptions,
+                                     saved_examples=form_values((session.get('examples_data') or {}).get('simple', [])),
+                                     wizard_version=get_version(session),
+                                     wizard_structure=get_structure(session),
+                                     import_errors=import_errors,
+                                     import_error_count=import_error_count,
+                                     import_examples_count=len(result_json['simple']))
+        else:
+            # Собираем данные примеров из формы
+            # Формат полей: example_{номер}_{field_key}
+            
+            # Определяем количество примеров по форме
+            example_numbers = set()
+            for key in request.form.keys():
+                if key.startswith('example_'):
+                    parts = key.split('_', 2)
+                    if len(parts) >= 3:
+                        example_numbers.add(parts[1])
+            
+            # Сортируем номера примеров
+            sorted_example_numbers = sorted([int(num) for num in example_numbers])
+            
+            # Формируем список примеров
+            examples_list = []
+            for example_num in sorted_example_numbers:
+                # Используем OrderedDict для сохранения порядка полей
+                example_dict = OrderedDict()
+                for field_key in selected_fields:
+                    field_name = f'example_{example_num}_{field_key}'
+                    field_value = sanitize_text(request.form.get(field_name, ''))
+                    # Добавляем все поля, даже с пустыми значениями
+                    example_dict[field_key] = field_value
+                
+                # Добавляем все примеры, даже если все поля пустые
+                examples_list.append(example_dict)
+            
+            # Формируем итоговый JSON с сохранением порядка ключей
+            result_json = OrderedDict([
+                ("simple", examples_list)
+            ])
+            
+            # Выводим результат в консоль
+            print('\n=== Результаты заполнения полей (шаг 2) ===')
+            print(json.dumps(result_json, ensure_ascii=False, indent=2, sort_keys=False))
+            print('=' * 30 + '\n')
         
         # Сохраняем данные примеров в сессию
+        previous_examples = session.get('examples_data')
         session['examples_data'] = result_json
+        try:
+            app.session_interface.check_size(session)
+        except SessionTooLarge as e:
+            # Слишком большой импорт - на диске остаются прежние примеры
+            if previous_examples is None:
+                session.pop('examples_data')
+            else:
+                session['examples_data'] = previous_examples
+            return render_template('step2.html',
+                                 selected_fields=selected_fields,
+                                 fields_descriptions=fields_descriptions,
+                                 saved_examples=form_values((previous_examples or {}).get('simple', [])),
+                                 wizard_version=get_version(session),
+                                 wizard_structure=get_structure(session),
+                                 import_errors=[{'row': None, 'error': str(e)}],
+                                 import_error_count=1,
+                                 import_examples_count=len(result_json['simple']))
+        # Автосохранение из других вкладок больше не применится поверх этих данных:
+        # примеры заменены целиком, номера строк в их правках больше не верны
+        bump_version(session)
+        bump_structure(session)
         
         # Переходим на следующий шаг
         return redirect(url_for('step3'))
     
-    # Отображаем форму с сохраненными данными
-    # Создаем словарь описаний только для выбранных полей
-    fields_descriptions = {field_key: fields.get(field_key, field_key) 
-                          for field_key in selected_fields}
-    
+    # Отображаем форму с сохраненными данными (отправленными или автосохранёнными)
+    examples_data = session.get('examples_data') or {}
     return render_template('step2.html',
                          selected_fields=selected_fields,
-                         fields_descriptions=fields_descriptions)
+                         fields_descriptions=fields_descriptions,
+                         saved_examples=form_values(examples_data.get('simple', [])),
+                         wizard_version=get_version(session),
+                         wizard_structure=get_structure(session))
 
 #region step3
 @app.route('/step3', methods=['GET', 'POST'])
@@ -312,6 +638,7 @@ def step3():
         
         # Сохраняем данные в сессию
         session['search_requests_data'] = result_json
+        bump_version(session)
         
         # Обрабатываем и валидируем данные из шагов 2 и 3
         examples_data = session.get('examples_data', {})
@@ -333,7 +660,9 @@ def step3():
         saved_data = search_requests_data['search_requests'][0]
     
     return render_template('step3.html',
-                         saved_data=saved_data)
+                         saved_data=form_values(saved_data),
+                         wizard_version=get_version(session),
+                         wizard_structure=get_structure(session))
 
 #region step4
 @app.route('/step4', methods=['GET', 'POST'])
@@ -417,7 +746,19 @@ def step4():
     # и передаем строку в шаблон, чтобы избежать сортировки ключей фильтром tojson
     result_json_str = json.dumps(result_json, ensure_ascii=False, indent=2, sort_keys=False)
     
-    return render_template('step4.html', result_json_str=result_json_str)
+    # Превью плана обхода поисковой выдачи (по первому поисковому запросу)
+    crawl_plan = None
+    crawl_plan_error = None
+    try:
+        _, crawl_plan = build_crawl_plan(get_first_search_request())
+    except ValueError as e:
+        crawl_plan_error = str(e)
+    
+    return render_template('step4.html',
+                         result_json_str=result_json_str,
+                         crawl_plan=crawl_plan,
+                         crawl_plan_error=crawl_plan_error,
+                         max_export_pages=MAX_EXPORT_PAGES)
 
 #region step5
 @app.route('/step5', methods=['GET', 'POST'])
@@ -434,6 +775,29 @@ def step5():
         # Выводим сообщение в консоль сервера
         print("Начинаем генерацию")
         
+        # Запускаем генерацию в сервисе (если он подключен)
+        if generation_jobs is not None:
+            selected_fields = session.get('selected_fields', [])
+            data_input_table = session.get('result_json') or process_results(
+                session.get('examples_data', {}), session.get('search_requests_data', {}), selected_fields)
+            # Новая генерация - новая рабочая папка, результаты прошлой больше не нужны.
+            # Лог папки закрывается при удалении: если прошлая генерация ещё идёт,
+            # её лог и результаты больше никуда не пишутся
+            if session.get('workspace_id'):
+                workspaces.remove(session['workspace_id'])
+            workspace_id = workspaces.new_id()
+            generation_log = workspaces.open_log(workspace_id)
+            job = generation_jobs.submit(
+                {
+                    'data_input_table': data_input_table,
+                    'selected_fields': selected_fields,
+                },
+                on_log=generation_log.append,
+                on_finish=lambda job, result: save_generation_artifacts(workspace_id, generation_log, result),
+            )
+            session['generation_job_id'] = job.id
+            session['workspace_id'] = workspace_id
+        
         # Переходим на следующий шаг
         return redirect(url_for('step6'))
     
@@ -526,41 +890,185 @@ def content(filename):
     """Обслуживание статических файлов из папки content"""
     return send_from_directory('content', filename)
 
+@app.route('/api/wizard', methods=['GET', 'PATCH'])
+def wizard_state():
+    """
+    Состояние шагов 2 и 3 (GET) и автосохранение изменений (PATCH, см. wizard_state.py).
+    При конфликте версий - 409 с текущей версией и структурой. Изменение
+    выполняется под блокировкой сессии: параллельные PATCH одной вкладки
+    применяются по очереди и не затирают друг друга.
+    """
+    if request.method == 'GET':
+        return json_response({
+            'version': get_version(session),
+            'structure': get_structure(session),
+            'examples_data': session.get('examples_data'),
+            'search_requests_data': session.get('search_requests_data'),
+        })
+
+    if session.new:
+        return json_response({'error': 'Сессия мастера не найдена - обновите страницу'}, status=400)
+    patch = request.get_json(silent=True)
+    try:
+        version, structure = app.session_interface.update(
+            session.sid,
+            lambda stored: apply_patch(stored, patch, stored.get('selected_fields', []), sanitize_text))
+    except KeyError:
+        return json_response({'error': 'Сессия мастера не найдена - обновите страницу'}, status=400)
+    except VersionConflict as e:
+        return json_response({'error': str(e), 'version': e.version, 'structure': e.structure}, status=409)
+    except PatchError as e:
+        return json_response({'error': str(e)}, status=400)
+    except SessionTooLarge as e:
+        return json_response({'error': str(e)}, status=413)
+    return json_response({'version': version, 'structure': structure})
+
+
+@app.route('/api/fields/search')
+def search_fields():
+    """Typeahead для шага 1: ?q=цена&offset=0&limit=40"""
+    field_index = get_field_index()
+    query = request.args.get('q', '')[:100]
+    offset = max(0, request.args.get('offset', 0, type=int))
+    limit = min(max(1, request.args.get('limit', STEP1_PAGE_SIZE, type=int)), 100)
+    results, total = field_index.search(query, limit, offset)
+    for item in results:
+        item['required'] = item['key'] in STEP1_REQUIRED_FIELDS
+    return json_response({'query': query, 'total': total, 'offset': offset, 'results': results})
+
+
 @app.route('/api/log')
 def get_log():
-    """Возвращает содержимое файла output.log"""
-    log_file_path = 'content_files/output.log'
+    """
+    Возвращает лог генерации: из сервиса генерации (с offset - только новую часть),
+    иначе целиком (сегменты рабочей папки сессии или content_files/output.log)
+    """
+    job = get_generation_job()
+    if job is not None:
+        offset = max(0, request.args.get('offset', 0, type=int))
+        text = job.log()
+        response = Response(text[offset:], mimetype='text/plain; charset=utf-8')
+        response.headers['X-Log-Length'] = str(len(text))
+        response.headers['X-Generation-Status'] = job.status
+        return response
+
+    generation_log = get_session_log()
+    if generation_log is None:
+        return Response('', mimetype='text/plain; charset=utf-8')
+    return Response(generation_log.iter_bytes(), mimetype='text/plain; charset=utf-8')
+
+
+def log_text_response(generation_log, start, end):
+    """Кусок лога [start, end) с позициями в заголовках X-Log-Start / X-Log-End"""
+    response = Response(generation_log.iter_bytes(start, end), mimetype='text/plain; charset=utf-8')
+    response.headers['X-Log-Start'] = str(start)
+    response.headers['X-Log-End'] = str(end)
+    return response
+
+
+@app.route('/api/log/tail')
+def get_log_tail():
+    """Последние ?lines= строк лога (по умолчанию 200)"""
+    generation_log = get_session_log()
+    if generation_log is None:
+        return Response('', mimetype='text/plain; charset=utf-8')
+    lines = min(max(1, request.args.get('lines', 200, type=int)), 100000)
+    end = generation_log.size
+    return log_text_response(generation_log, generation_log.tail_offset(lines), end)
+
+
+@app.route('/api/log/range')
+def get_log_range():
+    """Строки лога с метками времени от ?since= до ?until= (формат "14.12.2025 09:47:58", ISO или unix time)"""
     try:
-        if os.path.exists(log_file_path):
-            with open(log_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            return Response(content, mimetype='text/plain; charset=utf-8')
-        else:
-            return Response('', mimetype='text/plain; charset=utf-8')
-    except Exception as e:
-        return Response(f'Ошибка чтения файла: {str(e)}', mimetype='text/plain; charset=utf-8', status=500)
+        since = parse_time(request.args['since']) if request.args.get('since') else None
+        until = parse_time(request.args['until']) if request.args.get('until') else None
+    except ValueError as e:
+        return Response(str(e), mimetype='text/plain; charset=utf-8', status=400)
+    generation_log = get_session_log()
+    if generation_log is None:
+        return Response('', mimetype='text/plain; charset=utf-8')
+    start, end = generation_log.time_range_offsets(since, until)
+    return log_text_response(generation_log, start, end)
+
+
+@app.route('/api/log/sections')
+def get_log_sections():
+    """Оглавление лога: секции с позициями и размерами"""
+    generation_log = get_session_log()
+    return json_response(generation_log.sections() if generation_log is not None else [])
+
+
+@app.route('/api/log/section')
+def get_log_section():
+    """Секция лога по названию: ?name=GLOBAL CODE GEN"""
+    generation_log = get_session_log()
+    span = generation_log.section_offsets(request.args.get('name', '')) if generation_log is not None else None
+    if span is None:
+        return Response('Секция не найдена', mimetype='text/plain; charset=utf-8', status=404)
+    return log_text_response(generation_log, *span)
+
+
+@app.route('/api/log/search')
+def search_log():
+    """Поиск подстроки в логе: ?q=селектор&limit=100"""
+    generation_log = get_session_log()
+    limit = min(max(1, request.args.get('limit', 100, type=int)), 1000)
+    if generation_log is None:
+        return json_response({'matches': [], 'truncated': False})
+    try:
+        matches, truncated = generation_log.search(request.args.get('q', ''), limit)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+    return json_response({'matches': matches, 'truncated': truncated})
+
 
 @app.route('/api/result_code')
 def get_result_code():
-    """Возвращает содержимое файла result_code.ts"""
-    code_file_path = 'content_files/result_code.ts'
-    try:
-        if os.path.exists(code_file_path):
-            with open(code_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            return Response(content, mimetype='text/plain; charset=utf-8')
-        else:
-            return Response('', mimetype='text/plain; charset=utf-8')
-    except Exception as e:
-        return Response(f'Ошибка чтения файла: {str(e)}', mimetype='text/plain; charset=utf-8', status=500)
+    """
+    Возвращает содержимое файла result_code.ts.
+
+    Без параметров - весь текст (версия в заголовках ETag и X-Code-Version).
+    С ?since=<версия> - JSON с построчным патчем от этой версии
+    или весь текст, если патч построить нельзя (см. code_snapshots.py).
+    """
+    job = get_generation_job()
+    if job is not None:
+        content = job.result_code
+    else:
+        code_file_path = resolve_artifact('result_code.ts')
+        try:
+            if code_file_path:
+                with open(code_file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+            else:
+                content = ''
+        except Exception as e:
+            return Response(f'Ошибка чтения файла: {str(e)}', mimetype='text/plain; charset=utf-8', status=500)
+
+    since = request.args.get('since')
+    if since is not None:
+        return json_response(code_snapshots.delta(content, since))
+
+    version = code_snapshots.put(content)
+    if request.if_none_match.contains(version):
+        return Response(status=304, headers={'ETag': f'"{version}"', 'X-Code-Version': version})
+    response = Response(content, mimetype='text/plain; charset=utf-8')
+    response.set_etag(version)
+    response.headers['X-Code-Version'] = version
+    return response
 
 
 @app.route('/api/message_global')
 def get_message_global():
     """Возвращает содержимое файла message_global.txt (с обрезкой переносов строк сверху/снизу)."""
-    message_file_path = 'content_files/message_global.txt'
+    job = get_generation_job()
+    if job is not None:
+        return Response(job.message_global.strip('\r\n'), mimetype='text/plain; charset=utf-8')
+
+    message_file_path = resolve_artifact('message_global.txt')
     try:
-        if os.path.exists(message_file_path):
+        if message_file_path:
             with open(message_file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
             # Удаляем переносы строк только сверху и снизу (внутренние переносы сохраняем)
@@ -572,11 +1080,64 @@ def get_message_global():
         return Response(f'Ошибка чтения файла: {str(e)}', mimetype='text/plain; charset=utf-8', status=500)
 
 
+@app.route('/api/crawl_plan')
+def get_crawl_plan():
+    """
+    План обхода поисковой выдачи.
+
+    По умолчанию берёт данные первого поискового запроса из сессии, их можно
+    переопределить параметрами url, pages, total. Параметры concurrency и
+    batch_size задают оценку нагрузки, offset/limit - срез ссылок в ответе.
+    С format=txt отдаёт ссылки потоком (по одной на строку), не больше
+    MAX_EXPORT_PAGES за запрос: остальные - следующими запросами с offset.
+    """
+    search_request = dict(get_first_search_request())
+    for arg, key in (('url', 'url_search_query_page_2'),
+                     ('pages', 'count_of_page_on_pagination'),
+                     ('total', 'total_count_of_results')):
+        if arg in request.args:
+            search_request[key] = request.args[arg]
+
+    try:
+        concurrency = request.args.get('concurrency', DEFAULT_CONCURRENCY, type=int)
+        batch_size = request.args.get('batch_size', None, type=int)
+        template, plan = build_crawl_plan(search_request, concurrency, batch_size)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+
+    pages = plan['estimate']['pages']
+    offset = max(0, request.args.get('offset', 0, type=int))
+    if request.args.get('format') == 'txt':
+        limit = min(MAX_EXPORT_PAGES, max(0, request.args.get('limit', MAX_EXPORT_PAGES, type=int)))
+        end = min(pages, offset + limit)
+        # Генератор: ссылки не собираются в список, отдаём пачками,
+        # чтобы не писать в сокет по одной строке
+        chunks = (''.join(f'{url}\n' for url in batch)
+                  for batch in iter_batches(iter_page_urls(template, end, start=offset + 1), 1000))
+        response = Response(chunks, mimetype='text/plain; charset=utf-8')
+        response.headers['X-Total-Pages'] = str(pages)
+        if end < pages:
+            # Ссылки выгружены не все - следующая часть с offset=<X-Next-Offset>
+            response.headers['X-Next-Offset'] = str(end)
+        return response
+
+    limit = min(1000, max(0, request.args.get('limit', 100, type=int)))
+    plan['offset'] = offset
+    plan['urls'] = list(iter_page_urls(template, min(pages, offset + limit), start=offset + 1))
+    return json_response(plan)
+
+
+@app.route('/api/workspaces/usage')
+def get_workspaces_usage():
+    """Использование диска рабочими папками (общий объём, квота, самые большие папки)"""
+    return json_response(workspaces.usage())
+
+
 @app.route('/download/parser_ts')
 def download_parser_ts():
     """Скачать сгенерированный парсер .ts"""
-    code_file_path = os.path.join('content_files', 'result_code.ts')
-    if not os.path.exists(code_file_path):
+    code_file_path = resolve_artifact('result_code.ts')
+    if not code_file_path:
         return Response('Файл result_code.ts не найден', mimetype='text/plain; charset=utf-8', status=404)
 
     return send_file(
@@ -590,10 +1151,6 @@ def download_parser_ts():
 @app.route('/download/all_files_zip')
 def download_all_files_zip():
     """Скачать все полезные выходные файлы одним .zip"""
-    base_dir = 'content_files'
-    if not os.path.isdir(base_dir):
-        return Response('Папка content_files не найдена', mimetype='text/plain; charset=utf-8', status=404)
-
     required_names = [
         'result_code.ts',
         'output.log',
@@ -603,11 +1160,15 @@ def download_all_files_zip():
     candidates = []
     missing = []
     for name in required_names:
-        full_path = os.path.join(base_dir, name)
-        if not os.path.isfile(full_path):
+        if name == 'output.log':
+            generation_log = get_session_log()
+            source = generation_log.iter_bytes if generation_log is not None and generation_log.size else None
+        else:
+            source = resolve_artifact(name)
+        if not source:
             missing.append(name)
         else:
-            candidates.append((name, full_path))
+            candidates.append((name, source))
 
     if missing:
         return Response(
@@ -616,11 +1177,30 @@ def download_all_files_zip():
             status=404
         )
 
+    return send_artifacts_zip(candidates)
+
+
+def send_artifacts_zip(files):
+    """
+    Отдаёт .zip с выходными файлами генерации.
+
+    Args:
+        files: [(имя в архиве, путь к файлу или функция, возвращающая итератор байт)]
+    """
+    # Редко используемые модули импортируем при первом обращении, а не при старте
+    import zipfile
+    from io import BytesIO
+
     buf = BytesIO()
     # Без сжатия (store)
     with zipfile.ZipFile(buf, mode='w', compression=zipfile.ZIP_STORED) as zf:
-        for arcname, full_path in candidates:
-            zf.write(full_path, arcname=arcname)
+        for arcname, source in files:
+            if callable(source):
+                with zf.open(arcname, 'w') as out:
+                    for chunk in source():
+                        out.write(chunk)
+            else:
+                zf.write(source, arcname=arcname)
 
     buf.seek(0)
 
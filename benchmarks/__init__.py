@@ -0,0 +1 @@
+"""Бенчмарки горячих путей APSP front (см. benchmarks/run.py)."""
@@ -0,0 +1,168 @@
+"""
+Нагрузочный тест контроля нагрузки (admission.py).
+
+Поднимает app на многопоточном сервере werkzeug в отдельном процессе,
+запускает сотни "вкладок step6", которые опрашивают /api/log каждые 500 мс
+(и, как step6.html, выжидают Retry-After на 429), и одновременно
+проходит шаги мастера, замеряя задержку POST-запросов (p50/p99).
+"""
+import http.client
+import multiprocessing
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+from http.cookies import SimpleCookie
+
+from benchmarks.harness import isolated_workdir, latency_result, quiet
+
+SUITE = 'admission'
+
+POLL_INTERVAL = 0.5
+POLLER_PROCESSES = 4
+
+
+def _serve(port, admission_enabled, ready):
+    import logging
+    from werkzeug.serving import make_server
+    import app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app.app.config['ADMISSION_ENABLED'] = admission_enabled
+    server = make_server('127.0.0.1', port, app.app, threaded=True)
+    server.socket.listen(1024)
+    ready.set()
+    with quiet():
+        server.serve_forever()
+
+
+def _open_session(connection):
+    """
+    Заводит вкладке настоящую сессию (POST /step1) и возвращает её cookie.
+
+    Ключ клиента в admission - проверенный sid: с поддельной cookie все вкладки
+    попали бы в одну корзину по remote_addr.
+    """
+    body = urllib.parse.urlencode({'selected_fields': 'name'})
+    connection.request('POST', '/step1', body=body,
+                       headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    response.read()
+    cookie = SimpleCookie(response.headers.get('Set-Cookie', ''))
+    if 'session' not in cookie:
+        raise RuntimeError(f'POST /step1 не выдал cookie сессии (HTTP {response.status})')
+    return f'session={cookie["session"].value}'
+
+
+def _poller(port, stop_at, counters):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    headers = {'Cookie': _open_session(connection)}
+    while time.time() < stop_at:
+        try:
+            connection.request('GET', '/api/log', headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            time.sleep(POLL_INTERVAL)
+            continue
+        if response.status == 429:
+            counters[1] += 1
+            time.sleep(float(response.headers.get('Retry-After') or 1))
+        else:
+            counters[0] += 1
+            time.sleep(POLL_INTERVAL)
+    connection.close()
+
+
+def _poller_process(port, count, stop_at):
+    counters = [0, 0]
+    threads = [threading.Thread(target=_poller, args=(port, stop_at, counters), daemon=True)
+               for i in range(count)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.002)
+    for thread in threads:
+        thread.join()
+
+
+def _wizard_latencies(port, flows):
+    """Проходит мастер flows раз, возвращает задержки POST-запросов шагов (секунды)"""
+    base = f'http://127.0.0.1:{port}'
+    latencies = []
+    steps = [
+        ('/step1', {'selected_fields': ['name', 'link', 'price', 'stock']}),
+        ('/step2', {'example_1_name': 'Дрель', 'example_1_link': 'https://shop.example.ru/item-1',
+                    'example_1_price': '100', 'example_1_InStock_trigger': 'В наличии'}),
+        ('/step3', {'query': 'дрель', 'url_search_query_page_2': 'https://shop.example.ru/search/?q=a&page=2',
+                    'count_of_page_on_pagination': '24'}),
+        ('/step4', {'edited_json': ''}),
+        ('/step5', {}),
+    ]
+    for _ in range(flows):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        opener.open(base + '/step0').read()
+        for path, form in steps:
+            data = urllib.parse.urlencode(form, doseq=True).encode('utf-8')
+            start = time.perf_counter()
+            # POST + переход по редиректу на следующий шаг, как в браузере
+            opener.open(base + path, data=data).read()
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _run_case(pollers, admission_enabled, flows, warmup):
+    ctx = multiprocessing.get_context('fork')
+    port = _free_port()
+    ready = ctx.Event()
+    server = ctx.Process(target=_serve, args=(port, admission_enabled, ready), daemon=True)
+    server.start()
+    ready.wait(30)
+
+    processes = []
+    try:
+        if pollers:
+            stop_at = time.time() + 3600
+            per_process = -(-pollers // POLLER_PROCESSES)
+            for index in range(POLLER_PROCESSES):
+                count = min(per_process, pollers - index * per_process)
+                if count <= 0:
+                    break
+                process = ctx.Process(target=_poller_process,
+                                      args=(port, count, stop_at), daemon=True)
+                process.start()
+                processes.append(process)
+            # Даём вкладкам открыться и выйти на установившийся режим
+            time.sleep(warmup)
+        return _wizard_latencies(port, flows)
+    finally:
+        for process in processes:
+            process.kill()
+        server.kill()
+        for process in processes + [server]:
+            process.join()
+
+
+def run(quick=False):
+    pollers = 100 if quick else 500
+    flows = 10 if quick else 30
+    warmup = 2 if quick else 5
+
+    results = []
+    with isolated_workdir():
+        for count, enabled in ((0, True), (pollers, False), (pollers, True)):
+            latencies = _run_case(count, enabled, flows, warmup if count else 0)
+            name = f'wizard_post[pollers={count},admission={"on" if enabled else "off"}]'
+            results.append(latency_result(name, latencies, {
+                'pollers': count, 'admission': enabled, 'flows': flows, 'cpus': os.cpu_count()}))
+    return results
@@ -0,0 +1,82 @@
+"""
+Бенчмарк автосохранения шагов 2 и 3 (wizard_state.py): размер запроса и время
+процессора сервера на одну правку - PATCH /api/wizard с изменением одной ячейки
+против полной отправки формы шага 2 (как при каждом переходе между шагами).
+
+Размер запроса - только тело (urlencoded форма / JSON), заголовки у обоих вариантов одинаковые.
+"""
+import json
+import time
+from urllib.parse import urlencode
+
+from benchmarks.harness import bench, isolated_workdir, quiet
+
+SUITE = 'autosave'
+
+SELECTED_FIELDS = ['name', 'link', 'price', 'stock', 'oldprice', 'article', 'brand', 'barcode']
+
+
+def _cpu_us(func, number=50):
+    """Среднее время процессора на вызов func, микросекунды"""
+    start = time.process_time()
+    for _ in range(number):
+        func()
+    return round((time.process_time() - start) / number * 1e6, 1)
+
+
+def _full_form(examples):
+    form = {}
+    for n in range(1, examples + 1):
+        for field in SELECTED_FIELDS + ['InStock_trigger', 'OutOfStock_trigger']:
+            form[f'example_{n}_{field}'] = f'https://shop.example.ru/item-{n}' if field == 'link' else f'{field} значение {n}'
+    return form
+
+
+def run(quick=False):
+    results = []
+    with isolated_workdir():
+        import app
+        app.app.config['TESTING'] = True
+        app.app.config['ADMISSION_ENABLED'] = False
+
+        for examples in ([10] if quick else [1, 10, 100]):
+            client = app.app.test_client()
+            with quiet():
+                client.post('/step1', data={'selected_fields': SELECTED_FIELDS})
+            form = _full_form(examples)
+            form_body = urlencode(form).encode('utf-8')
+
+            def post_full():
+                with quiet():
+                    response = client.post('/step2', data=form_body,
+                                           content_type='application/x-www-form-urlencoded')
+                assert response.status_code == 302, response.status_code
+
+            post_full()
+            state = {'version': client.get('/api/wizard').json['version'], 'edit': 0}
+
+            def patch_cell():
+                # Правка одной ячейки в середине таблицы примеров
+                state['edit'] += 1
+                body = json.dumps({'version': state['version'], 'ops': [
+                    {'op': 'set_cell', 'example': examples // 2, 'field': 'price', 'value': f'{state["edit"]} 990'},
+                ]}, ensure_ascii=False).encode('utf-8')
+                response = client.patch('/api/wizard', data=body, content_type='application/json')
+                assert response.status_code == 200, (response.status_code, response.data)
+                state['version'] = response.json['version']
+                return body
+
+            patch_body = patch_cell()
+            results.append(bench(f'step2_full_post[{examples}]', post_full, {
+                'examples': examples,
+                'request_bytes': len(form_body),
+                'cpu_us': _cpu_us(post_full),
+            }, repeat=3))
+            # Полная отправка меняет версию - берём актуальную перед серией PATCH
+            state['version'] = client.get('/api/wizard').json['version']
+            results.append(bench(f'patch_cell[{examples}]', patch_cell, {
+                'examples': examples,
+                'request_bytes': len(patch_body),
+                'cpu_us': _cpu_us(patch_cell),
+            }, repeat=3))
+    return results
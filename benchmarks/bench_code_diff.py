@@ -0,0 +1,83 @@
+"""
+Бенчмарк инкрементальной доставки result_code.ts на шаг 6 (code_snapshots.py):
+размер ответа и время сервера при полной отдаче кода и при патче от известной
+клиенту версии - правка одной строки, замена блока строк и перегенерация кода
+целиком (патч не считается) в файлах разного размера.
+"""
+import json
+import os
+
+from benchmarks.harness import REPO_ROOT, bench, isolated_workdir
+
+SUITE = 'code_diff'
+
+
+def _code(lines):
+    """Сгенерированный парсер нужной длины - пример из content_files, повторённый до lines строк"""
+    with open(os.path.join(REPO_ROOT, 'content_files', 'result_code copy.ts'), 'r', encoding='utf-8') as f:
+        sample = f.read().split('\n')
+    return [f'{line}  // {n}' if line.strip() else line for n, line in
+            ((n, sample[n % len(sample)]) for n in range(lines))]
+
+
+def _edits(lines):
+    """Варианты перегенерации: (имя, новые строки)"""
+    one_line = list(lines)
+    one_line[len(lines) // 2] = '    const price = parsePrice(raw);  // исправлено'
+    block = list(lines)
+    start = len(lines) // 3
+    block[start:start + 40] = [f'    // новый блок {n}' for n in range(30)]
+    # Перегенерация с нуля: меняется почти каждая строка - патч не считается, отдаётся весь текст
+    rewrite = [line.replace('//', '// v2') if line.strip() else line for line in lines]
+    return [('one_line', one_line), ('block', block), ('rewrite', rewrite)]
+
+
+def run(quick=False):
+    from code_snapshots import CodeSnapshots
+
+    results = []
+    for size in ([1000] if quick else [1000, 10000, 50000]):
+        old_lines = _code(size)
+        old = '\n'.join(old_lines)
+        for kind, new_lines in _edits(old_lines):
+            new = '\n'.join(new_lines)
+            store = CodeSnapshots()
+            base = store.put(old)
+            delta = store.delta(new, base)
+            assert ('full' if kind == 'rewrite' else 'hunks') in delta, kind
+            params = {
+                'lines': size,
+                'full_bytes': len(new.encode('utf-8')),
+                'delta_bytes': len(json.dumps(delta, ensure_ascii=False).encode('utf-8')),
+            }
+            state = {}
+
+            def fresh_store(old=old):
+                state['store'] = CodeSnapshots()
+                state['base'] = state['store'].put(old)
+
+            results.append(bench(f'delta[{size},{kind}]',
+                                 lambda new=new: state['store'].delta(new, state['base']),
+                                 params, repeat=5, setup=fresh_store))
+            # Повторный опрос той же пары версий - патч из кеша
+            results.append(bench(f'delta_cached[{size},{kind}]', lambda new=new, store=store: store.delta(new, base),
+                                 params))
+
+    with isolated_workdir():
+        import app
+        app.app.config['TESTING'] = True
+        app.app.config['ADMISSION_ENABLED'] = False
+        client = app.app.test_client()
+        size = 1000 if quick else 10000
+        lines = _code(size)
+        path = os.path.join('content_files', 'result_code.ts')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+        base = client.get('/api/result_code').headers['X-Code-Version']
+        lines[size // 2] = '    // исправлено'
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+        results.append(bench(f'GET /api/result_code[{size}]', lambda: client.get('/api/result_code'), {}))
+        results.append(bench(f'GET /api/result_code?since[{size}]',
+                             lambda: client.get('/api/result_code', query_string={'since': base}), {}))
+    return results
@@ -0,0 +1,123 @@
+"""
+Микробенчмарки вспомогательных функций app.py, result_processer.py
+и extract_fields_description.py на входах разного размера.
+"""
+import json
+import os
+from collections import OrderedDict
+
+from benchmarks.harness import REPO_ROOT, bench, isolated_workdir, quiet
+
+SUITE = 'core'
+
+FIELDS = ['link', 'name', 'price', 'oldprice', 'article', 'imageLink', 'InStock_trigger', 'OutOfStock_trigger']
+
+
+def _example(i):
+    return OrderedDict(
+        (field, f'https://shop.example.ru/catalog/item-{i}' if field == 'link' else f'"{field}" значение {i}  ')
+        for field in FIELDS
+    )
+
+
+def _examples_data(n):
+    return OrderedDict([('simple', [_example(i) for i in range(n)])])
+
+
+def _search_requests_data(links):
+    return OrderedDict([('search_requests', [OrderedDict([
+        ('query', 'дрель'),
+        ('url_search_query_page_2', 'https://shop.example.ru/search/?q=дрель&page=2'),
+        ('count_of_page_on_pagination', '24'),
+        ('total_count_of_results', '1000'),
+        ('links_items', [f'https://shop.example.ru/catalog/item-{i}' for i in range(links)]),
+    ])])])
+
+
+def run(quick=False):
+    # app импортируется только во временной папке (см. isolated_workdir)
+    with isolated_workdir() as workdir:
+        import app
+        return _run(app, workdir, quick)
+
+
+def _run(app, workdir, quick):
+    from result_processer import process_results, _extract_host_from_url
+    from extract_fields_description import extract_fields_from_content, calculate_file_hash
+
+    scale = [10, 100] if quick else [10, 100, 1000]
+    results = []
+
+    # sanitize_text
+    for size in ([100, 10_000] if quick else [100, 10_000, 1_000_000]):
+        value = ('  текст "в кавычках" ' * (size // 20 + 1))[:size]
+        results.append(bench(f'sanitize_text[{size}]', lambda v=value: app.sanitize_text(v), {'chars': size}))
+
+    # reorder_result_json / process_results
+    for n in scale:
+        with quiet():
+            result_json = process_results(_examples_data(n), _search_requests_data(n), FIELDS)
+        results.append(bench(
+            f'reorder_result_json[{n}]',
+            lambda r=result_json: app.reorder_result_json(r, FIELDS),
+            {'examples': n},
+        ))
+
+        examples_data = _examples_data(n)
+        search_requests_data = _search_requests_data(n)
+
+        def call_process(e=examples_data, s=search_requests_data):
+            with quiet():
+                process_results(e, s, FIELDS)
+        results.append(bench(f'process_results[{n}]', call_process, {'examples': n}))
+
+    # _extract_host_from_url (пачка URL разного вида)
+    urls = ['https://c-s-k.ru/catalog/item-1', 'c-s-k.ru/catalog/item-2', 'http://shop.example.ru:8080/a?b=c', '', '  ']
+    for n in scale:
+        batch = (urls * (n // len(urls) + 1))[:n]
+
+        def call_extract(batch=batch):
+            for url in batch:
+                _extract_host_from_url(url)
+        results.append(bench(f'_extract_host_from_url[{n}]', call_extract, {'urls': n}))
+
+    # extract_fields_from_content (Fields_static.ts, размноженный в k раз)
+    with open(os.path.join(REPO_ROOT, 'add_files', 'Fields_static.ts'), 'r', encoding='utf-8') as f:
+        fields_ts = f.read()
+    for k in ([1, 10] if quick else [1, 10, 100]):
+        content = fields_ts * k
+        results.append(bench(
+            f'extract_fields_from_content[x{k}]',
+            lambda c=content: extract_fields_from_content(c),
+            {'copies': k, 'chars': len(content)},
+        ))
+
+    # calculate_file_hash
+    for size in ([4096, 1 << 20] if quick else [4096, 1 << 20, 16 << 20]):
+        path = os.path.join(workdir, f'hash_{size}.bin')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        results.append(bench(
+            f'calculate_file_hash[{size}]',
+            lambda p=path: calculate_file_hash(p),
+            {'bytes': size},
+        ))
+
+    # save_to_json: стоимость растёт с количеством уже сохранённых отправок
+    for n in scale:
+        existing = [{'timestamp': '2025-01-01 00:00:00', 'examples_data': _examples_data(3)} for _ in range(n)]
+        existing_str = json.dumps(existing, ensure_ascii=False, indent=2)
+        submission = {'selected_fields': {f: f for f in FIELDS}, 'examples_data': _examples_data(3), 'code': ''}
+
+        def reset(s=existing_str):
+            with open(app.JSON_FILE, 'w', encoding='utf-8') as f:
+                f.write(s)
+        results.append(bench(
+            f'save_to_json[{n}]',
+            lambda d=submission: app.save_to_json(d),
+            {'existing_submissions': n},
+            repeat=15,
+            setup=reset,
+        ))
+
+    return results
@@ -0,0 +1,74 @@
+"""
+Бенчмарк плана обхода поисковой выдачи (crawl_plan.py):
+вывод шаблона, генерация ссылок на миллионы страниц и потоковая выдача через API.
+"""
+import tracemalloc
+from collections import deque
+
+from benchmarks.harness import bench, isolated_workdir
+
+SUITE = 'crawl_plan'
+
+URLS = {
+    'query': 'https://shop.example.ru/search/?q=дрель&sort=price&page=2',
+    'path': 'https://shop.example.ru/catalog/drills/page/2/?sort=price',
+    'offset': 'https://shop.example.ru/search/?q=дрель&start=24',
+}
+
+
+def _peak_kib(func):
+    """Пиковое потребление памяти func в КиБ (tracemalloc)"""
+    tracemalloc.start()
+    try:
+        func()
+        return round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        tracemalloc.stop()
+
+
+def run(quick=False):
+    from crawl_plan import infer_page_template, iter_page_urls, iter_batches
+
+    results = []
+    for kind, url in URLS.items():
+        results.append(bench(f'infer_page_template[{kind}]', lambda url=url: infer_page_template(url), {'kind': kind}))
+
+    template = infer_page_template(URLS['query'])
+    results.append(bench('page_url[random access]', lambda: template.page_url(987_654), {}))
+
+    for pages in ([100_000] if quick else [100_000, 1_000_000]):
+        def consume(pages=pages):
+            deque(iter_page_urls(template, pages), maxlen=0)
+
+        def consume_batches(pages=pages):
+            deque(iter_batches(iter_page_urls(template, pages), 256), maxlen=0)
+
+        results.append(bench(f'iter_page_urls[{pages}]', consume,
+                             {'pages': pages, 'peak_kib': _peak_kib(consume)}, repeat=3))
+        results.append(bench(f'iter_batches[{pages},256]', consume_batches,
+                             {'pages': pages, 'peak_kib': _peak_kib(consume_batches)}, repeat=3))
+
+    with isolated_workdir():
+        import app
+        app.app.config['TESTING'] = True
+        # Бенчмарк опрашивает API с одного клиента - лимиты на клиента здесь не нужны
+        app.app.config['ADMISSION_ENABLED'] = False
+        client = app.app.test_client()
+        pages = 10_000 if quick else 100_000
+
+        def stream_txt():
+            response = client.get('/api/crawl_plan', query_string={
+                'url': URLS['query'], 'pages': pages, 'format': 'txt'})
+            lines = sum(chunk.count(b'\n') for chunk in response.response)
+            response.close()
+            assert lines == pages, lines
+
+        def plan_json():
+            response = client.get('/api/crawl_plan', query_string={
+                'url': URLS['query'], 'pages': 10_000_000, 'offset': 5_000_000, 'limit': 100})
+            assert response.status_code == 200, response.status_code
+
+        results.append(bench(f'GET /api/crawl_plan txt[{pages}]', stream_txt, {'pages': pages}, repeat=3))
+        results.append(bench('GET /api/crawl_plan json[10000000]', plan_json, {'pages': 10_000_000}))
+
+    return results
@@ -0,0 +1,64 @@
+"""
+Сквозные бенчмарки через Flask test client: полный проход мастера step1 -> step6
+и эндпоинты /api/* и /download/*.
+"""
+from benchmarks.harness import bench, isolated_workdir, quiet
+
+SUITE = 'e2e'
+
+SELECTED_FIELDS = ['name', 'link', 'price', 'stock', 'oldprice', 'article']
+
+
+def _wizard_flow(client, examples):
+    """Один проход мастера от step0 до success"""
+    client.get('/step0')
+    client.get('/step1')
+    client.post('/step1', data={'selected_fields': SELECTED_FIELDS})
+    client.get('/step2')
+    form = {}
+    for n in range(1, examples + 1):
+        for field in SELECTED_FIELDS + ['InStock_trigger', 'OutOfStock_trigger']:
+            form[f'example_{n}_{field}'] = f'https://shop.example.ru/item-{n}' if field == 'link' else f'{field} {n}'
+    client.post('/step2', data=form)
+    client.get('/step3')
+    client.post('/step3', data={
+        'query': 'дрель',
+        'url_search_query_page_2': 'https://shop.example.ru/search/?q=дрель&page=2',
+        'count_of_page_on_pagination': '24',
+        'total_count_of_results': '1000',
+        'links_items_0': 'https://shop.example.ru/item-1',
+        'links_items_1': 'https://shop.example.ru/item-2',
+    })
+    client.get('/step4')
+    client.post('/step4', data={'edited_json': ''})
+    client.get('/step5')
+    client.post('/step5')
+    client.get('/step6')
+    response = client.post('/step6', data={'code': 'export default {}'})
+    assert response.status_code == 302, response.status_code
+
+
+def run(quick=False):
+    results = []
+    with isolated_workdir():
+        import app
+        app.app.config['TESTING'] = True
+        # Бенчмарк опрашивает API с одного клиента - лимиты на клиента здесь не нужны
+        app.app.config['ADMISSION_ENABLED'] = False
+        client = app.app.test_client()
+
+        for examples in ([1, 10] if quick else [1, 10, 50]):
+            def flow(examples=examples):
+                with quiet():
+                    _wizard_flow(client, examples)
+            results.append(bench(f'wizard_flow[{examples}]', flow, {'examples': examples}, repeat=5))
+
+        for path in ['/api/log', '/api/result_code', '/api/message_global',
+                     '/download/parser_ts', '/download/all_files_zip']:
+            def get(path=path):
+                response = client.get(path)
+                response.close()
+                assert response.status_code == 200, (path, response.status_code)
+            results.append(bench(f'GET {path}', get))
+
+    return results
@@ -0,0 +1,52 @@
+"""
+Бенчмарк поиска полей шага 1 (field_search.py): построение индекса и typeahead-запросы
+на реестре из Fields_static.ts, размноженном до сотен и тысяч полей.
+"""
+import os
+
+from benchmarks.harness import REPO_ROOT, bench, isolated_workdir
+
+SUITE = 'field_search'
+
+QUERIES = {
+    'prefix': 'цен',
+    'two_words': 'код товара',
+    'partial_words': 'цена товара',
+    'key': 'product_id',
+    'typo': 'артикл',
+    'short': 'к',
+}
+
+
+def _registry(copies):
+    from extract_fields_description import extract_fields_from_content
+
+    with open(os.path.join(REPO_ROOT, 'add_files', 'Fields_static.ts'), 'r', encoding='utf-8') as f:
+        fields = extract_fields_from_content(f.read())
+    if copies == 1:
+        return fields
+    return {f'{key}{copy}': f'{description} {copy}' for copy in range(copies) for key, description in fields.items()}
+
+
+def run(quick=False):
+    from field_search import FieldSearchIndex
+
+    results = []
+    for copies in ([1, 10] if quick else [1, 10, 50]):
+        fields = _registry(copies)
+        params = {'fields': len(fields)}
+        results.append(bench(f'build_index[{len(fields)}]', lambda fields=fields: FieldSearchIndex(fields), params,
+                             repeat=3))
+        index = FieldSearchIndex(fields)
+        for kind, query in QUERIES.items():
+            results.append(bench(f'search[{len(fields)},{kind}]', lambda index=index, query=query: index.search(query),
+                                 params))
+
+    with isolated_workdir():
+        import app
+        app.app.config['TESTING'] = True
+        client = app.app.test_client()
+        results.append(bench('GET /api/fields/search[prefix]',
+                             lambda: client.get('/api/fields/search', query_string={'q': QUERIES['prefix']}), {}))
+        results.append(bench('GET /step1', lambda: client.get('/step1'), {}))
+    return results
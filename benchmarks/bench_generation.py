@@ -0,0 +1,71 @@
+"""
+Бенчмарк клиента сервиса генерации (generation_client.py) против локальной
+заглушки (generation_standin.py): пропускная способность и задержка
+при 1..100 одновременных генерациях.
+"""
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.harness import bench
+
+SUITE = 'generation'
+
+# Задержка между строками лога заглушки: ~30 строк -> ~60 мс на генерацию
+LINE_DELAY = 0.002
+
+PAYLOAD = {
+    'data_input_table': {
+        'host': 'https://shop.example.ru',
+        'links': {'simple': [{'link': 'https://shop.example.ru/item-1', 'name': 'Дрель', 'price': '100',
+                              'oldprice': '', 'article': 'A-1', 'imageLink': '', 'InStock_trigger': 'В наличии'}]},
+    },
+    'selected_fields': ['link', 'name', 'price', 'oldprice', 'article', 'imageLink', 'InStock_trigger'],
+}
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run(quick=False):
+    from generation_client import GenerationClient
+    from generation_standin import make_server
+
+    server = make_server(port=0, line_delay=LINE_DELAY)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    results = []
+    try:
+        for concurrency in ([1, 10] if quick else [1, 10, 50, 100]):
+            client = GenerationClient(base_url, pool_size=concurrency, max_concurrency=concurrency)
+            latencies = []
+
+            def one():
+                start = time.perf_counter()
+                result = client.generate(PAYLOAD, on_log=lambda chunk: None)
+                latencies.append(time.perf_counter() - start)
+                assert result['result_code']
+
+            def wave(concurrency=concurrency):
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    for future in [pool.submit(one) for _ in range(concurrency)]:
+                        future.result()
+
+            result = bench(f'generate[concurrency={concurrency}]', wave, {'concurrency': concurrency}, repeat=3)
+            wave_seconds = result['median_us'] / 1e6
+            result['params'].update({
+                'generations_per_sec': round(concurrency / wave_seconds, 1),
+                'latency_p50_ms': round(statistics.median(latencies) * 1000, 1),
+                'latency_p95_ms': round(_percentile(latencies, 0.95) * 1000, 1),
+            })
+            results.append(result)
+            client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return results
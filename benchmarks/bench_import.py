@@ -0,0 +1,86 @@
+"""
+Бенчмарк массового импорта примеров шага 2 (examples_import.py)
+в сравнении с обычной отправкой формы example_{n}_{field}.
+"""
+import io
+import json
+
+from benchmarks.harness import bench, isolated_workdir, quiet
+
+SUITE = 'import'
+
+FIELDS = ['name', 'link', 'price', 'oldprice', 'article', 'InStock_trigger', 'OutOfStock_trigger']
+
+
+def _rows(n):
+    for i in range(n):
+        yield [f'Товар "{i}" ', f'https://shop.example.ru/item-{i}', str(100 + i), '', f'A-{i}', 'В наличии', '']
+
+
+def make_csv(n, delimiter=','):
+    import csv
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=delimiter)
+    writer.writerow(FIELDS)
+    writer.writerows(_rows(n))
+    return buf.getvalue()
+
+
+def make_jsonl(n):
+    return ''.join(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + '\n' for row in _rows(n))
+
+
+def run(quick=False):
+    from examples_import import import_examples
+
+    with isolated_workdir():
+        # app импортируется только во временной папке
+        import app
+
+        results = []
+        sizes = [1000, 10_000] if quick else [1000, 10_000, 100_000]
+        for n in sizes:
+            payloads = {'csv': make_csv(n), 'tsv': make_csv(n, '\t'), 'jsonl': make_jsonl(n)}
+            for fmt, text in payloads.items():
+                data = text.encode('utf-8')
+
+                def call(data=data, fmt=fmt, n=n):
+                    examples, _errors, error_count = import_examples(io.BytesIO(data), FIELDS, app.sanitize_text,
+                                                                     fmt=fmt)
+                    assert error_count == 0 and len(examples['simple']) == n
+                results.append(bench(f'import_examples[{fmt},{n}]', call, {'rows': n, 'bytes': len(data)}, repeat=3))
+
+        app.app.config['TESTING'] = True
+        app.app.config['ADMISSION_ENABLED'] = False
+        client = app.app.test_client()
+        with quiet():
+            client.post('/step1', data={'selected_fields': FIELDS})
+
+        for n in ([100, 500] if quick else [100, 500, 10_000]):
+            csv_data = make_csv(n).encode('utf-8')
+
+            def bulk_post(csv_data=csv_data):
+                with quiet():
+                    response = client.post('/step2', data={'examples_file': (io.BytesIO(csv_data), 'examples.csv')},
+                                           content_type='multipart/form-data')
+                assert response.status_code == 302, response.status_code
+            results.append(bench(f'POST /step2 bulk csv[{n}]', bulk_post, {'rows': n}, repeat=3))
+            # Опрос во время генерации не читает импортированные примеры из сессии
+            results.append(bench(f'GET /api/message_global after import[{n}]',
+                                 lambda: client.get('/api/message_global'), {'rows': n}))
+
+            # Для сравнения - та же таблица через поля формы example_{n}_{field}
+            if n > 500:
+                continue
+            form = {}
+            for i, row in enumerate(_rows(n), start=1):
+                for field, value in zip(FIELDS, row):
+                    form[f'example_{i}_{field}'] = value
+
+            def form_post(form=form):
+                with quiet():
+                    response = client.post('/step2', data=form)
+                assert response.status_code == 302, response.status_code
+            results.append(bench(f'POST /step2 form[{n}]', form_post, {'rows': n}, repeat=3))
+
+    return results
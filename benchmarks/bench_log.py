@@ -0,0 +1,77 @@
+"""
+Бенчмарк сегментированного лога (segmented_log.py): чтение хвоста, секции,
+диапазона по времени и поиск против чтения всего output.log целиком,
+а также хвост и поиск по одному файлу без mmap (SegmentedLog.from_file).
+"""
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+from benchmarks.harness import bench
+
+SUITE = 'log'
+
+SECTION_LINE = '-' * 78
+
+
+def _write_log(log, lines):
+    """Лог в формате output.log: секции, метка времени каждые 50 строк"""
+    base = datetime(2025, 12, 14, 9, 0, 0).timestamp()
+    sections = ('GLOBAL CODE GEN', 'FINAL RESULT PARSER CODE', 'PAGINATION CODE GEN')
+    chunk = []
+    for i in range(lines):
+        if i % (lines // len(sections)) == 0 and i // (lines // len(sections)) < len(sections):
+            title = sections[i // (lines // len(sections))]
+            chunk.append(f'{SECTION_LINE}\n\n{title.center(78).rstrip()}\n\n{SECTION_LINE}\n\n\n')
+        if i % 50 == 0:
+            chunk.append(datetime.fromtimestamp(base + i).strftime('%d.%m.%Y %H:%M:%S') + '\n')
+        marker = ' oldprice-missing' if i % 9973 == 0 else ''
+        chunk.append(f'Найдено {i % 23 + 1} возможных селекторов для .product-card__title > a{marker}\n')
+        if len(chunk) >= 2000:
+            log.append(''.join(chunk))
+            chunk = []
+    log.append(''.join(chunk))
+    log.flush()
+    return base
+
+
+def run(quick=False):
+    from segmented_log import SegmentedLog
+
+    results = []
+    for lines in ([20_000] if quick else [20_000, 400_000]):
+        tmp = tempfile.mkdtemp(prefix='apsp_bench_log_')
+        try:
+            log = SegmentedLog(os.path.join(tmp, 'log'))
+            base = _write_log(log, lines)
+            params = {'lines': lines, 'bytes': log.size, 'segments': len(log.segments)}
+
+            # Как было: весь лог одним файлом, читается целиком
+            whole_path = os.path.join(tmp, 'output.log')
+            with open(whole_path, 'wb') as f:
+                for chunk in log.iter_bytes():
+                    f.write(chunk)
+
+            def read_whole():
+                with open(whole_path, 'r', encoding='utf-8') as f:
+                    return f.read()
+
+            results.append(bench(f'read_whole[{lines}]', read_whole, params, repeat=3))
+            results.append(bench(f'open_existing[{lines}]', lambda: SegmentedLog(log.directory), params, repeat=3))
+            results.append(bench(f'tail[{lines},200]', lambda: log.read(log.tail_offset(200)), params))
+            results.append(bench(f'section[{lines}]',
+                                 lambda: log.read(*log.section_offsets('GLOBAL CODE GEN')), params, repeat=3))
+            results.append(bench(f'time_range[{lines},10min]',
+                                 lambda: log.read(*log.time_range_offsets(base + lines // 2, base + lines // 2 + 600)),
+                                 params))
+            results.append(bench(f'search[{lines}]', lambda: log.search('oldprice-missing', 100), params, repeat=3))
+
+            # Чужой файл (output.log) без mmap: читается только нужный диапазон
+            external = SegmentedLog.from_file(whole_path)
+            results.append(bench(f'file_tail[{lines},200]', lambda: external.read(external.tail_offset(200)), params))
+            results.append(bench(f'file_search[{lines}]', lambda: external.search('oldprice-missing', 100),
+                                 params, repeat=3))
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return results
@@ -0,0 +1,139 @@
+"""
+Бенчмарк холодного старта app.py.
+
+Запускает `python -X importtime -c "import app"` в отдельных процессах,
+считает медиану времени импорта app и раскладку по модулям верхнего уровня.
+
+Запуск (из корня репозитория):
+    python benchmarks/bench_startup.py                      # вывести JSON с результатами
+    python benchmarks/bench_startup.py --check              # сравнить с baselines/startup.json
+    python benchmarks/bench_startup.py --update-baseline    # перезаписать baseline
+
+Холодный старт измерялся на Linux x86_64, Python 3.11, Flask 3.0.0:
+медиана ~165 мс на импорт app, из них ~155 мс приходится на flask/werkzeug,
+собственные модули приложения вместе - ~5 мс (больше всего workspaces вместе
+с segmented_log - ~1 мс). Цель: холодный старт не хуже baselines/startup.json
+x DEFAULT_THRESHOLD. app.py не импортирует zipfile/io при старте, описания полей
+читаются из бинарного снапшота fields_descriptions.snapshot (если он собран при
+деплое); индекс рабочих папок и их фоновая очистка запускаются при первом
+обращении, а не при импорте.
+"""
+import argparse
+import compileall
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_FILE = os.path.join(REPO_ROOT, 'benchmarks', 'baselines', 'startup.json')
+
+# Допустимое замедление относительно baseline (во сколько раз)
+DEFAULT_THRESHOLD = 1.5
+
+
+def parse_importtime(stderr):
+    """
+    Разбирает вывод -X importtime.
+
+    Returns:
+        tuple: (время импорта app в мкс, {модуль, импортированный из app: cumulative мкс})
+    """
+    app_us = None
+    top_level = {}
+    pending = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        # importtime печатает дочерние модули раньше родителя, с отступом +2 пробела
+        indent = len(name) - len(name.lstrip(' '))
+        name = name.strip()
+        if indent <= 1:
+            if name == 'app':
+                app_us = int(cumulative_us)
+                top_level = pending
+            pending = {}
+        elif indent <= 3:
+            pending[name] = pending.get(name, 0) + int(cumulative_us)
+    return app_us, top_level
+
+
+def measure_once():
+    """Один холодный запуск интерпретатора с импортом app"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import app'],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_importtime(proc.stderr)
+
+
+def run(repeats):
+    # Холодный старт меряется с готовым байткодом: при PYTHONDONTWRITEBYTECODE
+    # устаревший .pyc не перезаписывается, и каждый запуск компилировал бы модуль заново
+    compileall.compile_dir(REPO_ROOT, maxlevels=0, quiet=1)
+    app_times = []
+    per_module = {}
+    for _ in range(repeats):
+        app_us, top_level = measure_once()
+        if app_us is not None:
+            app_times.append(app_us)
+        for name, value in top_level.items():
+            per_module.setdefault(name, []).append(value)
+
+    modules = {name: round(statistics.median(values) / 1000, 3) for name, values in per_module.items()}
+    modules = dict(sorted(modules.items(), key=lambda item: item[1], reverse=True))
+    return {
+        'benchmark': 'startup',
+        'python': sys.version.split()[0],
+        'repeats': repeats,
+        'import_app_ms_median': round(statistics.median(app_times) / 1000, 3),
+        'import_app_ms_min': round(min(app_times) / 1000, 3),
+        'modules_ms': modules,
+    }
+
+
+def check(result, threshold):
+    """Сравнивает результат с baseline, возвращает код выхода"""
+    if not os.path.exists(BASELINE_FILE):
+        print(f'Baseline {BASELINE_FILE} не найден', file=sys.stderr)
+        return 2
+    with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    limit = baseline['import_app_ms_median'] * threshold
+    current = result['import_app_ms_median']
+    if current > limit:
+        print(f'РЕГРЕССИЯ: холодный старт {current} мс > {limit:.1f} мс '
+              f'(baseline {baseline["import_app_ms_median"]} мс x {threshold})', file=sys.stderr)
+        return 1
+    print(f'OK: холодный старт {current} мс <= {limit:.1f} мс', file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарк холодного старта app.py')
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--check', action='store_true', help='сравнить с baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    result = run(args.repeats)
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+
+    if args.update_baseline:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+    if args.check:
+        return check(result, args.threshold)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
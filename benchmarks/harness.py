@@ -0,0 +1,194 @@
+"""
+Общая обвязка для бенчмарков: замер, изолированное окружение приложения,
+выгрузка результатов в JSON и сравнение с baseline.
+"""
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_DIR = os.path.join(REPO_ROOT, 'benchmarks', 'baselines')
+
+# Приложение использует относительные пути, поэтому корень репозитория
+# добавляем в sys.path явно (после chdir '' уже не указывает на него)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+# Минимальная длительность одного замера при автоподборе количества повторов
+MIN_SAMPLE_SECONDS = 0.05
+
+
+@contextlib.contextmanager
+def quiet():
+    """Глушит print() из приложения, чтобы вывод в консоль не искажал замеры"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def _calibrate(func):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SAMPLE_SECONDS or number >= 1_000_000:
+            return number
+        number *= 10 if elapsed < MIN_SAMPLE_SECONDS / 10 else 2
+
+
+def bench(name, func, params=None, repeat=5, setup=None):
+    """
+    Замеряет func и возвращает результат в формате для JSON.
+
+    Если передан setup, он вызывается перед каждым замером (вне таймера),
+    а func выполняется по одному разу на замер.
+
+    Returns:
+        dict: {'name', 'params', 'number', 'repeat', 'median_us', 'min_us'}
+    """
+    samples = []
+    if setup is None:
+        number = _calibrate(func)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - start) / number)
+    else:
+        number = 1
+        for _ in range(repeat):
+            setup()
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+
+    return {
+        'name': name,
+        'params': params or {},
+        'number': number,
+        'repeat': repeat,
+        'median_us': round(statistics.median(samples) * 1e6, 3),
+        'min_us': round(min(samples) * 1e6, 3),
+    }
+
+
+def latency_result(name, samples, params=None):
+    """
+    Результат в формате bench() по готовым замерам задержки (секунды),
+    дополнительно с p95/p99 - для нагрузочных тестов.
+    """
+    ordered = sorted(samples)
+
+    def percentile(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        'name': name,
+        'params': params or {},
+        'number': 1,
+        'repeat': len(ordered),
+        'median_us': round(statistics.median(ordered) * 1e6, 3),
+        'min_us': round(ordered[0] * 1e6, 3),
+        'p95_us': round(percentile(0.95) * 1e6, 3),
+        'p99_us': round(percentile(0.99) * 1e6, 3),
+    }
+
+
+def _rebind_workspaces():
+    """
+    app.py импортируется один раз на процесс, а WorkspaceManager запоминает
+    абсолютный путь при создании - если app уже импортирован в другой папке,
+    рабочие папки переносятся в текущую. Возвращает менеджер или None.
+    """
+    app = sys.modules.get('app')
+    if app is None:
+        return None
+    from workspaces import WorkspaceManager
+    previous = app.workspaces
+    previous.stop_sweeper()
+    app.workspaces = WorkspaceManager(app.WORKSPACES_DIR, quota_bytes=previous.quota_bytes,
+                                      ttl_seconds=previous.ttl_seconds, sweep_interval=previous.sweep_interval)
+    return app.workspaces
+
+
+@contextlib.contextmanager
+def isolated_workdir():
+    """
+    Временная рабочая папка с копией content_files/ и реестра полей.
+
+    app.py пишет data/submissions.json и читает content_files/ относительно cwd,
+    поэтому бенчмарки не должны трогать рабочие файлы репозитория: app
+    импортируется только внутри isolated_workdir(). Фоновая очистка рабочих
+    папок останавливается на выходе, пока временная папка ещё существует.
+    """
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix='apsp_bench_') as tmp:
+        shutil.copytree(os.path.join(REPO_ROOT, 'content_files'), os.path.join(tmp, 'content_files'))
+        shutil.copytree(os.path.join(REPO_ROOT, 'add_files'), os.path.join(tmp, 'add_files'))
+        os.makedirs(os.path.join(tmp, 'data'))
+        os.chdir(tmp)
+        try:
+            with quiet():
+                from extract_fields_description import extract_fields_description
+                extract_fields_description()
+            _rebind_workspaces()
+            yield tmp
+        finally:
+            app = sys.modules.get('app')
+            if app is not None:
+                app.workspaces.stop_sweeper()
+            os.chdir(old_cwd)
+
+
+def make_report(suite, results):
+    return {
+        'suite': suite,
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': {result['name']: result for result in results},
+    }
+
+
+def baseline_path(suite):
+    return os.path.join(BASELINES_DIR, f'{suite}.json')
+
+
+def load_baseline(suite):
+    path = baseline_path(suite)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(report):
+    with open(baseline_path(report['suite']), 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+        f.write('\n')
+
+
+def compare(report, baseline, threshold):
+    """
+    Сравнивает медианы с baseline.
+
+    Returns:
+        list: регрессии [(name, baseline_us, current_us, ratio)], где ratio > threshold
+    """
+    regressions = []
+    for name, base in baseline.get('results', {}).items():
+        current = report['results'].get(name)
+        if current is None or not base.get('median_us'):
+            continue
+        ratio = current['median_us'] / base['median_us']
+        if ratio > threshold:
+            regressions.append((name, base['median_us'], current['median_us'], round(ratio, 2)))
+    return regressions
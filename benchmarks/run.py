@@ -0,0 +1,79 @@
+"""
+Запуск набора бенчмарков с выводом JSON и проверкой регрессий.
+
+Запуск (из корня репозитория):
+    python -m benchmarks.run                              # все наборы, JSON в stdout
+    python -m benchmarks.run --suite core --output out.json
+    python -m benchmarks.run --check --threshold 2.0      # сравнить с benchmarks/baselines/<suite>.json
+    python -m benchmarks.run --update-baseline            # перезаписать baseline
+
+Холодный старт замеряется отдельно: python benchmarks/bench_startup.py --check
+"""
+import argparse
+import importlib
+import json
+import sys
+
+from benchmarks.harness import compare, load_baseline, make_report, save_baseline
+
+# Имя набора -> модуль с функцией run(quick=False)
+SUITES = {
+    'core': 'benchmarks.bench_core',
+    'e2e': 'benchmarks.bench_e2e',
+    'import': 'benchmarks.bench_import',
+    'crawl_plan': 'benchmarks.bench_crawl_plan',
+    'generation': 'benchmarks.bench_generation',
+    'admission': 'benchmarks.bench_admission',
+    'log': 'benchmarks.bench_log',
+    'field_search': 'benchmarks.bench_field_search',
+    'autosave': 'benchmarks.bench_autosave',
+    'code_diff': 'benchmarks.bench_code_diff',
+}
+
+DEFAULT_THRESHOLD = 2.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Бенчмарки APSP front')
+    parser.add_argument('--suite', action='append', choices=sorted(SUITES), help='набор (можно несколько раз)')
+    parser.add_argument('--quick', action='store_true', help='только малые размеры входа')
+    parser.add_argument('--output', help='файл для JSON с результатами')
+    parser.add_argument('--check', action='store_true', help='сравнить с baseline')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='допустимое замедление медианы относительно baseline')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    reports = {}
+    for suite in args.suite or list(SUITES):
+        module = importlib.import_module(SUITES[suite])
+        reports[suite] = make_report(suite, module.run(quick=args.quick))
+        print(f'{suite}: {len(reports[suite]["results"])} замеров', file=sys.stderr)
+
+    output = json.dumps(reports, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.update_baseline:
+        for report in reports.values():
+            save_baseline(report)
+
+    exit_code = 0
+    if args.check:
+        for suite, report in reports.items():
+            baseline = load_baseline(suite)
+            if baseline is None:
+                print(f'{suite}: baseline не найден', file=sys.stderr)
+                exit_code = exit_code or 2
+                continue
+            for name, base_us, current_us, ratio in compare(report, baseline, args.threshold):
+                print(f'РЕГРЕССИЯ {suite}/{name}: {base_us} мкс -> {current_us} мкс (x{ratio})', file=sys.stderr)
+                exit_code = 1
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Модуль версий result_code.ts для инкрементальной доставки кода на шаг 6.
+
+Каждый отданный клиенту текст кода запоминается как снапшот; версия -
+хеш содержимого, поэтому одна и та же версия узнаётся и после перегенерации
+(в новой рабочей папке), и в другой вкладке. Клиент присылает известную ему
+версию (GET /api/result_code?since=<версия>) и получает построчный патч:
+    {"version": "9f2c...", "base": "41ab...", "lines": 812,
+     "hunks": [[120, 3, ["строка 1", "строка 2"]], [640, 0, ["новая строка"]]]}
+Ханк [start, count, lines] - строки старой версии с номерами
+start..start+count-1 (с нуля) заменяются на lines. Ханки идут по возрастанию
+start и не пересекаются. Если базовая версия неизвестна (перезапуск сервера,
+вытеснение), патч не меньше самого текста или его слишком дорого считать
+(код перегенерирован почти целиком), отдаётся весь текст: "full".
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from difflib import SequenceMatcher
+
+# Патч не считается, если произведение числа изменившихся строк старой и новой
+# версии больше этого: SequenceMatcher квадратичен по длине изменившейся середины
+DIFF_MAX_CELLS = 4_000_000
+# ...или если середина больше DIFF_RATIO_CELLS, а верхняя оценка доли совпадающих
+# строк меньше DIFF_MIN_RATIO: код переписан почти целиком, патч не окупится,
+# а поиск совпадений идёт дольше всего
+DIFF_RATIO_CELLS = 10_000
+DIFF_MIN_RATIO = 0.5
+
+
+def code_version(text):
+    """Версия текста - первые 16 символов sha256 от содержимого"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def split_lines(text):
+    """
+    Строки текста как в редакторе CodeMirror: по '\\n', без переводов строк.
+    Текст, заканчивающийся переводом строки, даёт пустую последнюю строку.
+    """
+    return text.split('\n')
+
+
+def diff_lines(old, new):
+    """
+    Построчный патч old -> new (списки строк).
+
+    Общие начало и конец отрезаются сразу, SequenceMatcher работает только
+    с изменившейся серединой - при правке в одном месте большого файла
+    стоимость почти не зависит от его длины. Слишком большая или почти целиком
+    переписанная середина (DIFF_MAX_CELLS, DIFF_MIN_RATIO) не сравнивается.
+
+    Returns:
+        list | None: [[start, count, [строки]], ...] в номерах строк old;
+            None - патч слишком дорого считать, нужен весь текст
+    """
+    prefix = 0
+    limit = min(len(old), len(new))
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+    old_middle = old[prefix:len(old) - suffix]
+    new_middle = new[prefix:len(new) - suffix]
+    if not old_middle and not new_middle:
+        return []
+    if not old_middle or not new_middle:
+        return [[prefix, len(old_middle), new_middle]]
+
+    if len(old_middle) * len(new_middle) > DIFF_MAX_CELLS:
+        return None
+    matcher = SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+    # Оценки сверху: по длинам - бесплатно, по общим строкам без учёта порядка - за линейное время
+    if len(old_middle) * len(new_middle) > DIFF_RATIO_CELLS and (
+            matcher.real_quick_ratio() < DIFF_MIN_RATIO or matcher.quick_ratio() < DIFF_MIN_RATIO):
+        return None
+
+    hunks = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        hunks.append([prefix + i1, i2 - i1, new_middle[j1:j2]])
+    return hunks
+
+
+def apply_hunks(lines, hunks):
+    """Применяет патч к списку строк (с конца, чтобы номера строк не сдвигались)"""
+    lines = list(lines)
+    for start, count, new_lines in reversed(hunks):
+        lines[start:start + count] = new_lines
+    return lines
+
+
+class CodeSnapshots:
+    """
+    Снапшоты кода в памяти процесса с вытеснением давно не запрошенных.
+
+    Args:
+        max_bytes: суммарный объём хранимых текстов
+        max_diffs: сколько готовых патчей держать в кеше (пары версий)
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_diffs=256):
+        self.max_bytes = max_bytes
+        self.max_diffs = max_diffs
+        self.total_bytes = 0
+        # Порядок - от давно запрошенных к недавним (LRU)
+        self._snapshots = OrderedDict()
+        self._diffs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, text):
+        """Запоминает текст, возвращает его версию"""
+        version = code_version(text)
+        with self._lock:
+            if version in self._snapshots:
+                self._snapshots.move_to_end(version)
+                return version
+            self._snapshots[version] = (split_lines(text), len(text))
+            self.total_bytes += len(text)
+            # Только что добавленный снапшот не вытесняется, даже если он больше квоты
+            while self.total_bytes > self.max_bytes and len(self._snapshots) > 1:
+                evicted, (_, size) = self._snapshots.popitem(last=False)
+                self.total_bytes -= size
+                for key in [key for key in self._diffs if evicted in key]:
+                    del self._diffs[key]
+        return version
+
+    def _lines(self, version):
+        with self._lock:
+            snapshot = self._snapshots.get(version)
+            if snapshot is None:
+                return None
+            self._snapshots.move_to_end(version)
+            return snapshot[0]
+
+    def diff(self, since, version):
+        """
+        Патч от версии since к версии version.
+
+        Returns:
+            list | None: ханки или None, если одна из версий неизвестна
+                или патч слишком дорого считать (см. diff_lines)
+        """
+        key = (since, version)
+        with self._lock:
+            if key in self._diffs:
+                # None тоже кешируется - повторный опрос не сравнивает тексты заново
+                self._diffs.move_to_end(key)
+                return self._diffs[key]
+        old = self._lines(since)
+        new = self._lines(version)
+        if old is None or new is None:
+            return None
+        hunks = diff_lines(old, new)
+        with self._lock:
+            self._diffs[key] = hunks
+            while len(self._diffs) > self.max_diffs:
+                self._diffs.popitem(last=False)
+        return hunks
+
+    def delta(self, text, since=None):
+        """
+        Ответ для клиента, знающего версию since.
+
+        Returns:
+            dict: {'version', 'lines', 'base', 'hunks'} или {'version', 'lines', 'full'}
+        """
+        version = self.put(text)
+        lines = self._lines(version)
+        line_count = len(lines) if lines is not None else len(split_lines(text))
+        hunks = self.diff(since, version) if since else None
+        if hunks is not None:
+            patch_size = sum(len(line) + 1 for _, _, new_lines in hunks for line in new_lines) + 16 * len(hunks)
+            if patch_size < len(text):
+                return {'version': version, 'lines': line_count, 'base': since, 'hunks': hunks}
+        return {'version': version, 'lines': line_count, 'full': text}
@@ -0,0 +1,193 @@
+// Автосохранение шагов 2 и 3: изменения копятся в очереди и уходят
+// пачкой в PATCH /api/wizard (см. wizard_state.py) после паузы в наборе.
+// Вместе с правками отправляются версия и структура (счётчик добавлений и
+// удалений примеров): правки ячеек сервер применяет к более новой версии,
+// пока номера примеров не менялись, иначе отвечает 409 - такие правки не
+// повторяются, страницу нужно обновить.
+(function () {
+    // Пауза после последнего изменения и максимальная задержка отправки, мс
+    const DEBOUNCE_MS = 600;
+    const MAX_DELAY_MS = 3000;
+    const STRUCTURAL_OPS = ['add_example', 'remove_example'];
+
+    function WizardAutosave(options) {
+        this.url = options.url || '/api/wizard';
+        this.version = options.version || 0;
+        this.structure = options.structure || 0;
+        // Версия и структура, которые будут на сервере после ответа на отправленные запросы
+        this.sentVersion = this.version;
+        this.sentStructure = this.structure;
+        this.statusElement = options.statusElement || null;
+        this.queue = [];
+        this.inFlight = null;
+        this.timer = null;
+        this.firstQueuedAt = 0;
+        this.stopped = false;
+
+        const self = this;
+        // Закрытие вкладки или уход со страницы - отправляем то, что накопилось
+        window.addEventListener('pagehide', function () {
+            self.flush(true);
+        });
+        document.addEventListener('visibilitychange', function () {
+            if (document.visibilityState === 'hidden') {
+                self.flush(true);
+            }
+        });
+    }
+
+    // Ключ для схлопывания: повторное изменение той же ячейки заменяет предыдущее
+    function coalesceKey(op) {
+        if (op.op === 'set_cell') {
+            return 'cell:' + op.example + ':' + op.field;
+        }
+        if (op.op === 'set_search') {
+            return 'search:' + op.field;
+        }
+        if (op.op === 'set_links_items') {
+            return 'links';
+        }
+        return null;
+    }
+
+    WizardAutosave.prototype.push = function (op) {
+        if (this.stopped) {
+            return;
+        }
+        const key = coalesceKey(op);
+        if (key !== null) {
+            // Ищем то же изменение в хвосте очереди - до первого добавления/удаления примера
+            for (let i = this.queue.length - 1; i >= 0; i--) {
+                if (STRUCTURAL_OPS.includes(this.queue[i].op)) {
+                    break;
+                }
+                if (coalesceKey(this.queue[i]) === key) {
+                    this.queue.splice(i, 1);
+                    break;
+                }
+            }
+        }
+        this.queue.push(op);
+        this.schedule();
+    };
+
+    WizardAutosave.prototype.schedule = function () {
+        const self = this;
+        const now = Date.now();
+        if (!this.firstQueuedAt) {
+            this.firstQueuedAt = now;
+        }
+        if (this.timer) {
+            clearTimeout(this.timer);
+        }
+        const delay = Math.max(0, Math.min(DEBOUNCE_MS, this.firstQueuedAt + MAX_DELAY_MS - now));
+        this.timer = setTimeout(function () {
+            self.flush(false);
+        }, delay);
+        this.setStatus('pending', 'Есть несохранённые изменения');
+    };
+
+    WizardAutosave.prototype.flush = function (leavingPage) {
+        if (this.timer) {
+            clearTimeout(this.timer);
+            this.timer = null;
+        }
+        // Пока предыдущая пачка не сохранена, новые изменения ждут в очереди. При уходе
+        // со страницы ждать нельзя: пачка уходит сразу, с версией и структурой,
+        // которые получатся после сохранения предыдущей (сервер применяет их по очереди)
+        if (this.stopped || !this.queue.length || (this.inFlight && !leavingPage)) {
+            return;
+        }
+        const ops = this.queue;
+        this.queue = [];
+        this.firstQueuedAt = 0;
+        this.send(ops, leavingPage);
+    };
+
+    WizardAutosave.prototype.send = function (ops, leavingPage) {
+        const self = this;
+        const base = this.inFlight ? { version: this.sentVersion, structure: this.sentStructure }
+            : { version: this.version, structure: this.structure };
+        this.sentVersion = base.version + 1;
+        this.sentStructure = base.structure + (ops.some(function (op) {
+            return STRUCTURAL_OPS.includes(op.op);
+        }) ? 1 : 0);
+        this.setStatus('saving', 'Сохранение...');
+        const request = fetch(this.url, {
+            method: 'PATCH',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ version: base.version, structure: base.structure, ops: ops }),
+            // Запрос должен дойти, даже если вкладку уже закрывают
+            keepalive: !!leavingPage
+        })
+            .then(function (response) {
+                return response.json().catch(function () {
+                    return {};
+                }).then(function (data) {
+                    if (response.ok) {
+                        if (data.version > self.version) {
+                            self.version = data.version;
+                            self.structure = data.structure;
+                        }
+                        self.setStatus('saved', 'Сохранено');
+                        return;
+                    }
+                    if (response.status === 409) {
+                        // Примеры добавляли, удаляли или заменяли в другой вкладке - номера примеров
+                        // в правках уже указывают не туда, повторная отправка испортила бы данные
+                        self.stopped = true;
+                        self.queue = [];
+                        self.setStatus('error', 'Данные изменены в другой вкладке - обновите страницу');
+                        return;
+                    }
+                    if (response.status === 400) {
+                        // Повтор не поможет - изменения отбрасываем
+                        console.error('Автосохранение отклонено:', data.error);
+                        self.setStatus('error', 'Не удалось сохранить: ' + (data.error || 'ошибка данных'));
+                        return;
+                    }
+                    throw new Error(data.error || ('HTTP ' + response.status));
+                });
+            })
+            .catch(function (error) {
+                // Сеть или сервер недоступны - вернём изменения в очередь и повторим позже
+                console.error('Ошибка автосохранения:', error);
+                self.queue = ops.concat(self.queue);
+                self.setStatus('error', 'Не удалось сохранить, повторим');
+            })
+            .finally(function () {
+                if (self.inFlight !== request) {
+                    // Ответ на более раннюю пачку, следующая ещё отправляется
+                    return;
+                }
+                self.inFlight = null;
+                // Ошибка сети - следующая пачка считается от последней подтверждённой версии
+                self.sentVersion = self.version;
+                self.sentStructure = self.structure;
+                if (self.queue.length && !self.stopped) {
+                    self.schedule();
+                }
+            });
+        this.inFlight = request;
+    };
+
+    // Полная отправка формы заменяет всё состояние - отложенные изменения больше не нужны
+    WizardAutosave.prototype.stop = function () {
+        this.stopped = true;
+        this.queue = [];
+        if (this.timer) {
+            clearTimeout(this.timer);
+            this.timer = null;
+        }
+    };
+
+    WizardAutosave.prototype.setStatus = function (state, text) {
+        if (!this.statusElement) {
+            return;
+        }
+        this.statusElement.dataset.state = state;
+        this.statusElement.textContent = text;
+    };
+
+    window.WizardAutosave = WizardAutosave;
+})();
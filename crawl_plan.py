@@ -0,0 +1,221 @@
+"""
+Модуль построения плана обхода поисковой выдачи.
+
+По ссылке на 2ю страницу поиска (url_search_query_page_2) определяет шаблон
+параметра пагинации и лениво генерирует ссылки на все страницы выдачи,
+а также оценивает количество запросов и размер пачек для заданной параллельности.
+Список ссылок никогда не материализуется целиком: ссылка на страницу n
+вычисляется за O(1), поэтому план работает и для миллионов страниц.
+"""
+import re
+from collections import OrderedDict
+from itertools import islice
+from urllib.parse import urlsplit
+
+# Имена параметров, которые обычно означают номер страницы
+PAGE_PARAM_NAMES = ('page', 'p', 'pg', 'pagen', 'pagenum', 'page_num', 'pagenumber', 'paged', 'страница')
+# Имена параметров, которые обычно означают смещение (offset-пагинация)
+OFFSET_PARAM_NAMES = ('offset', 'start', 'from', 'skip', 'first')
+
+# Параллельность и размер пачки по умолчанию
+DEFAULT_CONCURRENCY = 8
+BATCHES_PER_WAVE = 4
+
+# Сколько ссылок можно выгрузить одним ответом (остальные - следующими запросами с offset)
+MAX_EXPORT_PAGES = 100000
+
+_PATH_PAGE_RE = re.compile(r'(?:page|p|pg|pagen|страница)[-_/=]?(\d+)(?=\D|$)', re.IGNORECASE)
+
+
+class PageTemplate:
+    """
+    Шаблон ссылки на страницу выдачи: prefix + value(n) + suffix,
+    где value(n) = first + (n - 1) * step.
+    """
+
+    __slots__ = ('prefix', 'suffix', 'first', 'step', 'kind')
+
+    def __init__(self, prefix, suffix, first=1, step=1, kind='page'):
+        self.prefix = prefix
+        self.suffix = suffix
+        self.first = first
+        self.step = step
+        self.kind = kind
+
+    def page_url(self, page):
+        """Ссылка на страницу с номером page (нумерация с 1)"""
+        if page < 1:
+            raise ValueError('Номер страницы должен быть >= 1')
+        return f'{self.prefix}{self.first + (page - 1) * self.step}{self.suffix}'
+
+    def pattern(self):
+        """Человекочитаемый шаблон для отображения"""
+        if self.kind == 'offset':
+            return f'{self.prefix}{{(page-1)*{self.step}}}{self.suffix}'
+        return f'{self.prefix}{{page}}{self.suffix}'
+
+    def __repr__(self):
+        return f'PageTemplate({self.pattern()!r})'
+
+
+def _parse_int(value):
+    """Парсит число из строки шага 3 ("1 234", "1234 "), пустое -> None"""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    digits = re.sub(r'\s', '', str(value))
+    if not digits:
+        return None
+    if not digits.isdigit():
+        raise ValueError(f'Ожидалось целое число: {value!r}')
+    return int(digits)
+
+
+def _query_param_spans(url, query_start):
+    """Итерирует (name, value, value_start, value_end) для параметров query-строки"""
+    pos = query_start
+    end = url.find('#', query_start)
+    if end == -1:
+        end = len(url)
+    while pos < end:
+        amp = url.find('&', pos, end)
+        if amp == -1:
+            amp = end
+        eq = url.find('=', pos, amp)
+        if eq != -1:
+            yield url[pos:eq], url[eq + 1:amp], eq + 1, amp
+        pos = amp + 1
+
+
+def infer_page_template(url_page_2):
+    """
+    Определяет шаблон пагинации по ссылке на 2ю страницу поиска.
+
+    Поддерживаются:
+      - параметр со значением 2: ?page=2, ?p=2, ?PAGEN_1=2
+      - номер страницы в пути: /page/2/, /page-2/, /p2, /page2.html
+      - offset-пагинация: ?offset=24, ?start=20 (шаг = значение на 2й странице)
+
+    Raises:
+        ValueError: если номер страницы в ссылке найти не удалось
+    """
+    if not url_page_2 or not isinstance(url_page_2, str):
+        raise ValueError('Не указана ссылка на 2ю страницу поиска')
+    url = url_page_2.strip()
+
+    query_start = url.find('?')
+    if query_start != -1:
+        params = list(_query_param_spans(url, query_start + 1))
+
+        candidates = [p for p in params if p[1] == '2']
+        # Предпочитаем параметры с "говорящими" именами (page, PAGEN_1, ...)
+        named = [p for p in candidates if re.sub(r'[_\d]+$', '', p[0].lower()) in PAGE_PARAM_NAMES]
+        chosen = (named or candidates or [None])[0]
+        if chosen is not None:
+            _, _, value_start, value_end = chosen
+            return PageTemplate(url[:value_start], url[value_end:])
+
+        for name, value, value_start, value_end in params:
+            if name.lower() in OFFSET_PARAM_NAMES and value.isdigit() and int(value) > 0:
+                return PageTemplate(url[:value_start], url[value_end:], first=0, step=int(value), kind='offset')
+
+    # Номер страницы в пути
+    path_end = query_start if query_start != -1 else len(url)
+    netloc_end = url.find('/', len(urlsplit(url).scheme) + 3) if '://' in url else url.find('/')
+    path_start = netloc_end if netloc_end != -1 else path_end
+    path_matches = [m for m in _PATH_PAGE_RE.finditer(url, path_start, path_end) if m.group(1) == '2']
+    if path_matches:
+        match = path_matches[-1]
+        return PageTemplate(url[:match.start(1)], url[match.end(1):])
+
+    # Последнее "отдельно стоящее" 2 в пути
+    standalone = [m for m in re.finditer(r'(?<!\d)2(?!\d)', url[path_start:path_end])]
+    if standalone:
+        match = standalone[-1]
+        return PageTemplate(url[:path_start + match.start()], url[path_start + match.end():])
+
+    raise ValueError('Не удалось найти номер страницы в ссылке на 2ю страницу поиска')
+
+
+def iter_page_urls(template, pages, start=1):
+    """
+    Лениво генерирует ссылки на страницы start..pages.
+
+    Args:
+        template: PageTemplate
+        pages: общее количество страниц в пагинации
+        start: номер первой страницы
+    """
+    for page in range(max(1, start), pages + 1):
+        yield template.page_url(page)
+
+
+def iter_batches(iterable, batch_size):
+    """Разбивает итератор на пачки по batch_size элементов (последняя может быть меньше)"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def estimate_plan(pages, concurrency=DEFAULT_CONCURRENCY, total_results=None, batch_size=None):
+    """
+    Оценивает объём обхода выдачи.
+
+    Returns:
+        OrderedDict: pages, requests, concurrency, batch_size, batches, waves, results_per_page
+    """
+    pages = max(0, int(pages or 0))
+    concurrency = max(1, int(concurrency or DEFAULT_CONCURRENCY))
+    batch_size = max(1, int(batch_size or concurrency * BATCHES_PER_WAVE))
+
+    results_per_page = None
+    if total_results and pages:
+        results_per_page = -(-int(total_results) // pages)
+
+    return OrderedDict([
+        ("pages", pages),
+        ("requests", pages),
+        ("concurrency", concurrency),
+        ("batch_size", batch_size),
+        ("batches", -(-pages // batch_size)),
+        # Количество "волн" запросов при полной загрузке concurrency воркеров
+        ("waves", -(-pages // concurrency)),
+        ("results_per_page", results_per_page),
+    ])
+
+
+def build_crawl_plan(search_request, concurrency=DEFAULT_CONCURRENCY, batch_size=None, preview=5):
+    """
+    Собирает план обхода по данным поискового запроса шага 3.
+
+    Args:
+        search_request: dict с ключами url_search_query_page_2,
+            count_of_page_on_pagination, total_count_of_results
+        concurrency: целевая параллельность
+        batch_size: размер пачки (по умолчанию concurrency * BATCHES_PER_WAVE)
+        preview: сколько первых ссылок показать
+
+    Returns:
+        tuple: (PageTemplate, OrderedDict с описанием плана)
+
+    Raises:
+        ValueError: если данных для плана недостаточно
+    """
+    template = infer_page_template(search_request.get('url_search_query_page_2', ''))
+    pages = _parse_int(search_request.get('count_of_page_on_pagination'))
+    if not pages:
+        raise ValueError('Не указано количество страниц в пагинации')
+    total_results = _parse_int(search_request.get('total_count_of_results'))
+
+    plan = OrderedDict([
+        ("template", template.pattern()),
+        ("pagination", template.kind),
+        ("estimate", estimate_plan(pages, concurrency, total_results, batch_size)),
+        ("preview", list(iter_page_urls(template, min(pages, preview)))),
+        ("last_page_url", template.page_url(pages)),
+    ])
+    return template, plan
@@ -0,0 +1,214 @@
+"""
+Модуль массового импорта примеров для шага 2.
+
+Принимает CSV/TSV/JSONL (файлом или вставкой текста), сопоставляет заголовки
+с выбранными полями и построчно собирает examples_data в том же формате,
+что и обычная форма шага 2: {"simple": [OrderedDict(field -> value), ...]}.
+Данные читаются потоково, без загрузки всего файла в память.
+"""
+import csv
+import io
+import json
+from collections import OrderedDict
+from itertools import chain
+
+# Поля, обязательные для каждого примера (как в валидации step2.html)
+REQUIRED_FIELDS = ['name', 'link', 'price']
+
+# Сколько ошибок по строкам возвращаем пользователю (остальные только считаем)
+MAX_REPORTED_ERRORS = 100
+
+FORMATS = ('csv', 'tsv', 'jsonl')
+
+
+def _normalize_header(value):
+    return str(value).strip().lstrip('\ufeff').casefold().replace('ё', 'е')
+
+
+def build_header_lookup(selected_fields, fields_descriptions=None):
+    """
+    Словарь для сопоставления заголовков колонок с ключами полей.
+
+    Колонку можно назвать ключом поля (price) или его описанием
+    из Fields_static.ts ("Цена товара"), без учёта регистра и ё/е.
+    """
+    fields_descriptions = fields_descriptions or {}
+    lookup = {}
+    for field_key in selected_fields:
+        lookup[_normalize_header(field_key)] = field_key
+        description = fields_descriptions.get(field_key)
+        if description:
+            lookup.setdefault(_normalize_header(description), field_key)
+    return lookup
+
+
+def detect_format(first_line, filename=None):
+    """
+    Определяет формат по расширению файла, иначе по первой строке.
+
+    Returns:
+        str: 'csv', 'tsv' или 'jsonl'
+    """
+    if filename:
+        extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+        if extension in ('tsv', 'tab'):
+            return 'tsv'
+        if extension in ('jsonl', 'ndjson'):
+            return 'jsonl'
+        if extension == 'csv':
+            return 'csv'
+
+    stripped = first_line.lstrip('\ufeff').lstrip()
+    if stripped.startswith('{'):
+        return 'jsonl'
+    if first_line.count('\t') > first_line.count(','):
+        return 'tsv'
+    return 'csv'
+
+
+def _build_example(values, selected_fields, sanitize):
+    example = OrderedDict()
+    for field_key in selected_fields:
+        example[field_key] = sanitize(values.get(field_key, ''))
+    return example
+
+
+def _missing_required(example):
+    return [field for field in REQUIRED_FIELDS if field in example and example[field] == '']
+
+
+def _iter_delimited(lines, delimiter, selected_fields, lookup, sanitize):
+    reader = csv.reader(lines, delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        return
+
+    column_fields = [lookup.get(_normalize_header(cell)) for cell in header]
+    unknown = [cell for cell, field in zip(header, column_fields) if field is None and cell.strip()]
+    if unknown:
+        yield 1, None, 'Неизвестные колонки: ' + ', '.join(unknown)
+    if not any(column_fields):
+        yield 1, None, 'В заголовке нет ни одного из выбранных полей'
+        return
+
+    width = len(header)
+    for row in reader:
+        row_number = reader.line_num
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        if len(row) != width:
+            yield row_number, None, f'Ожидалось колонок: {width}, получено: {len(row)}'
+            continue
+        values = {field: cell for field, cell in zip(column_fields, row) if field is not None}
+        yield row_number, _build_example(values, selected_fields, sanitize), None
+
+
+def _iter_jsonl(lines, selected_fields, lookup, sanitize):
+    for row_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, None, f'Невалидный JSON: {e.msg}'
+            continue
+        if not isinstance(obj, dict):
+            yield row_number, None, 'Ожидался JSON-объект'
+            continue
+
+        values = {}
+        unknown = []
+        for key, value in obj.items():
+            field = lookup.get(_normalize_header(key))
+            if field is None:
+                unknown.append(key)
+            else:
+                values[field] = '' if value is None else (value if isinstance(value, str) else str(value))
+        if unknown:
+            yield row_number, None, 'Неизвестные ключи: ' + ', '.join(unknown)
+            continue
+        yield row_number, _build_example(values, selected_fields, sanitize), None
+
+
+def iter_examples(lines, selected_fields, sanitize, fields_descriptions=None, fmt=None, filename=None):
+    """
+    Потоково разбирает строки CSV/TSV/JSONL в примеры.
+
+    Args:
+        lines: итерируемый источник строк (текстовый поток, список строк)
+        selected_fields: порядок полей, выбранный на шаге 1
+        sanitize: функция очистки значения (sanitize_text из app.py)
+        fields_descriptions: описания полей для сопоставления заголовков
+        fmt: 'csv', 'tsv', 'jsonl' или None (определить автоматически)
+        filename: имя загруженного файла (для определения формата)
+
+    Yields:
+        tuple: (номер строки, пример или None, текст ошибки или None)
+    """
+    lines = iter(lines)
+    first_line = next(lines, None)
+    if first_line is None:
+        return
+    lines = chain([first_line], lines)
+
+    if fmt not in FORMATS:
+        fmt = detect_format(first_line, filename)
+
+    lookup = build_header_lookup(selected_fields, fields_descriptions)
+    if fmt == 'jsonl':
+        rows = _iter_jsonl(lines, selected_fields, lookup, sanitize)
+    else:
+        rows = _iter_delimited(lines, '\t' if fmt == 'tsv' else ',', selected_fields, lookup, sanitize)
+
+    for row_number, example, error in rows:
+        if example is not None:
+            missing = _missing_required(example)
+            if missing:
+                yield row_number, None, 'Не заполнены обязательные поля: ' + ', '.join(missing)
+                continue
+        yield row_number, example, error
+
+
+def import_examples(source, selected_fields, sanitize, fields_descriptions=None, fmt=None, filename=None):
+    """
+    Собирает examples_data из CSV/TSV/JSONL.
+
+    Args:
+        source: строка с данными или бинарный/текстовый поток (request.files[...].stream)
+        остальные аргументы - как у iter_examples
+
+    Returns:
+        tuple: (examples_data, errors, error_count), где
+            examples_data - OrderedDict([("simple", [...])]),
+            errors - первые MAX_REPORTED_ERRORS ошибок вида {"row": n, "error": "..."},
+            error_count - общее количество ошибок
+    """
+    if isinstance(source, str):
+        lines = io.StringIO(source, newline='')
+    elif isinstance(source, io.TextIOBase):
+        lines = source
+    else:
+        # utf-8-sig убирает BOM, который добавляет Excel при сохранении CSV
+        lines = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+
+    examples_list = []
+    errors = []
+    error_count = 0
+    try:
+        for row_number, example, error in iter_examples(lines, selected_fields, sanitize,
+                                                        fields_descriptions, fmt, filename):
+            if error is not None:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'row': row_number, 'error': error})
+            else:
+                examples_list.append(example)
+    except (csv.Error, UnicodeDecodeError) as e:
+        error_count += 1
+        errors.append({'row': None, 'error': f'Не удалось прочитать данные: {e}'})
+
+    if not examples_list and not error_count:
+        error_count = 1
+        errors.append({'row': None, 'error': 'Нет ни одного примера'})
+
+    return OrderedDict([("simple", examples_list)]), errors, error_count
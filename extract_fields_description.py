@@ -1,7 +1,16 @@
 import re
 import os
+import sys
 import hashlib
 import json
+import marshal
+import struct
+
+# Формат бинарного снапшота реестра полей:
+# magic (8 байт) | версия формата (H) | версия marshal (H) | sha256 исходника (32 байта) | marshal(dict)
+SNAPSHOT_MAGIC = b'APSPFLDS'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct('<8sHH32s')
 
 def calculate_file_hash(file_path):
     """
@@ -133,7 +142,101 @@ def extract_fields_description(file_path='add_files/Fields_static.ts', json_path
     return fields_dict
 
 
+def build_fields_snapshot(file_path='add_files/Fields_static.ts', json_path='fields_descriptions.json',
+                          snapshot_path='fields_descriptions.snapshot'):
+    """
+    Собирает бинарный снапшот реестра полей (выполняется на этапе деплоя).
+
+    Снапшот содержит заголовок с версией формата и хешем Fields_static.ts,
+    поэтому при старте приложения не нужно ни парсить JSON, ни прогонять regex.
+
+    Args:
+        file_path: путь к файлу Fields_static.ts
+        json_path: путь к файлу с кешем (fields_descriptions.json)
+        snapshot_path: путь к бинарному снапшоту
+
+    Returns:
+        dict: словарь с полями, записанный в снапшот
+    """
+    fields_dict = extract_fields_description(file_path, json_path)
+    if not fields_dict:
+        return {}
+
+    header = SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        marshal.version,
+        bytes.fromhex(calculate_file_hash(file_path)),
+    )
+    # Пишем во временный файл и атомарно подменяем, чтобы воркеры не прочитали половину файла
+    tmp_path = f'{snapshot_path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(marshal.dumps(dict(fields_dict)))
+    os.replace(tmp_path, snapshot_path)
+
+    print(f"Снапшот реестра полей сохранен в {snapshot_path} ({len(fields_dict)} полей)")
+    return fields_dict
+
+
+def load_fields_snapshot(snapshot_path='fields_descriptions.snapshot', file_path='add_files/Fields_static.ts'):
+    """
+    Загружает реестр полей из бинарного снапшота.
+
+    Снапшот отбрасывается, если не совпадает magic, версия формата, версия marshal
+    или хеш исходного Fields_static.ts (если исходник доступен).
+
+    Returns:
+        dict | None: словарь с полями или None, если снапшот отсутствует/устарел
+    """
+    try:
+        with open(snapshot_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    if len(data) < SNAPSHOT_HEADER.size:
+        return None
+
+    magic, version, marshal_version, source_hash = SNAPSHOT_HEADER.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or marshal_version != marshal.version:
+        return None
+
+    if file_path and os.path.exists(file_path):
+        if calculate_file_hash(file_path) != source_hash.hex():
+            return None
+
+    try:
+        fields_dict = marshal.loads(data[SNAPSHOT_HEADER.size:])
+    except (EOFError, ValueError, TypeError):
+        return None
+
+    return fields_dict if isinstance(fields_dict, dict) else None
+
+
+def read_snapshot_hash(snapshot_path='fields_descriptions.snapshot'):
+    """
+    Хеш Fields_static.ts из заголовка снапшота (без чтения самого реестра).
+
+    Returns:
+        str | None: hex-представление хеша или None, если снапшот отсутствует/повреждён
+    """
+    try:
+        with open(snapshot_path, 'rb') as f:
+            header = f.read(SNAPSHOT_HEADER.size)
+    except OSError:
+        return None
+    if len(header) < SNAPSHOT_HEADER.size:
+        return None
+    magic, _, _, source_hash = SNAPSHOT_HEADER.unpack(header)
+    return source_hash.hex() if magic == SNAPSHOT_MAGIC else None
+
+
 if __name__ == "__main__":
+    # python extract_fields_description.py --snapshot  -> дополнительно собрать бинарный снапшот
+    if '--snapshot' in sys.argv[1:]:
+        build_fields_snapshot()
+
     # Пример использования
     result = extract_fields_description()
     print(f"\nВсего извлечено полей: {len(result)}")
@@ -0,0 +1,149 @@
+"""
+Модуль поиска по реестру полей для шага 1 (typeahead).
+
+Индекс строится один раз по реестру полей (ключ -> описание из Fields_static.ts)
+и пересобирается только при смене хеша Fields_static.ts. Поиск идёт по ключам
+и русским описаниям:
+  - по префиксам слов ("цен" -> "Цена", "image" -> imageLink); поля, с которыми
+    совпала только часть слов запроса, идут после совпавших со всеми словами;
+  - по триграммам - опечатки и неполные слова ("артикл", "ширна"); такие поля
+    идут в выдаче после совпадений по префиксам;
+  - без учёта регистра, ё и е не различаются, ключи в camelCase и snake_case
+    разбиваются на слова (InStock_trigger -> "in stock trigger").
+"""
+import re
+from bisect import bisect_left
+
+# Доля совпавших триграмм запроса, начиная с которой поле попадает в выдачу
+TRIGRAM_THRESHOLD = 0.5
+
+_CAMEL_RE = re.compile(r'(?<=[a-zа-яё0-9])(?=[A-ZА-ЯЁ])')
+_WORD_RE = re.compile(r'[^\W_]+')
+
+
+def normalize(text):
+    """Слова текста в нижнем регистре, ё -> е, camelCase и snake_case разбиты на слова"""
+    text = _CAMEL_RE.sub(' ', str(text)).casefold().replace('ё', 'е')
+    return _WORD_RE.findall(text)
+
+
+def _trigrams(words):
+    grams = set()
+    for word in words:
+        padded = f' {word} '
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class FieldSearchIndex:
+    """
+    Индекс полей для typeahead.
+
+    Args:
+        fields: {ключ поля: описание} в порядке реестра (порядок - вторичная сортировка выдачи)
+        source_hash: хеш Fields_static.ts, по которому построен индекс
+    """
+
+    def __init__(self, fields, source_hash=None):
+        self.source_hash = source_hash
+        self.keys = list(fields)
+        self.descriptions = [fields[key] for key in self.keys]
+        # Ключ без разделителей: "product_id" и "productid" находят одно поле
+        self._compact_keys = [''.join(normalize(key)) for key in self.keys]
+        # Отсортированные (слово, номер поля) - префиксный поиск через bisect
+        self._words = []
+        self._postings = {}
+        # Первые слова описаний - совпадение с ними поднимает поле выше
+        self._leading_words = []
+        for field_id, (key, description) in enumerate(zip(self.keys, self.descriptions)):
+            description_words = normalize(description)
+            words = set(normalize(key)) | set(description_words) | {self._compact_keys[field_id]}
+            self._words.extend((word, field_id) for word in words)
+            for gram in _trigrams(words):
+                self._postings.setdefault(gram, []).append(field_id)
+            self._leading_words.append(
+                description_words[0] if description_words else self._compact_keys[field_id])
+        self._words.sort()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _prefix_matches(self, prefix):
+        """Номера полей, у которых есть слово, начинающееся с prefix"""
+        matches = set()
+        words = self._words
+        i = bisect_left(words, (prefix,))
+        while i < len(words) and words[i][0].startswith(prefix):
+            matches.add(words[i][1])
+            i += 1
+        return matches
+
+    def _trigram_matches(self, words, exclude):
+        """{номер поля: доля совпавших триграмм} для полей не из exclude"""
+        grams = _trigrams(words)
+        if not grams:
+            return {}
+        counts = {}
+        for gram in grams:
+            for field_id in self._postings.get(gram, ()):
+                if field_id not in exclude:
+                    counts[field_id] = counts.get(field_id, 0) + 1
+        total = len(grams)
+        return {field_id: count / total for field_id, count in counts.items()
+                if count / total >= TRIGRAM_THRESHOLD}
+
+    def _item(self, field_id, match):
+        return {'key': self.keys[field_id], 'description': self.descriptions[field_id], 'match': match}
+
+    def search(self, query, limit=20, offset=0):
+        """
+        Поиск полей по запросу.
+
+        Порядок выдачи: точное совпадение ключа, совпадение префикса с первым словом
+        описания, остальные совпадения всех слов по префиксам, затем поля, с которыми
+        совпала только часть слов запроса (по убыванию числа совпавших слов), затем
+        по триграммам; внутри группы - в порядке реестра (по убыванию сходства для триграмм).
+        Пустой запрос - все поля в порядке реестра.
+
+        Returns:
+            tuple: ([{'key', 'description', 'match'}], сколько всего полей подходит)
+        """
+        words = normalize(query)
+        if not words:
+            ids = range(offset, min(len(self.keys), offset + limit))
+            return [self._item(field_id, 'all') for field_id in ids], len(self.keys)
+
+        compact = ''.join(words)
+        # Сколько слов запроса совпало с полем по префиксу: одно несовпавшее
+        # слово ("цена товара") не убирает поле из выдачи, а опускает его ниже
+        word_counts = {}
+        for word in dict.fromkeys(words):
+            for field_id in self._prefix_matches(word):
+                word_counts[field_id] = word_counts.get(field_id, 0) + 1
+        all_words = len(dict.fromkeys(words))
+
+        ranked = []
+        for field_id, count in word_counts.items():
+            leading = self._leading_words[field_id]
+            if count == all_words:
+                if self._compact_keys[field_id] == compact:
+                    tier = 0
+                elif leading.startswith(words[0]):
+                    tier = 1
+                else:
+                    tier = 2
+                ranked.append((tier, 0, field_id, 'exact' if tier == 0 else 'prefix'))
+            else:
+                # Больше совпавших слов - выше; при равенстве выше поля, у которых
+                # с запросом совпадает первое слово описания
+                leading_match = any(leading.startswith(word) for word in words)
+                ranked.append((3, -count * 2 - leading_match, field_id, 'partial'))
+        ranked.sort()
+
+        similar = self._trigram_matches(words, word_counts)
+        ranked.extend((4, 0, field_id, 'trigram')
+                      for field_id in sorted(similar, key=lambda field_id: (-similar[field_id], field_id)))
+
+        page = ranked[offset:offset + limit]
+        return [self._item(field_id, match) for _, _, field_id, match in page], len(ranked)
@@ -0,0 +1,335 @@
+"""
+Клиент сервиса генерации парсеров.
+
+Держит пул постоянных (keep-alive) HTTP-соединений, ограничивает количество
+одновременных генераций, повторяет запросы с экспоненциальной задержкой при
+сетевых ошибках и отдаёт лог генерации по кускам по мере поступления.
+Лог и результаты хранятся в памяти (GenerationJobs), а не в content_files/.
+
+Адрес сервиса задаётся переменной окружения APSP_GENERATOR_URL
+(например, http://127.0.0.1:5050). Для локальной работы и бенчмарков
+есть заглушка сервиса: python generation_standin.py
+"""
+import codecs
+import http.client
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+GENERATOR_URL_ENV = 'APSP_GENERATOR_URL'
+
+# Ошибки, после которых соединение выбрасывается и запрос повторяется
+RETRYABLE_ERRORS = (ConnectionError, http.client.HTTPException, TimeoutError, OSError)
+# Коды ответа, при которых запрос повторяется
+RETRYABLE_STATUSES = (502, 503, 504)
+# Запросы, которые можно повторить после отправки: повтор не создаёт новую генерацию
+IDEMPOTENT_METHODS = ('GET', 'HEAD')
+
+
+class GenerationError(Exception):
+    """Ошибка обращения к сервису генерации"""
+
+
+class ConnectionPool:
+    """Пул keep-alive соединений к одному хосту"""
+
+    def __init__(self, base_url, size=10, timeout=30.0):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f'Некорректный адрес сервиса генерации: {base_url!r}')
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _new_connection(self):
+        connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self, fresh=False):
+        """Соединение из пула; fresh=True - всегда новое (не может оказаться закрытым сервером)"""
+        if fresh:
+            return self._new_connection()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection()
+
+    def release(self, connection, reusable=True):
+        if not reusable:
+            connection.close()
+            return
+        if connection.sock is not None:
+            # Таймаут могли поменять для чтения потока лога
+            connection.sock.settimeout(self.timeout)
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class GenerationClient:
+    """
+    Клиент сервиса генерации.
+
+    Args:
+        base_url: адрес сервиса (http://host:port)
+        pool_size: максимальное количество простаивающих соединений в пуле
+        timeout: таймаут соединения и чтения, секунды
+        log_timeout: сколько секунд поток лога может молчать (генерация долго думает)
+        retries: количество повторов при сетевых ошибках и 502/503/504
+            (POST - только если запрос не удалось отправить)
+        backoff: базовая задержка перед повтором (удваивается с каждой попыткой)
+        max_concurrency: максимальное количество одновременных генераций
+    """
+
+    def __init__(self, base_url, pool_size=10, timeout=30.0, log_timeout=600.0, retries=3, backoff=0.2,
+                 max_concurrency=10):
+        self.pool = ConnectionPool(base_url, size=pool_size, timeout=timeout)
+        self.log_timeout = log_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def close(self):
+        self.pool.close()
+
+    def _open(self, method, path, body=None, read_timeout=None):
+        """
+        Отправляет запрос и возвращает (соединение, ответ).
+        Соединение нужно вернуть в пул после полного чтения ответа.
+
+        GET повторяется при любой сетевой ошибке и 502/503/504. Остальные
+        запросы (POST /jobs) - только если ошибка случилась до отправки:
+        после отправки сервис мог уже принять задачу, и повтор создал бы
+        вторую генерацию. Для них берётся новое соединение - keep-alive
+        соединение из пула могло быть закрыто сервером.
+
+        read_timeout - таймаут чтения ответа вместо общего (для потока лога).
+        """
+        idempotent = method in IDEMPOTENT_METHODS
+        payload = None
+        headers = {'Connection': 'keep-alive'}
+        if body is not None:
+            payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            headers['Content-Type'] = 'application/json; charset=utf-8'
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+            connection = self.pool.acquire(fresh=not idempotent)
+            try:
+                connection.request(method, self.pool.base_path + path, body=payload, headers=headers)
+                if read_timeout is not None:
+                    # Сокет переходит к ответу, даже если соединение закроется после него
+                    connection.sock.settimeout(read_timeout)
+            except RETRYABLE_ERRORS as e:
+                # Запрос не ушёл - повтор безопасен для любого метода
+                self.pool.release(connection, reusable=False)
+                last_error = e
+                continue
+            try:
+                response = connection.getresponse()
+            except RETRYABLE_ERRORS as e:
+                # Соединение из пула могло быть закрыто сервером - открываем новое
+                self.pool.release(connection, reusable=False)
+                if not idempotent:
+                    raise GenerationError(f'{method} {path}: нет ответа от сервиса генерации ({e})')
+                last_error = e
+                continue
+
+            if response.status in RETRYABLE_STATUSES and idempotent:
+                response.read()
+                self.pool.release(connection, reusable=not response.will_close)
+                last_error = GenerationError(f'{method} {path}: HTTP {response.status}')
+                continue
+            return connection, response
+
+        raise GenerationError(f'{method} {path}: сервис генерации недоступен ({last_error})')
+
+    def _request(self, method, path, body=None):
+        connection, response = self._open(method, path, body)
+        try:
+            data = response.read()
+        except RETRYABLE_ERRORS as e:
+            self.pool.release(connection, reusable=False)
+            raise GenerationError(f'{method} {path}: ошибка чтения ответа ({e})')
+        self.pool.release(connection, reusable=not response.will_close)
+        if response.status >= 400:
+            raise GenerationError(f'{method} {path}: HTTP {response.status}')
+        return data
+
+    def start(self, payload):
+        """Запускает генерацию, возвращает идентификатор задачи сервиса"""
+        data = json.loads(self._request('POST', '/jobs', payload))
+        return data['job_id']
+
+    def iter_log(self, job_id, chunk_size=4096):
+        """Генератор кусков лога (str) по мере их поступления от сервиса"""
+        # Между строками лога сервис может долго молчать - у потока свой таймаут чтения
+        connection, response = self._open('GET', f'/jobs/{job_id}/log', read_timeout=self.log_timeout)
+        if response.status >= 400:
+            response.read()
+            self.pool.release(connection, reusable=not response.will_close)
+            raise GenerationError(f'GET /jobs/{job_id}/log: HTTP {response.status}')
+
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        reusable = False
+        try:
+            while True:
+                chunk = response.read1(chunk_size)
+                if not chunk:
+                    break
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+            tail = decoder.decode(b'', final=True)
+            if tail:
+                yield tail
+            reusable = not response.will_close
+        finally:
+            # Если чтение прервали на середине - соединение в пул не возвращаем
+            self.pool.release(connection, reusable=reusable)
+
+    def result_code(self, job_id):
+        return self._request('GET', f'/jobs/{job_id}/result_code').decode('utf-8')
+
+    def message_global(self, job_id):
+        return self._request('GET', f'/jobs/{job_id}/message_global').decode('utf-8')
+
+    def generate(self, payload, on_log=None):
+        """
+        Полный цикл генерации с учётом ограничения параллельности.
+
+        Args:
+            payload: данные мастера (data_input_table и выбранные поля)
+            on_log: callback(str) для каждого куска лога
+
+        Returns:
+            dict: {'job_id', 'result_code', 'message_global'}
+        """
+        with self._slots:
+            job_id = self.start(payload)
+            for chunk in self.iter_log(job_id):
+                if on_log is not None:
+                    on_log(chunk)
+            return {
+                'job_id': job_id,
+                'result_code': self.result_code(job_id),
+                'message_global': self.message_global(job_id),
+            }
+
+
+class GenerationJob:
+    """Состояние одной генерации: лог копится в памяти, результаты - после завершения"""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = 'running'
+        self.error = None
+        self.result_code = ''
+        self.message_global = ''
+        self._chunks = []
+        self._text = ''
+        self._lock = threading.Lock()
+
+    def append_log(self, chunk):
+        with self._lock:
+            self._chunks.append(chunk)
+
+    def log(self, offset=0):
+        """Текст лога начиная с offset (в символах)"""
+        with self._lock:
+            if self._chunks:
+                self._text += ''.join(self._chunks)
+                self._chunks = []
+            return self._text[offset:] if offset else self._text
+
+    def finish(self, result):
+        self.result_code = result.get('result_code', '')
+        self.message_global = result.get('message_global', '')
+        self.status = 'done'
+
+    def fail(self, error):
+        self.error = str(error)
+        self.append_log(f'\n\nОшибка генерации: {error}\n')
+        self.status = 'error'
+
+
+class GenerationJobs:
+    """Реестр генераций процесса с вытеснением самых старых завершённых задач"""
+
+    def __init__(self, client, max_jobs=100):
+        self.client = client
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def submit(self, payload, on_log=None, on_finish=None):
+        """
+        Запускает генерацию в фоновом потоке, возвращает GenerationJob.
+
+        on_log(chunk) вызывается для каждого куска лога в дополнение к
+        накоплению в памяти (например, для записи лога на диск). Ошибка в
+        on_log (диск заполнен, папку удалили) не прерывает генерацию.
+
+        on_finish(job, result) вызывается после завершения генерации, но до смены
+        статуса на done (result=None при ошибке) - например, чтобы сохранить
+        результаты на диск раньше, чем клиент увидит завершение.
+        """
+        job = GenerationJob(uuid.uuid4().hex)
+        with self._lock:
+            self._jobs[job.id] = job
+            # Вытесняем самые старые завершённые задачи; идущие генерации не трогаем
+            excess = len(self._jobs) - self.max_jobs
+            if excess > 0:
+                finished = [job_id for job_id, old in self._jobs.items() if old.status != 'running']
+                for job_id in finished[:excess]:
+                    del self._jobs[job_id]
+
+        log_failed = []
+
+        def append_log(chunk):
+            job.append_log(chunk)
+            if on_log is not None and not log_failed:
+                try:
+                    on_log(chunk)
+                except Exception as e:
+                    # Лог остаётся в памяти задачи; сообщаем об ошибке один раз
+                    log_failed.append(e)
+                    print(f'Ошибка записи лога генерации {job.id}: {e}')
+
+        def run():
+            try:
+                result = self.client.generate(payload, on_log=append_log)
+            except Exception as e:
+                job.fail(e)
+                result = None
+            if on_finish is not None:
+                try:
+                    on_finish(job, result)
+                except Exception as e:
+                    print(f'Ошибка обработки результата генерации {job.id}: {e}')
+            if result is not None:
+                job.finish(result)
+
+        threading.Thread(target=run, name=f'generation-{job.id[:8]}', daemon=True).start()
+        return job
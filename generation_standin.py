@@ -0,0 +1,171 @@
+"""
+Локальная заглушка сервиса генерации парсеров.
+
+Повторяет API, с которым работает generation_client.py:
+    POST /jobs                       -> {"job_id": "..."}
+    GET  /jobs/<id>/log              -> лог генерации (chunked, строки приходят с задержкой)
+    GET  /jobs/<id>/result_code      -> сгенерированный result_code.ts
+    GET  /jobs/<id>/message_global   -> итоговое сообщение
+
+Лог и код собираются по образцу content_files/output.log и result_code.ts.
+
+Запуск:
+    python generation_standin.py --port 5050 --line-delay 0.05
+    APSP_GENERATOR_URL=http://127.0.0.1:5050 python app.py
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content_files')
+
+SECTION_LINE = '-' * 78
+
+_JOB_PATH_RE = re.compile(r'^/jobs/([0-9a-f]{32})/(log|result_code|message_global)$')
+
+
+def _section(title):
+    return f'{SECTION_LINE}\n\n{title.center(78).rstrip()}\n\n{SECTION_LINE}\n\n\n'
+
+
+def build_log_lines(payload):
+    """Строки лога генерации в формате output.log"""
+    table = payload.get('data_input_table') or {}
+    examples = (table.get('links') or {}).get('simple') or []
+    fields = list(examples[0].keys()) if examples else list(payload.get('selected_fields') or [])
+    fields = fields or ['name', 'link', 'price']
+
+    lines = [datetime.now().strftime('%d.%m.%Y %H:%M:%S') + '\n', '\n\n\n\n', _section('GLOBAL CODE GEN')]
+    lines.append(f'field = {", ".join(fields)}\n\n\n\n')
+    lines.append(_section('FINAL RESULT PARSER CODE'))
+    lines.append(f'Обработаем {max(1, len(examples))} страниц\n\n')
+    for index, field in enumerate(fields):
+        if field == 'link':
+            continue
+        lines.append(f'Найдено {(index * 7) % 23 + 1} возможных селекторов\n')
+        lines.append(f'Найден селектор для поля {field}\n\n')
+    lines.append('Генерация завершена\n')
+    return lines
+
+
+def _read_template(name, default):
+    try:
+        with open(os.path.join(TEMPLATE_DIR, name), 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return default
+
+
+class StandinState:
+    """Задачи заглушки и параметры имитации"""
+
+    def __init__(self, line_delay=0.05):
+        self.line_delay = line_delay
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.result_code = _read_template('result_code.ts', '// result_code.ts\n')
+        self.message_global = _read_template('message_global.txt', 'Генерация завершена\n')
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'APSPGeneratorStandin/1.0'
+    # Лог уходит мелкими кусками - без TCP_NODELAY каждый кусок ждёт delayed ACK
+    disable_nagle_algorithm = True
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        # Заглушка используется в бенчмарках - не засоряем вывод
+        pass
+
+    def _send(self, status, body, content_type='text/plain; charset=utf-8'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b'{}'
+        if self.path != '/jobs':
+            self._send(404, 'not found')
+            return
+        try:
+            payload = json.loads(raw or b'{}')
+        except ValueError:
+            self._send(400, 'invalid json')
+            return
+
+        job_id = uuid.uuid4().hex
+        with self.state.lock:
+            self.state.jobs[job_id] = payload
+        self._send(200, json.dumps({'job_id': job_id}), 'application/json')
+
+    def do_GET(self):
+        match = _JOB_PATH_RE.match(self.path)
+        if not match:
+            self._send(404, 'not found')
+            return
+        with self.state.lock:
+            payload = self.state.jobs.get(match.group(1))
+        if payload is None:
+            self._send(404, 'unknown job')
+            return
+
+        resource = match.group(2)
+        if resource == 'result_code':
+            self._send(200, self.state.result_code)
+        elif resource == 'message_global':
+            self._send(200, self.state.message_global)
+        else:
+            self._stream_log(payload)
+
+    def _stream_log(self, payload):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for line in build_log_lines(payload):
+            data = line.encode('utf-8')
+            self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+            self.wfile.flush()
+            if self.state.line_delay:
+                time.sleep(self.state.line_delay)
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Бенчмарки открывают до сотни соединений одновременно
+    request_queue_size = 256
+
+
+def make_server(host='127.0.0.1', port=5050, line_delay=0.05):
+    """Создаёт сервер заглушки (port=0 - любой свободный порт)"""
+    server = StandinServer((host, port), StandinHandler)
+    server.state = StandinState(line_delay)
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Заглушка сервиса генерации парсеров')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5050)
+    parser.add_argument('--line-delay', type=float, default=0.05, help='задержка между строками лога, секунды')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.line_delay)
+    print(f'Заглушка сервиса генерации: http://{args.host}:{server.server_port}')
+    server.serve_forever()
@@ -0,0 +1,686 @@
+"""
+Модуль сегментированного лога генерации.
+
+Лог пишется в папку кусками (сегментами) ограниченного размера:
+seg-000001.log, seg-000002.log, ... Сегменты режутся только по границам строк.
+Рядом лежит разреженный индекс index.jsonl: заголовки секций лога
+("GLOBAL CODE GEN", "FINAL RESULT PARSER CODE", ...) и метки времени строк
+вида "14.12.2025 09:47:58" (не чаще одной на INDEX_INTERVAL байт).
+
+Чтение хвоста, диапазона по времени и секции идёт через mmap сегментов -
+без чтения всего лога в память. Поиск подстроки выполняется по байтам
+сегментов (mmap.find); большие логи из нескольких сегментов сканируются
+параллельно в пуле процессов.
+
+mmap используется только для своих сегментов, которые лишь дописываются.
+Чужой файл (SegmentedLog.from_file, content_files/output.log) внешний генератор
+может обрезать и переписать на месте: обращение к странице mmap за новым
+концом файла завершает процесс по SIGBUS, поэтому такой файл читается через
+seek/read() - только нужный диапазон или блоками, а не целиком.
+
+Позиции в логе - сквозные смещения в байтах от начала первого сегмента.
+"""
+import bisect
+import contextlib
+import json
+import mmap
+import os
+import re
+import threading
+from datetime import datetime
+
+# Максимальный размер сегмента
+SEGMENT_BYTES = 1024 * 1024
+# Метка времени попадает в индекс не чаще, чем раз в INDEX_INTERVAL байт
+INDEX_INTERVAL = 4096
+# Блок чтения файлов без mmap (SegmentedLog.from_file)
+READ_BLOCK_BYTES = 256 * 1024
+# Начиная с какого объёма поиск по сегментам идёт параллельно в пуле процессов
+PARALLEL_SEARCH_MIN_BYTES = 16 * 1024 * 1024
+SEARCH_WORKERS = min(4, os.cpu_count() or 1)
+
+SEGMENT_PREFIX = 'seg-'
+SEGMENT_SUFFIX = '.log'
+INDEX_FILE = 'index.jsonl'
+
+TIMESTAMP_FORMAT = '%d.%m.%Y %H:%M:%S'
+_TIMESTAMP_RE = re.compile(rb'^(\d{2}\.\d{2}\.\d{4} \d{2}:\d{2}:\d{2})')
+# Строка-разделитель секций: ------------------------------------------------------------------------------
+_SEPARATOR_RE = re.compile(rb'^-{20,}\s*$')
+
+_search_pool = None
+_search_pool_lock = threading.Lock()
+
+
+def parse_time(value):
+    """
+    Время из параметра запроса: "14.12.2025 09:47:58", ISO 8601 или unix timestamp.
+
+    Raises:
+        ValueError: если формат не распознан
+    """
+    value = (value or '').strip()
+    if not value:
+        raise ValueError('Не указано время')
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    for parse in (lambda v: datetime.strptime(v, TIMESTAMP_FORMAT), datetime.fromisoformat):
+        try:
+            return parse(value).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f'Некорректное время: {value!r} (ожидается "{datetime.now().strftime(TIMESTAMP_FORMAT)}")')
+
+
+class LogIndexer:
+    """
+    Построчный разбор лога: находит заголовки секций и метки времени.
+
+    Заголовок секции - строка между двумя строками-разделителями
+    (пустые строки между ними допускаются). Позиция секции - начало
+    открывающего разделителя.
+    """
+
+    def __init__(self):
+        self.last_time = None
+        self._last_time_offset = None
+        # Позиция последнего разделителя и кандидат в заголовки после него
+        self._separator_offset = None
+        self._title = None
+
+    def feed(self, line, offset):
+        """
+        Обрабатывает строку (bytes, с переводом строки) по позиции offset.
+
+        Returns:
+            list: новые записи индекса (offset, time, section)
+        """
+        entries = []
+        stripped = line.strip()
+        if not stripped:
+            return entries
+
+        if _SEPARATOR_RE.match(stripped):
+            if self._title is not None:
+                entries.append((self._separator_offset, self.last_time, self._title))
+                self._title = None
+                self._separator_offset = None
+            else:
+                self._separator_offset = offset
+            return entries
+
+        if self._separator_offset is not None and self._title is None:
+            self._title = stripped.decode('utf-8', errors='replace')
+            return entries
+        self._separator_offset = None
+        self._title = None
+
+        moment = _line_time(line)
+        if moment is not None:
+            if self._last_time_offset is None or offset - self._last_time_offset >= INDEX_INTERVAL:
+                entries.append((offset, moment, None))
+                self._last_time_offset = offset
+            self.last_time = moment
+        return entries
+
+
+def _line_time(line):
+    """Метка времени в начале строки (unix time) или None"""
+    match = _TIMESTAMP_RE.match(line)
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(1).decode('ascii'), TIMESTAMP_FORMAT).timestamp()
+    except ValueError:
+        return None
+
+
+def _iter_lines(data, start=0, end=None):
+    """Итерирует (offset, line) по байтам data (bytes или mmap) без копирования всего буфера"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos < end:
+        newline = data.find(b'\n', pos, end)
+        line_end = end if newline == -1 else newline + 1
+        yield pos, data[pos:line_end]
+        pos = line_end
+
+
+@contextlib.contextmanager
+def _open_data(path, length, use_mmap=True, start=0, end=None):
+    """
+    Байты файла для чтения диапазона [start, end) (end=None - до length).
+
+    Yields:
+        tuple: (base, data) - data начинается с позиции base файла: mmap первых
+        length байт (base=0) или только нужный диапазон через seek/read().
+        Если файл успели укоротить, read() просто вернёт меньше байт.
+    """
+    end = length if end is None else min(end, length)
+    if length <= 0 or start >= end:
+        yield start, b''
+        return
+    if not use_mmap:
+        yield start, _read_range(path, start, end)
+        return
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ)
+    with mapped:
+        yield 0, mapped
+
+
+def _read_range(path, start, end):
+    """Байты [start, end) файла через seek/read() (b'', если файла нет)"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(start)
+            return f.read(end - start)
+    except OSError:
+        return b''
+
+
+def _iter_blocks(path, length, use_mmap=True, start=0, end=None):
+    """
+    Итерирует (base, data) по диапазону [start, end) файла: mmap целиком
+    или через read() блоками по READ_BLOCK_BYTES, разрезанными по границам
+    строк (строка длиннее блока приходит целиком в следующем куске).
+    """
+    end = length if end is None else min(end, length)
+    if use_mmap:
+        with _open_data(path, length, True, start, end) as (base, data):
+            yield base, data
+        return
+    try:
+        f = open(path, 'rb')
+    except OSError:
+        return
+    with f:
+        f.seek(start)
+        pos = start
+        carry = b''
+        while pos < end:
+            chunk = f.read(min(READ_BLOCK_BYTES, end - pos))
+            if not chunk:
+                # Файл укоротили
+                break
+            pos += len(chunk)
+            data = carry + chunk if carry else chunk
+            cut = data.rfind(b'\n') + 1 if pos < end else len(data)
+            carry = data[cut:]
+            if cut:
+                yield pos - len(data), data[:cut]
+        if carry:
+            yield pos - len(carry), carry
+
+
+def _search_data(data, needle, limit):
+    """
+    Ищет needle в байтах сегмента.
+
+    Returns:
+        list: [(смещение начала строки, строка)] для не больше limit строк с совпадениями
+    """
+    found = []
+    length = len(data)
+    pos = data.find(needle)
+    while pos != -1 and len(found) < limit:
+        line_start = data.rfind(b'\n', 0, pos) + 1
+        line_end = data.find(b'\n', pos)
+        line_end = length if line_end == -1 else line_end
+        found.append((line_start, data[line_start:line_end]))
+        # Следующее совпадение - уже в другой строке
+        pos = data.find(needle, line_end) if line_end < length else -1
+    return found
+
+
+def _search_file(path, length, use_mmap, needle, limit):
+    """
+    Поиск needle в файле сегмента. Выполняется и в пуле процессов:
+    файл открывается по пути, наружу уходят только найденные строки.
+
+    Returns:
+        list: [(смещение начала строки в файле, строка)]
+    """
+    found = []
+    for base, data in _iter_blocks(path, length, use_mmap):
+        found.extend((base + line_start, line)
+                     for line_start, line in _search_data(data, needle, limit - len(found)))
+        if len(found) >= limit:
+            break
+    return found
+
+
+def _get_search_pool():
+    """
+    Пул процессов для параллельного поиска по большим логам.
+
+    mmap.find не отпускает GIL, поэтому потоки не дают параллельности.
+    Процессы запускаются через forkserver (или spawn, если его нет), а не fork:
+    fork многопоточного сервера (очистка рабочих папок, генерации, запросы)
+    может оставить дочерний процесс на унаследованной захваченной блокировке.
+    Рабочие процессы получают только пути сегментов и открывают их сами.
+    """
+    global _search_pool
+    with _search_pool_lock:
+        if _search_pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            # Пул создаётся при первом поиске по большому логу и живёт до конца процесса
+            _search_pool = ProcessPoolExecutor(SEARCH_WORKERS, mp_context=context)
+        return _search_pool
+
+
+class Segment:
+    """Сегмент лога: путь, сквозная позиция начала и размер"""
+
+    __slots__ = ('path', 'start', 'size')
+
+    def __init__(self, path, start, size):
+        self.path = path
+        self.start = start
+        self.size = size
+
+    @property
+    def end(self):
+        return self.start + self.size
+
+
+class SegmentedLog:
+    """
+    Сегментированный лог с разреженным индексом.
+
+    Args:
+        directory: папка сегментов и индекса
+        segment_bytes: максимальный размер сегмента
+        on_write: callback(количество байт) после каждой записи на диск -
+            для учёта занятого места (см. WorkspaceManager)
+    """
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, on_write=None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.on_write = on_write
+        self.readonly = False
+        # Свои сегменты читаются через mmap, чужой файл (from_file) - через read()
+        self.use_mmap = True
+        # После close() запись - пустая операция (папку лога удалили)
+        self.closed = False
+        self.segments = []
+        # Индекс: позиции и время меток, позиции и названия секций
+        self._time_offsets = []
+        self._times = []
+        self._sections = []
+        self._indexer = LogIndexer()
+        self._pending = b''
+        self._file = None
+        self._lock = threading.Lock()
+        if directory is not None:
+            self._load()
+
+    @classmethod
+    def from_file(cls, path):
+        """Лог из одного готового файла (например, content_files/output.log) - только чтение"""
+        log = cls(None)
+        log.readonly = True
+        log.use_mmap = False
+        size = os.path.getsize(path)
+        log.segments.append(Segment(path, 0, size))
+        # Индекс строится блоками через read(), без чтения файла в память целиком
+        log._index_segment(log.segments[0])
+        return log
+
+    @property
+    def size(self):
+        return self.segments[-1].end if self.segments else 0
+
+    # ---------- Запись ----------
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f'{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}')
+
+    def _load(self):
+        """Подхватывает сегменты и индекс с диска"""
+        if not os.path.isdir(self.directory):
+            return
+        names = sorted(name for name in os.listdir(self.directory)
+                       if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+        start = 0
+        for name in names:
+            path = os.path.join(self.directory, name)
+            size = os.path.getsize(path)
+            self.segments.append(Segment(path, start, size))
+            start += size
+        if not self.segments:
+            return
+
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        # Индекс дописывается после сегмента: если он старше последнего сегмента,
+        # запись прервалась между ними - строим индекс заново
+        if (os.path.isfile(index_path)
+                and os.path.getmtime(index_path) >= os.path.getmtime(self.segments[-1].path)):
+            with open(index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    offset, moment, section = json.loads(line)
+                    self._add_entry(offset, moment, section)
+        else:
+            for segment in self.segments:
+                self._index_segment(segment)
+            with open(index_path, 'w', encoding='utf-8') as f:
+                f.write(self._dump_entries(self._all_entries()))
+
+    def _data(self, segment, start=0, end=None):
+        """(base, data) для диапазона [start, end) сегмента, см. _open_data"""
+        return _open_data(segment.path, segment.size, self.use_mmap, start, end)
+
+    def _blocks(self, segment, start=0, end=None):
+        """(base, data) по диапазону [start, end) сегмента по целым строкам, см. _iter_blocks"""
+        return _iter_blocks(segment.path, segment.size, self.use_mmap, start, end)
+
+    def _index_segment(self, segment):
+        for base, data in self._blocks(segment):
+            for offset, line in _iter_lines(data):
+                for entry in self._indexer.feed(line, segment.start + base + offset):
+                    self._add_entry(*entry)
+
+    def _add_entry(self, offset, moment, section):
+        if section is not None:
+            self._sections.append((offset, section, moment))
+        elif moment is not None:
+            self._time_offsets.append(offset)
+            self._times.append(moment)
+
+    def _all_entries(self):
+        entries = [(offset, moment, None) for offset, moment in zip(self._time_offsets, self._times)]
+        entries.extend((offset, moment, section) for offset, section, moment in self._sections)
+        entries.sort(key=lambda entry: entry[0])
+        return entries
+
+    @staticmethod
+    def _dump_entries(entries):
+        return ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries)
+
+    def append(self, text):
+        """
+        Дописывает кусок лога; неполная последняя строка ждёт следующего куска или flush().
+        После close() - ничего не делает.
+        """
+        if self.readonly:
+            raise ValueError('Лог открыт только для чтения')
+        data = text.encode('utf-8') if isinstance(text, str) else text
+        with self._lock:
+            if self.closed:
+                return
+            data = self._pending + data
+            cut = data.rfind(b'\n') + 1
+            self._pending = data[cut:]
+            if cut:
+                self._write(data[:cut])
+
+    def flush(self):
+        """Записывает неполную последнюю строку и закрывает файл сегмента"""
+        with self._lock:
+            if self._pending and not self.closed:
+                data, self._pending = self._pending, b''
+                self._write(data)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def close(self):
+        """
+        Запрещает дальнейшую запись (папку лога удаляют): дописывание из ещё
+        идущей генерации становится пустой операцией и не создаёт папку заново.
+        Ждёт окончания текущей записи.
+        """
+        with self._lock:
+            self.closed = True
+            self._pending = b''
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, data):
+        if not self.segments:
+            # Папка создаётся только первой записью: если её потом удалили,
+            # запись падает с OSError, а не создаёт папку заново
+            os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        written = 0
+        chunk_start = 0
+        position = self.size
+        segment = self.segments[-1] if self.segments else None
+        for offset, line in _iter_lines(data):
+            # Текущий размер сегмента с учётом ещё не записанных строк
+            filled = segment.size + offset - chunk_start if segment is not None else 0
+            if segment is None or (filled and filled + len(line) > self.segment_bytes):
+                if segment is not None and offset > chunk_start:
+                    written += self._write_segment(segment, data[chunk_start:offset])
+                segment = self._open_segment()
+                chunk_start = offset
+            entries.extend(self._indexer.feed(line, position + offset))
+        written += self._write_segment(segment, data[chunk_start:])
+
+        if entries:
+            for entry in entries:
+                self._add_entry(*entry)
+            encoded = self._dump_entries(entries).encode('utf-8')
+            with open(os.path.join(self.directory, INDEX_FILE), 'ab') as f:
+                f.write(encoded)
+            written += len(encoded)
+        if self.on_write is not None:
+            self.on_write(written)
+
+    def _open_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        segment = Segment(self._segment_path(len(self.segments) + 1), self.size, 0)
+        self.segments.append(segment)
+        return segment
+
+    def _write_segment(self, segment, data):
+        if not data:
+            return 0
+        if self._file is None or self._file.name != segment.path:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(segment.path, 'ab')
+        self._file.write(data)
+        self._file.flush()
+        segment.size += len(data)
+        return len(data)
+
+    # ---------- Чтение ----------
+
+    def _snapshot(self):
+        with self._lock:
+            return [Segment(s.path, s.start, s.size) for s in self.segments]
+
+    def iter_bytes(self, start=0, end=None, chunk_size=256 * 1024):
+        """Итерирует байты лога в диапазоне [start, end) кусками через mmap (или seek/read)"""
+        segments = self._snapshot()
+        end = segments[-1].end if end is None and segments else (end or 0)
+        for segment in segments:
+            if segment.end <= start or segment.start >= end:
+                continue
+            local_start = max(start, segment.start) - segment.start
+            local_end = min(end, segment.end) - segment.start
+            for base, data in self._blocks(segment, local_start, local_end):
+                pos = max(local_start - base, 0)
+                stop = min(local_end - base, len(data))
+                while pos < stop:
+                    yield data[pos:min(stop, pos + chunk_size)]
+                    pos += chunk_size
+
+    def read(self, start=0, end=None):
+        return b''.join(self.iter_bytes(start, end))
+
+    def tail_offset(self, lines):
+        """Позиция начала последних lines строк"""
+        segments = self._snapshot()
+        remaining = lines
+        for segment in reversed(segments):
+            # Без mmap сегмент читается с конца блоками, а не целиком
+            block_end = segment.size
+            last_byte = segment is segments[-1]
+            while block_end > 0:
+                block_start = 0 if self.use_mmap else max(0, block_end - READ_BLOCK_BYTES)
+                with self._data(segment, block_start, block_end) as (base, data):
+                    pos = min(block_end - base, len(data))
+                    low = block_start - base
+                    if pos <= low:
+                        break
+                    # Перевод строки в самом конце лога не начинает новую строку
+                    if last_byte and data[pos - 1:pos] == b'\n':
+                        pos -= 1
+                    last_byte = False
+                    while remaining > 0:
+                        newline = data.rfind(b'\n', low, pos)
+                        if newline == -1:
+                            break
+                        remaining -= 1
+                        pos = newline
+                    if remaining == 0:
+                        return segment.start + base + pos + 1
+                block_end = block_start
+        return 0
+
+    def time_range_offsets(self, since=None, until=None):
+        """
+        Позиции [start, end) строк лога от метки времени since до метки после until.
+
+        Индекс разреженный: по нему находится ближайшая метка до нужной,
+        дальше строки просматриваются через mmap до точной метки.
+        """
+        total = self.size
+        start = 0 if since is None else self._refine_time(since, inclusive=True)
+        end = total if until is None else self._refine_time(until, inclusive=False)
+        return start, max(start, end)
+
+    def _refine_time(self, moment, inclusive):
+        """Позиция первой строки с меткой времени >= moment (inclusive) или > moment"""
+        with self._lock:
+            find = bisect.bisect_left if inclusive else bisect.bisect_right
+            index = find(self._times, moment)
+            scan_from = self._time_offsets[index - 1] if index > 0 else 0
+            scan_to = self._time_offsets[index] if index < len(self._times) else self.size
+
+        for segment in self._snapshot():
+            if segment.end <= scan_from or segment.start >= scan_to:
+                continue
+            local_start = max(scan_from, segment.start) - segment.start
+            local_end = min(scan_to, segment.end) - segment.start
+            with self._data(segment, local_start, local_end) as (base, data):
+                for offset, line in _iter_lines(data, local_start - base, min(local_end - base, len(data))):
+                    line_time = _line_time(line)
+                    if line_time is not None and (line_time > moment or (inclusive and line_time == moment)):
+                        return segment.start + base + offset
+        # Между соседними метками индекса подходящих строк нет - подходит следующая метка
+        return scan_to
+
+    def sections(self):
+        """Секции лога: [{'name', 'offset', 'length', 'time'}]"""
+        with self._lock:
+            sections = list(self._sections)
+            total = self.size
+        result = []
+        for index, (offset, name, moment) in enumerate(sections):
+            end = sections[index + 1][0] if index + 1 < len(sections) else total
+            result.append({'name': name, 'offset': offset, 'length': end - offset,
+                           'time': datetime.fromtimestamp(moment).strftime(TIMESTAMP_FORMAT) if moment else None})
+        return result
+
+    def section_offsets(self, name):
+        """
+        Позиции [start, end) секции с названием name (без учёта регистра).
+        Если секций с таким названием несколько - последняя.
+
+        Returns:
+            tuple или None, если секции нет
+        """
+        wanted = name.strip().casefold()
+        found = None
+        for section in self.sections():
+            if section['name'].casefold() == wanted:
+                found = section
+        if found is None:
+            return None
+        return found['offset'], found['offset'] + found['length']
+
+    def search(self, needle, limit=100):
+        """
+        Ищет подстроку по всем сегментам (регистр учитывается).
+
+        Returns:
+            tuple: ([{'offset', 'line'}], truncated)
+        """
+        if not needle:
+            raise ValueError('Пустая строка поиска')
+        if '\n' in needle:
+            raise ValueError('Поиск идёт в пределах одной строки')
+        pattern = needle.encode('utf-8')
+
+        with self._lock:
+            section_offsets = [offset for offset, _, _ in self._sections]
+            section_names = [name for _, name, _ in self._sections]
+
+        matches = []
+        for segment, found in self._search_segments(pattern, limit + 1):
+            for line_start, line in found:
+                offset = segment.start + line_start
+                section = bisect.bisect_right(section_offsets, offset) - 1
+                matches.append({
+                    'offset': offset,
+                    'section': section_names[section] if section >= 0 else None,
+                    'line': line.decode('utf-8', errors='replace').rstrip('\r'),
+                })
+            if len(matches) > limit:
+                break
+        return matches[:limit], len(matches) > limit
+
+    def _search_segments(self, pattern, limit):
+        """
+        Итерирует (сегмент, найденные строки) по порядку сегментов.
+        Большой лог из нескольких сегментов сканируется в пуле процессов,
+        при сбое пула - последовательно в этом процессе.
+        """
+        segments = [segment for segment in self._snapshot() if segment.size]
+        total = sum(segment.size for segment in segments)
+        if SEARCH_WORKERS > 1 and len(segments) > 1 and total >= PARALLEL_SEARCH_MIN_BYTES:
+            from concurrent.futures import BrokenExecutor
+            futures = []
+            results = None
+            try:
+                pool = _get_search_pool()
+                futures = [pool.submit(_search_file, segment.path, segment.size, self.use_mmap, pattern, limit)
+                           for segment in segments]
+                results = []
+                found_count = 0
+                for segment, future in zip(segments, futures):
+                    found = future.result()
+                    results.append((segment, found))
+                    found_count += len(found)
+                    if found_count >= limit:
+                        break
+            except (BrokenExecutor, OSError) as e:
+                print(f'Параллельный поиск по логу недоступен, поиск в процессе: {e}')
+                results = None
+            finally:
+                # Сегменты после набранного лимита не нужны
+                for future in futures:
+                    future.cancel()
+            if results is not None:
+                yield from results
+                return
+
+        found_count = 0
+        for segment in segments:
+            found = _search_file(segment.path, segment.size, self.use_mmap, pattern, limit - found_count)
+            yield segment, found
+            found_count += len(found)
+            if found_count >= limit:
+                return
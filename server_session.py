@@ -0,0 +1,474 @@
+"""
+Серверное хранение сессий Flask.
+
+В cookie хранится только подписанный идентификатор сессии, а сами данные
+мастера лежат на диске в data/sessions/<sid>.json. Cookie-сессия ограничена
+~4 КБ, а при массовом импорте примеров на шаге 2 данные легко занимают
+мегабайты.
+
+Объёмные данные (BULK_KEYS: examples_data, result_json) хранятся отдельно,
+в <sid>.bulk, и читаются только при первом обращении к этим ключам - на шагах
+2-5 и в /api/wizard. Остальные запросы (опрос /api/log, /api/message_global)
+разбирают только небольшой <sid>.json, а пути из skip_paths (статика /content/)
+сессию не открывают вовсе.
+
+Файлы живут PERMANENT_SESSION_LIFETIME с последнего обращения: просроченная
+сессия при открытии начинается заново, а фоновая очистка раз в
+cleanup_interval секунд удаляет файлы брошенных сессий. Размер данных одной
+сессии ограничен max_bytes (SessionTooLarge).
+
+Чтение-изменение-запись одной сессии из параллельных запросов (автосохранение)
+выполняется под блокировкой sid - update(): между потоками процесса и, если
+доступен fcntl, между процессами (файл data/sessions/<sid>.lock).
+
+Обычный запрос сохраняет сессию под той же блокировкой. Если после того, как он
+прочитал сессию, её записал другой запрос (PATCH /api/wizard), записываются не
+все данные запроса, а только изменённые им ключи поверх сохранённой сессии -
+иначе устаревший снимок откатил бы чужие изменения. Счётчики counter_keys
+(версии состояния) при этом складываются: увеличенная обоими запросами версия
+не совпадёт ни с одной из выданных раньше.
+"""
+import contextlib
+import os
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировка только между потоками процесса
+    fcntl = None
+
+from flask.sessions import SecureCookieSession, SessionInterface
+from flask.json.tag import TaggedJSONSerializer
+from itsdangerous import BadSignature, Signer
+
+
+# Время последнего обращения обновляется не чаще, чем раз в столько секунд
+TOUCH_INTERVAL = 3600
+
+# Ключи с объёмными данными мастера - в отдельном файле <sid>.bulk
+BULK_KEYS = ('examples_data', 'result_json')
+
+# Ключа не было в сессии
+_MISSING = object()
+
+
+class SessionTooLarge(ValueError):
+    """Данные сессии не помещаются в лимит max_bytes"""
+
+    def __init__(self, size, max_bytes):
+        super().__init__(f'Слишком много данных: {size // 1024} КБ при лимите {max_bytes // 1024} КБ')
+        self.size = size
+        self.max_bytes = max_bytes
+
+
+class FileSession(SecureCookieSession):
+    """
+    Сессия с идентификатором файла на диске.
+
+    Значения BULK_KEYS подгружаются функцией load_bulk при первом обращении
+    к ним (или ко всей сессии целиком: items(), len(), ...).
+
+    changed_keys - {ключ: значение при чтении сессии} для ключей, изменённых
+    запросом (None - сессию очистили или изменили целиком), file_stamp - отметка
+    файла <sid>.json при чтении: по ним save_session накладывает изменения
+    поверх сессии, записанной параллельным запросом.
+    """
+
+    def __init__(self, initial=None, sid=None, new=False, load_bulk=None, file_stamp=None):
+        super().__init__(initial)
+        self.sid = sid
+        self.new = new
+        # None - объёмные данные уже в словаре или их нет на диске
+        self._load_bulk = load_bulk
+        # К объёмным данным обращались - при сохранении они записываются заново
+        self.bulk_accessed = False
+        self.changed_keys = {}
+        self.file_stamp = file_stamp
+
+    def _remember(self, key):
+        """Запоминает значение ключа до первого изменения в этом запросе"""
+        if self.changed_keys is not None and key not in self.changed_keys:
+            self.changed_keys[key] = dict.get(self, key, _MISSING)
+
+    def _ensure_bulk(self):
+        self.bulk_accessed = True
+        if self._load_bulk is not None:
+            load, self._load_bulk = self._load_bulk, None
+            # Мимо on_update: подгрузка с диска не изменение сессии
+            dict.update(self, load())
+
+    def __bool__(self):
+        return dict.__len__(self) > 0 or self._load_bulk is not None
+
+    def clear(self):
+        self._load_bulk = None
+        self.bulk_accessed = True
+        self.changed_keys = None
+        super().clear()
+
+    def update(self, *args, **kwargs):
+        self._ensure_bulk()
+        for key in dict(*args, **kwargs):
+            self._remember(key)
+        super().update(*args, **kwargs)
+
+    def popitem(self):
+        self._ensure_bulk()
+        self.changed_keys = None
+        return super().popitem()
+
+
+def _loading(name, by_key, changes=False):
+    """
+    Метод словаря, который сначала подгружает объёмные данные (by_key - только для
+    ключей BULK_KEYS); changes - метод меняет ключ args[0], его значение запоминается.
+    """
+    method = getattr(SecureCookieSession, name)
+
+    def wrapper(self, *args, **kwargs):
+        if not by_key or (args and args[0] in BULK_KEYS):
+            self._ensure_bulk()
+        if changes and args:
+            self._remember(args[0])
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    return wrapper
+
+
+for _name in ('__getitem__', 'get', '__contains__'):
+    setattr(FileSession, _name, _loading(_name, by_key=True))
+for _name in ('__setitem__', '__delitem__', 'pop', 'setdefault'):
+    setattr(FileSession, _name, _loading(_name, by_key=True, changes=True))
+for _name in ('__iter__', '__len__', 'keys', 'values', 'items', 'copy', '__eq__', '__repr__'):
+    setattr(FileSession, _name, _loading(_name, by_key=False))
+
+
+class FileSessionInterface(SessionInterface):
+    """
+    Сессии в файлах data/sessions/<sid>.json, в cookie - подписанный sid.
+
+    Args:
+        directory: папка с файлами сессий
+        max_bytes: максимальный размер данных одной сессии
+        cleanup_interval: как часто (секунд) удалять просроченные файлы
+        skip_paths: префиксы путей, для которых сессия не открывается (статика)
+        counter_keys: ключи-счётчики, увеличения которых складываются при наложении
+            изменений на сессию, записанную параллельным запросом
+    """
+
+    salt = 'apsp-file-session'
+    serializer = TaggedJSONSerializer()
+    session_class = FileSession
+
+    def __init__(self, directory='data/sessions', max_bytes=8 * 1024 * 1024, cleanup_interval=3600, skip_paths=(),
+                 counter_keys=()):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.cleanup_interval = cleanup_interval
+        self.skip_paths = tuple(skip_paths)
+        self.counter_keys = tuple(counter_keys)
+        self._last_cleanup = 0.0
+        self._cleanup_lock = threading.Lock()
+        # sid -> [блокировка, сколько запросов её держат или ждут]
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _signer(self, app):
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt=self.salt)
+
+    def _path(self, sid):
+        return os.path.join(self.directory, f'{sid}.json')
+
+    def _lock_path(self, sid):
+        return os.path.join(self.directory, f'{sid}.lock')
+
+    def _bulk_path(self, sid):
+        return os.path.join(self.directory, f'{sid}.bulk')
+
+    @contextlib.contextmanager
+    def locked(self, sid):
+        """Блокировка сессии sid между потоками и процессами"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(sid, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                if fcntl is None:
+                    yield
+                    return
+                os.makedirs(self.directory, exist_ok=True)
+                with open(self._lock_path(sid), 'a') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[sid]
+
+    def _read(self, sid):
+        with open(self._path(sid), 'r', encoding='utf-8') as f:
+            return self.serializer.loads(f.read())
+
+    def _stamp(self, sid, stat=None):
+        """Отметка файла <sid>.json: меняется при каждой записи (файл подменяется целиком)"""
+        if stat is None:
+            try:
+                stat = os.stat(self._path(sid))
+            except OSError:
+                return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read_bulk(self, sid):
+        try:
+            with open(self._bulk_path(sid), 'r', encoding='utf-8') as f:
+                return self.serializer.loads(f.read())
+        except (OSError, ValueError):
+            return {}
+
+    def _session(self, sid, data, file_stamp=None):
+        """Сессия с данными data из <sid>.json; объёмные данные - при обращении"""
+        load_bulk = None
+        if os.path.exists(self._bulk_path(sid)):
+            load_bulk = lambda: self._read_bulk(sid)
+        return self.session_class(data, sid=sid, load_bulk=load_bulk, file_stamp=file_stamp)
+
+    def _merge(self, session):
+        """
+        Что записать при сохранении (вызывается под блокировкой sid): сама сессия
+        запроса или, если файл с тех пор записал другой запрос, сохранённая сессия
+        с изменёнными этим запросом ключами поверх.
+        """
+        changed = getattr(session, 'changed_keys', None)
+        # Сессию очистили, изменили целиком или пометили изменённой вручную - пишем как есть
+        if session.new or not changed or session.file_stamp == self._stamp(session.sid):
+            return session
+        try:
+            stored = self._session(session.sid, self._read(session.sid))
+        except (OSError, ValueError):
+            return session
+        for key, original in changed.items():
+            if key in BULK_KEYS:
+                # Другие объёмные данные - с диска
+                stored._ensure_bulk()
+            value = dict.get(session, key, _MISSING)
+            if key in self.counter_keys and isinstance(value, int) and isinstance(stored.get(key), int):
+                value = stored.get(key) + value - (original if isinstance(original, int) else 0)
+            if value is _MISSING:
+                dict.pop(stored, key, None)
+            else:
+                dict.__setitem__(stored, key, value)
+        # Объёмные данные, которые запрос не менял, остаются в файле от параллельного запроса
+        stored.bulk_accessed = any(key in BULK_KEYS for key in changed)
+        return stored
+
+    def _remove(self, sid):
+        for path in (self._path(sid), self._bulk_path(sid)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def update(self, sid, func):
+        """
+        Изменяет сохранённую сессию под блокировкой: читает файл, вызывает
+        func(session) и записывает результат, если сессия изменилась. Сессия
+        текущего запроса при этом не меняется и повторно не сохраняется.
+
+        Returns:
+            результат func
+
+        Raises:
+            KeyError: файла сессии нет
+            SessionTooLarge: изменённые данные больше max_bytes (файл не меняется)
+        """
+        with self.locked(sid):
+            try:
+                data = self._read(sid)
+            except (OSError, ValueError):
+                raise KeyError(sid)
+            stored = self._session(sid, data)
+            result = func(stored)
+            if stored.modified:
+                self._write(sid, *self._dump(stored))
+            return result
+
+    def _new_session(self):
+        return self.session_class(sid=uuid.uuid4().hex, new=True)
+
+    def _dump(self, session):
+        """
+        Сериализует данные сессии с проверкой размера.
+
+        Returns:
+            tuple: (данные для <sid>.json, данные для <sid>.bulk - None, если к объёмным
+                данным не обращались и файл не меняется, '' - если их больше нет)
+
+        Raises:
+            SessionTooLarge: данные больше max_bytes
+        """
+        items = dict.items(session)
+        payload = self.serializer.dumps({key: value for key, value in items if key not in BULK_KEYS})
+        bulk_payload = None
+        if getattr(session, 'bulk_accessed', True):
+            bulk = {key: value for key, value in items if key in BULK_KEYS}
+            bulk_payload = self.serializer.dumps(bulk) if bulk else ''
+        size = len(payload.encode('utf-8')) + len((bulk_payload or '').encode('utf-8'))
+        if size > self.max_bytes:
+            raise SessionTooLarge(size, self.max_bytes)
+        return payload, bulk_payload
+
+    def check_size(self, session):
+        """Проверяет, что сессия поместится в лимит (до сохранения, чтобы показать ошибку на странице)"""
+        # flask.session - прокси к объекту сессии
+        get_current_object = getattr(session, '_get_current_object', None)
+        self._dump(get_current_object() if get_current_object is not None else session)
+
+    def cleanup(self, max_age, now=None):
+        """Удаляет файлы сессий без обращений дольше max_age секунд, возвращает их количество"""
+        now = time.time() if now is None else now
+        removed = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return 0
+        companions = []
+        for entry in entries:
+            if entry.name.endswith(('.lock', '.bulk')):
+                companions.append(entry)
+                continue
+            if not entry.name.endswith(('.json', '.tmp')):
+                continue
+            try:
+                # Недописанные временные файлы остаются только после падения процесса
+                limit = max_age if entry.name.endswith('.json') else self.cleanup_interval
+                if now - entry.stat().st_mtime > limit:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError:
+                pass
+        # Файлы блокировки и объёмных данных не обновляются при чтении сессии -
+        # удаляем их только вместе с <sid>.json (с запасом: новая сессия пишет .bulk первым)
+        for entry in companions:
+            if not os.path.exists(self._path(entry.name.rsplit('.', 1)[0])):
+                try:
+                    if now - entry.stat().st_mtime > self.cleanup_interval:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+        return removed
+
+    def _maybe_cleanup(self, app):
+        """Запускает очистку в фоне не чаще, чем раз в cleanup_interval секунд"""
+        now = time.time()
+        if now - self._last_cleanup < self.cleanup_interval:
+            return
+        with self._cleanup_lock:
+            if now - self._last_cleanup < self.cleanup_interval:
+                return
+            self._last_cleanup = now
+        max_age = app.permanent_session_lifetime.total_seconds()
+        threading.Thread(target=self.cleanup, args=(max_age,), name='session-cleanup', daemon=True).start()
+
+    @staticmethod
+    def _replace(path, payload):
+        # Пишем во временный файл и атомарно подменяем
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+
+    def _write(self, sid, payload, bulk_payload=None):
+        os.makedirs(self.directory, exist_ok=True)
+        if bulk_payload:
+            self._replace(self._bulk_path(sid), bulk_payload)
+        elif bulk_payload == '':
+            try:
+                os.remove(self._bulk_path(sid))
+            except OSError:
+                pass
+        self._replace(self._path(sid), payload)
+
+    def open_session(self, app, request):
+        signer = self._signer(app)
+        if signer is None or request.path.startswith(self.skip_paths):
+            return None
+        self._maybe_cleanup(app)
+
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return self._new_session()
+
+        try:
+            sid = signer.unsign(cookie).decode('ascii')
+        except BadSignature:
+            return self._new_session()
+
+        path = self._path(sid)
+        try:
+            stat = os.stat(path)
+            # Отметка - до чтения: запись другим запросом после неё save_session заметит
+            file_stamp = self._stamp(sid, stat)
+            age = time.time() - stat.st_mtime
+            if age > app.permanent_session_lifetime.total_seconds():
+                # Сессия просрочена - данные удаляем, начинаем с новым sid
+                self._remove(sid)
+                return self._new_session()
+            data = self._read(sid)
+            if age > TOUCH_INTERVAL:
+                # Сессию читают, но не меняют - продлеваем жизнь файла
+                os.utime(path)
+        except (OSError, ValueError):
+            # Файл сессии удалён или повреждён - начинаем с пустой сессии под тем же sid
+            # (без оставшихся от прежней сессии объёмных данных)
+            self._remove(sid)
+            return self.session_class(sid=sid, new=True)
+
+        return self._session(sid, data, file_stamp)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.modified:
+                self._remove(session.sid)
+                response.delete_cookie(name, domain=domain, path=path, secure=secure,
+                                       samesite=samesite, httponly=httponly)
+                response.vary.add('Cookie')
+            return
+
+        if session.modified or session.new:
+            with self.locked(session.sid):
+                try:
+                    payloads = self._dump(self._merge(session))
+                except SessionTooLarge as e:
+                    # Маршруты с большими данными проверяют размер заранее (check_size);
+                    # здесь оставляем на диске прежнее состояние сессии
+                    print(f'Сессия {session.sid} не сохранена: {e}')
+                else:
+                    self._write(session.sid, *payloads)
+
+        if not (session.new or self.should_set_cookie(app, session)):
+            return
+
+        expires = self.get_expiration_time(app, session)
+        value = self._signer(app).sign(session.sid.encode('ascii')).decode('ascii')
+        response.set_cookie(name, value, expires=expires, httponly=httponly, domain=domain,
+                            path=path, secure=secure, samesite=samesite)
+        response.vary.add('Cookie')
@@ -0,0 +1,12 @@
+"""
+Общие настройки тестов: модули приложения лежат в корне репозитория.
+
+Запуск (из корня репозитория):
+    python -m pytest -q
+"""
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
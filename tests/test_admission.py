@@ -0,0 +1,120 @@
+"""Тесты контроля нагрузки (admission.py) и классификации запросов в app"""
+import pytest
+
+from admission import DOWNLOAD, INTERACTIVE, POLL, AdmissionController, Rejected, TokenBucket
+
+
+def test_token_bucket_burst_then_wait():
+    bucket = TokenBucket(rate=2, capacity=3, now=0.0)
+    assert [bucket.take(0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Токенов нет: следующий появится через 1 / rate
+    assert bucket.take(0.0) == pytest.approx(0.5)
+    assert bucket.take(0.25) == pytest.approx(0.25)
+    assert bucket.take(0.5) == 0.0
+
+
+def test_token_bucket_refill_is_capped():
+    bucket = TokenBucket(rate=10, capacity=2, now=0.0)
+    bucket.take(0.0)
+    bucket.take(0.0)
+    # За час простоя накапливается не больше capacity
+    assert [bucket.take(3600.0) for _ in range(3)][:2] == [0.0, 0.0]
+    assert bucket.take(3600.0) > 0
+
+
+def test_rejected_retry_after_header():
+    assert Rejected(0.2, 'x').retry_after_header == '1'
+    assert Rejected(2.1, 'x').retry_after_header == '3'
+
+
+def make_controller(**kwargs):
+    options = dict(limits={POLL: (1, 3), DOWNLOAD: (1, 1)}, low_priority_rate=1000, low_priority_slots=8,
+                   expensive_slots={'zip': 1})
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def test_rate_limit_is_per_client():
+    controller = make_controller()
+    for _ in range(3):
+        controller.release(controller.admit('a', POLL))
+    with pytest.raises(Rejected) as error:
+        controller.admit('a', POLL)
+    assert error.value.retry_after > 0
+    # Другой клиент и другой класс того же клиента - свои корзины
+    controller.release(controller.admit('b', POLL))
+    controller.release(controller.admit('a', DOWNLOAD))
+
+
+def test_interactive_is_not_limited():
+    controller = make_controller(low_priority_slots=1)
+    held = controller.admit('a', POLL)
+    for _ in range(100):
+        assert controller.admit('a', INTERACTIVE) == []
+    controller.release(held)
+
+
+def test_low_priority_slot_is_held_until_release():
+    controller = make_controller(low_priority_slots=1)
+    held = controller.admit('a', POLL)
+    with pytest.raises(Rejected):
+        controller.admit('b', POLL)
+    controller.release(held)
+    controller.release(controller.admit('b', POLL))
+
+
+def test_low_priority_budget_is_shared():
+    controller = make_controller(low_priority_rate=2)
+    controller.release(controller.admit('a', POLL))
+    controller.release(controller.admit('b', POLL))
+    with pytest.raises(Rejected) as error:
+        controller.admit('c', POLL)
+    assert error.value.retry_after >= 1
+
+
+def test_expensive_slot():
+    controller = make_controller()
+    held = controller.admit('a', INTERACTIVE, 'zip')
+    with pytest.raises(Rejected):
+        controller.admit('b', INTERACTIVE, 'zip')
+    # Неизвестный ресурс не ограничивается
+    assert controller.admit('b', INTERACTIVE, 'other') == []
+    controller.release(held)
+    controller.release(controller.admit('b', INTERACTIVE, 'zip'))
+
+
+def test_expensive_rejection_releases_low_priority_slot():
+    controller = make_controller(low_priority_slots=1)
+    held = controller.admit('a', INTERACTIVE, 'zip')
+    with pytest.raises(Rejected):
+        controller.admit('b', DOWNLOAD, 'zip')
+    controller.release(held)
+    # Слот poll/download, захваченный до отказа, возвращён
+    controller.release(controller.admit('c', POLL))
+
+
+def test_old_clients_are_evicted():
+    controller = make_controller(max_clients=2, limits={POLL: (1, 1)})
+    controller.release(controller.admit('a', POLL))
+    controller.release(controller.admit('b', POLL))
+    controller.release(controller.admit('c', POLL))
+    assert [client_id for client_id, _ in controller._buckets] == ['b', 'c']
+    # Вытесненный клиент начинает с полной корзиной
+    controller.release(controller.admit('a', POLL))
+
+
+@pytest.mark.parametrize('method, path, expected', [
+    ('GET', '/api/log', (POLL, None)),
+    ('GET', '/api/message_global', (POLL, None)),
+    ('PATCH', '/api/wizard', (INTERACTIVE, None)),
+    ('GET', '/api/fields/search?q=цена', (INTERACTIVE, None)),
+    ('GET', '/download/parser_ts', (DOWNLOAD, None)),
+    ('GET', '/download/all_files_zip', (DOWNLOAD, 'zip')),
+    ('GET', '/reset?full=1', (INTERACTIVE, 'reset_backup')),
+    ('GET', '/reset', (INTERACTIVE, None)),
+    ('POST', '/step2', (INTERACTIVE, None)),
+])
+def test_classify_request(method, path, expected):
+    from app import app, classify_request
+    with app.test_request_context(path, method=method):
+        assert classify_request() == expected
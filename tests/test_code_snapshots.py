@@ -0,0 +1,122 @@
+"""Тесты построчных патчей result_code.ts (code_snapshots)"""
+import random
+
+import pytest
+
+from code_snapshots import apply_hunks, code_version, CodeSnapshots, diff_lines, split_lines
+
+BASE = [f'line {n}' for n in range(50)]
+
+
+def replaced(lines, start, count, new_lines):
+    lines = list(lines)
+    lines[start:start + count] = new_lines
+    return lines
+
+
+@pytest.mark.parametrize('new', [
+    BASE,
+    replaced(BASE, 20, 1, ['changed']),
+    replaced(BASE, 0, 0, ['first']),
+    BASE + ['last'],
+    replaced(BASE, 10, 5, []),
+    replaced(replaced(BASE, 40, 2, ['a', 'b', 'c']), 5, 1, []),
+    [],
+    ['совсем другой файл'],
+], ids=['same', 'one_line', 'prepend', 'append', 'delete', 'two_blocks', 'empty', 'rewrite'])
+def test_apply_hunks_restores_new_text(new):
+    hunks = diff_lines(BASE, new)
+    assert apply_hunks(BASE, hunks) == new
+
+
+def test_same_text_gives_no_hunks():
+    assert diff_lines(BASE, list(BASE)) == []
+
+
+def test_hunks_use_old_line_numbers_in_ascending_order():
+    new = replaced(replaced(BASE, 40, 1, ['x']), 5, 2, ['y'])
+    hunks = diff_lines(BASE, new)
+    assert hunks == [[5, 2, ['y']], [40, 1, ['x']]]
+
+
+def test_diff_with_repeated_lines():
+    old = ['}', '', '}', '', '}']
+    new = ['}', '', 'return;', '}', '', '}']
+    assert apply_hunks(old, diff_lines(old, new)) == new
+
+
+def test_random_edits_round_trip():
+    rng = random.Random(1)
+    lines = list(BASE)
+    for _ in range(200):
+        new = list(lines)
+        start = rng.randrange(len(new) + 1)
+        new[start:start + rng.randrange(4)] = [f'edit {rng.random()}' for _ in range(rng.randrange(4))]
+        assert apply_hunks(lines, diff_lines(lines, new)) == new
+        lines = new or ['']
+
+
+def test_apply_hunks_does_not_modify_input():
+    lines = list(BASE)
+    apply_hunks(lines, [[0, 1, ['x']]])
+    assert lines == BASE
+
+
+def test_split_lines_keeps_trailing_empty_line():
+    assert split_lines('a\nb\n') == ['a', 'b', '']
+
+
+def test_delta_returns_patch_for_known_version():
+    store = CodeSnapshots()
+    old = '\n'.join(BASE)
+    base = store.put(old)
+    new = '\n'.join(replaced(BASE, 25, 1, ['changed']))
+    delta = store.delta(new, base)
+    assert delta['version'] == code_version(new)
+    assert delta['base'] == base
+    assert delta['lines'] == len(BASE)
+    assert '\n'.join(apply_hunks(split_lines(old), delta['hunks'])) == new
+
+
+def test_delta_returns_full_text_for_unknown_or_missing_version():
+    store = CodeSnapshots()
+    text = '\n'.join(BASE)
+    assert store.delta(text)['full'] == text
+    assert store.delta(text, 'unknown')['full'] == text
+
+
+def test_delta_returns_full_text_when_patch_is_not_smaller():
+    store = CodeSnapshots()
+    base = store.put('a')
+    assert store.delta('b', base) == {'version': code_version('b'), 'lines': 1, 'full': 'b'}
+
+
+def test_evicted_version_gives_full_text():
+    old = '\n'.join(BASE)
+    store = CodeSnapshots(max_bytes=len(old) + 1)
+    base = store.put(old)
+    new = old + '\nlast'
+    assert 'full' in store.delta(new, base)
+    assert store.diff(base, code_version(new)) is None
+
+
+def test_rewritten_code_is_not_diffed():
+    old = [f'    const field{n} = parse(raw{n});' for n in range(200)]
+    new = [f'    const value{n} = extract(html{n});' for n in range(200)]
+    assert diff_lines(old, new) is None
+    store = CodeSnapshots()
+    base = store.put('\n'.join(old))
+    assert store.delta('\n'.join(new), base)['full'] == '\n'.join(new)
+    # Отказ кешируется, как и патч
+    assert store.diff(base, code_version('\n'.join(new))) is None
+
+
+def test_large_changed_middle_is_not_diffed(monkeypatch):
+    import code_snapshots
+    new = replaced(replaced(BASE, 45, 1, ['x']), 2, 1, ['y'])
+    assert apply_hunks(BASE, diff_lines(BASE, new)) == new
+    # Правки в начале и в конце: середина - почти весь файл
+    monkeypatch.setattr(code_snapshots, 'DIFF_MAX_CELLS', 40 * 40)
+    assert diff_lines(BASE, new) is None
+    # Правка в одном месте по-прежнему даёт патч
+    assert diff_lines(BASE, replaced(BASE, 20, 1, ['changed'])) == [[20, 1, ['changed']]]
@@ -0,0 +1,84 @@
+"""Тесты определения шаблона пагинации (crawl_plan.infer_page_template)"""
+import pytest
+
+from crawl_plan import build_crawl_plan, infer_page_template, iter_batches, iter_page_urls
+
+
+@pytest.mark.parametrize('url_page_2, page_3', [
+    ('https://shop.ru/search/?q=дрель&page=2', 'https://shop.ru/search/?q=дрель&page=3'),
+    ('https://shop.ru/search/?page=2&q=дрель', 'https://shop.ru/search/?page=3&q=дрель'),
+    ('https://shop.ru/catalog/?PAGEN_1=2', 'https://shop.ru/catalog/?PAGEN_1=3'),
+    # Параметр с именем страницы важнее другого параметра со значением 2
+    ('https://shop.ru/search/?sort=2&p=2', 'https://shop.ru/search/?sort=2&p=3'),
+    ('https://shop.ru/search/?q=x&page=2#top', 'https://shop.ru/search/?q=x&page=3#top'),
+    ('https://shop.ru/search/drel/page/2/', 'https://shop.ru/search/drel/page/3/'),
+    ('https://shop.ru/search/page-2/?q=x', 'https://shop.ru/search/page-3/?q=x'),
+    ('https://shop.ru/search/p2', 'https://shop.ru/search/p3'),
+    ('https://shop.ru/search/page2.html', 'https://shop.ru/search/page3.html'),
+    # Номер страницы в пути, а не в домене
+    ('https://shop2.ru/search/drel/2', 'https://shop2.ru/search/drel/3'),
+    ('shop.ru/search/2/', 'shop.ru/search/3/'),
+])
+def test_page_number_template(url_page_2, page_3):
+    template = infer_page_template(url_page_2)
+    assert template.kind == 'page'
+    assert template.page_url(2) == url_page_2.strip()
+    assert template.page_url(3) == page_3
+
+
+@pytest.mark.parametrize('url_page_2, page_1, page_3', [
+    ('https://shop.ru/search/?q=x&offset=24', 'https://shop.ru/search/?q=x&offset=0',
+     'https://shop.ru/search/?q=x&offset=48'),
+    ('https://shop.ru/search/?start=20', 'https://shop.ru/search/?start=0', 'https://shop.ru/search/?start=40'),
+])
+def test_offset_template(url_page_2, page_1, page_3):
+    template = infer_page_template(url_page_2)
+    assert template.kind == 'offset'
+    assert [template.page_url(n) for n in (1, 2, 3)] == [page_1, url_page_2, page_3]
+
+
+def test_surrounding_whitespace_is_ignored():
+    assert infer_page_template('  https://shop.ru/?page=2 \n').page_url(5) == 'https://shop.ru/?page=5'
+
+
+@pytest.mark.parametrize('url_page_2', ['', None, 'https://shop.ru/search/?q=дрель', 'https://shop.ru/catalog/'])
+def test_missing_page_number(url_page_2):
+    with pytest.raises(ValueError):
+        infer_page_template(url_page_2)
+
+
+def test_iter_page_urls():
+    template = infer_page_template('https://shop.ru/?page=2')
+    assert list(iter_page_urls(template, 4, start=3)) == ['https://shop.ru/?page=3', 'https://shop.ru/?page=4']
+    with pytest.raises(ValueError):
+        template.page_url(0)
+
+
+def test_iter_batches():
+    assert list(iter_batches(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(iter_batches([], 3)) == []
+
+
+def test_build_crawl_plan():
+    template, plan = build_crawl_plan({
+        'url_search_query_page_2': 'https://shop.ru/?q=x&page=2',
+        'count_of_page_on_pagination': '1 000',
+        'total_count_of_results': '23 999',
+    }, concurrency=4, preview=2)
+    assert template.page_url(1000) == plan['last_page_url'] == 'https://shop.ru/?q=x&page=1000'
+    assert plan['preview'] == ['https://shop.ru/?q=x&page=1', 'https://shop.ru/?q=x&page=2']
+    assert plan['estimate']['batch_size'] == 16
+    assert plan['estimate']['batches'] == 63
+    assert plan['estimate']['waves'] == 250
+    assert plan['estimate']['results_per_page'] == 24
+
+
+@pytest.mark.parametrize('pages', ['', '0', None])
+def test_build_crawl_plan_needs_page_count(pages):
+    with pytest.raises(ValueError):
+        build_crawl_plan({'url_search_query_page_2': 'https://shop.ru/?page=2', 'count_of_page_on_pagination': pages})
+
+
+def test_build_crawl_plan_rejects_non_numeric_page_count():
+    with pytest.raises(ValueError):
+        build_crawl_plan({'url_search_query_page_2': 'https://shop.ru/?page=2', 'count_of_page_on_pagination': 'много'})
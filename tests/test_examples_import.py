@@ -0,0 +1,107 @@
+"""Тесты массового импорта примеров шага 2 (examples_import)"""
+import io
+
+import pytest
+
+from examples_import import detect_format, import_examples, MAX_REPORTED_ERRORS
+
+FIELDS = ['name', 'link', 'price']
+DESCRIPTIONS = {'name': 'Название товара', 'price': 'Цена товара'}
+
+
+def sanitize(value):
+    return value.strip().replace('"', r'\"')
+
+
+def run_import(source, **kwargs):
+    return import_examples(source, FIELDS, sanitize, DESCRIPTIONS, **kwargs)
+
+
+def test_csv_with_quotes_and_descriptions_as_headers():
+    source = 'Название товара,link,ЦЕНА ТОВАРА\n"Дрель ""Bosch""",https://shop.ru/1, 1 990 \n'
+    examples_data, errors, error_count = run_import(source)
+    assert (errors, error_count) == ([], 0)
+    assert examples_data['simple'] == [{'name': r'Дрель \"Bosch\"', 'link': 'https://shop.ru/1', 'price': '1 990'}]
+    assert list(examples_data['simple'][0]) == FIELDS
+
+
+def test_missing_columns_are_empty_and_order_follows_selected_fields():
+    examples_data, _, error_count = import_examples('price,name,link\n10,a,b\n', FIELDS + ['stock'], sanitize)
+    assert error_count == 0
+    assert list(examples_data['simple'][0].items()) == [('name', 'a'), ('link', 'b'), ('price', '10'), ('stock', '')]
+
+
+def test_tsv_from_binary_stream_with_bom():
+    data = '\ufeffname\tlink\tprice\nа\tб\t1\n\n'.encode('utf-8')
+    examples_data, _, error_count = run_import(io.BytesIO(data), filename='examples.tsv')
+    assert error_count == 0
+    assert examples_data['simple'] == [{'name': 'а', 'link': 'б', 'price': '1'}]
+
+
+def test_jsonl():
+    source = '{"name": "а", "link": "б", "Цена товара": 10}\n\n{"name": "в", "link": "г", "price": null}\n'
+    examples_data, errors, error_count = run_import(source)
+    assert examples_data['simple'] == [{'name': 'а', 'link': 'б', 'price': '10'}]
+    assert errors == [{'row': 3, 'error': 'Не заполнены обязательные поля: price'}]
+    assert error_count == 1
+
+
+def test_row_errors_keep_valid_rows():
+    source = 'name,link,price,color\nа,б,1,red\nв,г\nд,,3,blue\n'
+    examples_data, errors, error_count = run_import(source)
+    assert [example['name'] for example in examples_data['simple']] == ['а']
+    assert errors == [
+        {'row': 1, 'error': 'Неизвестные колонки: color'},
+        {'row': 3, 'error': 'Ожидалось колонок: 4, получено: 2'},
+        {'row': 4, 'error': 'Не заполнены обязательные поля: link'},
+    ]
+    assert error_count == 3
+
+
+def test_header_without_selected_fields():
+    _, errors, error_count = run_import('a,b\n1,2\n')
+    assert error_count == 2
+    assert errors[-1] == {'row': 1, 'error': 'В заголовке нет ни одного из выбранных полей'}
+
+
+def test_invalid_jsonl_lines():
+    _, errors, error_count = run_import('{"name": "а", "link": "б", "price": "1", "x": 1}\n{oops\n[1]\n', fmt='jsonl')
+    assert [error['error'].split(':')[0] for error in errors] == ['Неизвестные ключи', 'Невалидный JSON',
+                                                                 'Ожидался JSON-объект']
+    assert error_count == 3
+
+
+def test_only_first_errors_are_reported():
+    rows = ''.join('а,,1\n' for _ in range(MAX_REPORTED_ERRORS + 50))
+    examples_data, errors, error_count = run_import('name,link,price\n' + rows)
+    assert not examples_data['simple']
+    assert len(errors) == MAX_REPORTED_ERRORS
+    assert error_count == MAX_REPORTED_ERRORS + 50
+
+
+@pytest.mark.parametrize('source', ['', 'name,link,price\n'])
+def test_no_examples(source):
+    examples_data, errors, error_count = run_import(source)
+    assert examples_data['simple'] == []
+    assert errors == [{'row': None, 'error': 'Нет ни одного примера'}]
+    assert error_count == 1
+
+
+def test_undecodable_file():
+    _, errors, error_count = run_import(io.BytesIO('name,link,price\nа,б,1\n'.encode('cp1251')))
+    assert error_count == 1
+    assert errors[0]['row'] is None and errors[0]['error'].startswith('Не удалось прочитать данные')
+
+
+@pytest.mark.parametrize('first_line, filename, expected', [
+    ('name,link', None, 'csv'),
+    ('name\tlink', None, 'tsv'),
+    ('{"name": "а"}', None, 'jsonl'),
+    ('\ufeff {"name": "а"}', None, 'jsonl'),
+    ('name,link', 'examples.tsv', 'tsv'),
+    ('name\tlink', 'examples.CSV', 'csv'),
+    ('name,link', 'examples.ndjson', 'jsonl'),
+    ('name\tlink', 'examples.txt', 'tsv'),
+])
+def test_detect_format(first_line, filename, expected):
+    assert detect_format(first_line, filename) == expected
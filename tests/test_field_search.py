@@ -0,0 +1,93 @@
+"""Тесты поиска по реестру полей шага 1 (field_search)"""
+import pytest
+
+from field_search import FieldSearchIndex, normalize
+
+FIELDS = {
+    'name': 'Наименование товара',
+    'link': 'Ссылка на товар',
+    'price': 'Цена',
+    'oldprice': 'Старая цена',
+    'stock': 'Наличие товара',
+    'article': 'Артикул',
+    'product_id': 'Код товара',
+    'InStock_trigger': 'Триггер наличия товара',
+    'rating': 'Ёмкость рейтинга',
+}
+
+
+@pytest.fixture(scope='module')
+def index():
+    return FieldSearchIndex(FIELDS)
+
+
+def keys(result):
+    return [item['key'] for item in result[0]]
+
+
+def test_normalize():
+    assert normalize('InStock_trigger') == ['in', 'stock', 'trigger']
+    assert normalize('imageLink') == ['image', 'link']
+    assert normalize('Ёмкость, ЁЛКА') == ['емкость', 'елка']
+
+
+@pytest.mark.parametrize('query', ['ёмк', 'емк', 'ЕМКОСТЬ', 'Ёмкость'])
+def test_yo_and_ye_are_the_same(index, query):
+    assert keys(index.search(query)) == ['rating']
+
+
+def test_empty_query_lists_registry(index):
+    result = index.search('', limit=3, offset=1)
+    assert keys(result) == ['link', 'price', 'oldprice']
+    assert result[1] == len(FIELDS)
+
+
+def test_ranking_tiers(index):
+    # Точный ключ, затем первое слово описания, затем остальные префиксы
+    items, _ = index.search('price')
+    assert (items[0]['key'], items[0]['match']) == ('price', 'exact')
+
+    assert keys(index.search('цен')) == ['price', 'oldprice']
+    assert [item['match'] for item in index.search('цен')[0]] == ['prefix', 'prefix']
+    assert keys(index.search('налич')) == ['stock', 'InStock_trigger']
+    # Первое слово описания важнее порядка реестра
+    assert keys(FieldSearchIndex({'old': 'Старая цена', 'new': 'Цена'}).search('цен')) == ['new', 'old']
+
+
+def test_compact_key(index):
+    assert keys(index.search('productid')) == ['product_id']
+    assert keys(index.search('product id')) == ['product_id']
+
+
+def test_typo_goes_after_prefix_matches(index):
+    items, _ = index.search('артикл')
+    assert [(item['key'], item['match']) for item in items] == [('article', 'trigram')]
+
+
+def test_multi_word_all_words_first(index):
+    items, _ = index.search('код товара')
+    assert items[0] == {'key': 'product_id', 'description': 'Код товара', 'match': 'prefix'}
+    # Поля с одним совпавшим словом - ниже, но не пропадают
+    assert {item['match'] for item in items[1:]} == {'partial'}
+    assert 'name' in keys((items, None))
+
+
+def test_multi_word_with_unmatched_word(index):
+    # "товара" есть у многих полей, "цена" - у двух: поле "Цена" не пропадает из выдачи
+    items, total = index.search('цена товара')
+    assert items[0]['key'] == 'price'
+    assert 'oldprice' in keys((items, total))
+    assert index.search('цена несуществующее')[0][0]['key'] == 'price'
+
+
+def test_more_matched_words_rank_higher(index):
+    result = keys(index.search('триггер налич цена'))
+    assert result[0] == 'InStock_trigger'
+    assert result.index('InStock_trigger') < result.index('stock') < result.index('oldprice')
+
+
+def test_pagination(index):
+    first = index.search('товар', limit=2)
+    second = index.search('товар', limit=2, offset=2)
+    assert first[1] == second[1] == 5
+    assert not set(keys(first)) & set(keys(second))
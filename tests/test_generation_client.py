@@ -0,0 +1,169 @@
+"""Тесты клиента сервиса генерации (generation_client)"""
+import socketserver
+import threading
+
+import pytest
+
+from generation_client import GenerationClient, GenerationError, GenerationJobs
+from generation_standin import make_server
+
+
+def serve(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def standin():
+    server = serve(make_server(port=0, line_delay=0))
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+class _Requests(socketserver.StreamRequestHandler):
+    """Читает запрос и отвечает заданным статусом или обрывает соединение"""
+
+    def handle(self):
+        request_line = self.rfile.readline().decode('ascii')
+        length = 0
+        while True:
+            line = self.rfile.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('ascii').partition(':')
+            if name.lower() == 'content-length':
+                length = int(value)
+        self.rfile.read(length)
+        self.server.methods.append(request_line.split()[0])
+        if self.server.status is not None:
+            self.wfile.write(f'HTTP/1.1 {self.server.status} Error\r\nContent-Length: 0\r\n'
+                             f'Connection: close\r\n\r\n'.encode('ascii'))
+
+
+@pytest.fixture
+def broken():
+    """Сервис, который принимает запрос и закрывает соединение без ответа (status=None) или с ошибкой"""
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _Requests)
+    server.daemon_threads = True
+    server.methods = []
+    server.status = None
+    serve(server)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client_for(server, **kwargs):
+    return GenerationClient(f'http://127.0.0.1:{server.server_address[1]}', timeout=2, backoff=0, **kwargs)
+
+
+def test_generate_with_standin(standin):
+    client = GenerationClient(standin, backoff=0)
+    chunks = []
+    result = client.generate({'selected_fields': ['name', 'price']}, on_log=chunks.append)
+    log = ''.join(chunks)
+    assert 'GLOBAL CODE GEN' in log and log.endswith('Генерация завершена\n')
+    assert result['result_code'] and result['message_global']
+    client.close()
+
+
+def test_post_is_not_retried_after_it_was_sent(broken):
+    client = client_for(broken, retries=3)
+    with pytest.raises(GenerationError, match='нет ответа'):
+        client.start({'selected_fields': []})
+    assert broken.methods == ['POST']
+
+
+def test_get_is_retried_on_missing_response(broken):
+    client = client_for(broken, retries=3)
+    with pytest.raises(GenerationError, match='недоступен'):
+        client.result_code('0' * 32)
+    assert broken.methods == ['GET'] * 4
+
+
+@pytest.mark.parametrize('method, call, attempts', [
+    ('GET', lambda client: client.message_global('0' * 32), 3),
+    ('POST', lambda client: client.start({}), 1),
+])
+def test_retryable_status_is_retried_only_for_get(broken, method, call, attempts):
+    broken.status = 503
+    with pytest.raises(GenerationError, match='503'):
+        call(client_for(broken, retries=2))
+    assert broken.methods == [method] * attempts
+
+
+def test_invalid_url():
+    with pytest.raises(ValueError):
+        GenerationClient('ftp://generator')
+
+
+class FakeClient:
+    """Генерации, которые завершаются по команде теста"""
+
+    def __init__(self):
+        self.release = {}
+
+    def generate(self, payload, on_log=None):
+        event = self.release.setdefault(payload['n'], threading.Event())
+        if on_log is not None:
+            on_log(f'лог {payload["n"]}\n')
+        event.wait(5)
+        if payload.get('fail'):
+            raise GenerationError('сервис упал')
+        return {'result_code': f'code {payload["n"]}', 'message_global': 'ok'}
+
+
+def wait_status(job, status):
+    for _ in range(500):
+        if job.status == status:
+            return
+        threading.Event().wait(0.01)
+    raise AssertionError(f'{job.id}: {job.status} != {status}')
+
+
+def test_eviction_skips_running_jobs():
+    fake = FakeClient()
+    jobs = GenerationJobs(fake, max_jobs=2)
+    running = jobs.submit({'n': 0})
+    finished = jobs.submit({'n': 1})
+    fake.release.setdefault(1, threading.Event()).set()
+    wait_status(finished, 'done')
+
+    newest = jobs.submit({'n': 2})
+    assert jobs.get(running.id) is running
+    assert jobs.get(finished.id) is None
+    assert jobs.get(newest.id) is newest
+
+    # Завершённых нет - реестр временно больше max_jobs, идущие генерации не теряются
+    extra = jobs.submit({'n': 3})
+    assert all(jobs.get(job.id) is job for job in (running, newest, extra))
+    for event in fake.release.values():
+        event.set()
+
+
+def test_on_log_errors_do_not_abort_generation():
+    fake = FakeClient()
+    calls = []
+
+    def on_log(chunk):
+        calls.append(chunk)
+        raise OSError('диск заполнен')
+
+    finished = []
+    job = GenerationJobs(fake).submit({'n': 0}, on_log=on_log, on_finish=lambda job, result: finished.append(result))
+    fake.release.setdefault(0, threading.Event()).set()
+    wait_status(job, 'done')
+    assert job.result_code == 'code 0'
+    assert job.log() == 'лог 0\n'
+    assert len(calls) == 1 and finished[0]['message_global'] == 'ok'
+
+
+def test_failed_generation():
+    fake = FakeClient()
+    job = GenerationJobs(fake).submit({'n': 0, 'fail': True})
+    fake.release.setdefault(0, threading.Event()).set()
+    wait_status(job, 'error')
+    assert job.error == 'сервис упал'
+    assert 'Ошибка генерации: сервис упал' in job.log()
@@ -0,0 +1,208 @@
+"""Тесты сегментированного лога генерации (segmented_log)"""
+import os
+from datetime import datetime
+
+import pytest
+
+import segmented_log
+from segmented_log import INDEX_FILE, parse_time, SegmentedLog, TIMESTAMP_FORMAT
+
+SEPARATOR = '-' * 78
+
+
+def timestamp(second):
+    return datetime(2025, 12, 14, 9, 47, second).strftime(TIMESTAMP_FORMAT)
+
+
+def sample_log():
+    lines = [f'{timestamp(0)} старт']
+    for name, first in (('GLOBAL CODE GEN', 10), ('FINAL RESULT PARSER CODE', 30)):
+        lines += [SEPARATOR, name, SEPARATOR]
+        lines += [f'{timestamp(first + n)} {name.lower()} строка {n}' for n in range(10)]
+    return '\n'.join(lines) + '\n'
+
+
+@pytest.fixture
+def log_dir(tmp_path):
+    return str(tmp_path / 'log')
+
+
+def write_log(directory, text, segment_bytes=256, chunk=37):
+    log = SegmentedLog(directory, segment_bytes=segment_bytes)
+    # Кусками произвольной длины, как приходит вывод генератора
+    for start in range(0, len(text), chunk):
+        log.append(text[start:start + chunk])
+    log.flush()
+    return log
+
+
+def test_segments_split_on_line_boundaries(log_dir):
+    text = sample_log()
+    log = write_log(log_dir, text)
+    assert len(log.segments) > 1
+    assert log.read() == text.encode('utf-8')
+    for segment in log.segments:
+        with open(segment.path, 'rb') as f:
+            assert f.read().endswith(b'\n')
+
+
+def test_read_range_across_segments(log_dir):
+    data = sample_log().encode('utf-8')
+    log = write_log(log_dir, sample_log())
+    assert log.read(100, 700) == data[100:700]
+    assert b''.join(log.iter_bytes(5, 600, chunk_size=7)) == data[5:600]
+
+
+def test_reopen_uses_saved_index(log_dir):
+    log = write_log(log_dir, sample_log())
+    reopened = SegmentedLog(log_dir, segment_bytes=256)
+    assert reopened.size == log.size
+    assert reopened.sections() == log.sections()
+
+
+def test_index_is_rebuilt_when_older_than_segments(log_dir):
+    log = write_log(log_dir, sample_log())
+    index_path = os.path.join(log_dir, INDEX_FILE)
+    # Запись прервалась между сегментом и индексом: индекс пустой и старше сегментов
+    with open(index_path, 'w', encoding='utf-8') as f:
+        f.write('')
+    os.utime(index_path, (0, 0))
+    assert SegmentedLog(log_dir).sections() == log.sections()
+
+
+def test_sections(log_dir):
+    text = sample_log()
+    log = write_log(log_dir, text)
+    sections = log.sections()
+    assert [section['name'] for section in sections] == ['GLOBAL CODE GEN', 'FINAL RESULT PARSER CODE']
+    assert sections[0]['time'] == timestamp(0)
+    start, end = log.section_offsets('final result parser code')
+    assert log.read(start, end).decode('utf-8') == text[text.index(SEPARATOR + '\nFINAL'):]
+    assert log.section_offsets('нет такой') is None
+
+
+def test_tail_offset(log_dir):
+    text = sample_log()
+    log = write_log(log_dir, text)
+    tail = log.read(log.tail_offset(3)).decode('utf-8')
+    assert tail == '\n'.join(text.rstrip('\n').split('\n')[-3:]) + '\n'
+    assert log.tail_offset(10 ** 6) == 0
+
+
+def test_time_range(log_dir):
+    log = write_log(log_dir, sample_log())
+    start, end = log.time_range_offsets(parse_time(timestamp(12)), parse_time(timestamp(14)))
+    lines = log.read(start, end).decode('utf-8').splitlines()
+    assert [line[:19] for line in lines] == [timestamp(12), timestamp(13), timestamp(14)]
+
+
+def test_search(log_dir):
+    log = write_log(log_dir, sample_log())
+    matches, truncated = log.search('строка 3')
+    assert not truncated
+    assert [match['section'] for match in matches] == ['GLOBAL CODE GEN', 'FINAL RESULT PARSER CODE']
+    assert all(log.read(match['offset']).decode('utf-8').startswith(match['line']) for match in matches)
+
+    matches, truncated = log.search('строка', limit=5)
+    assert len(matches) == 5 and truncated
+    with pytest.raises(ValueError):
+        log.search('')
+
+
+def test_incomplete_line_waits_for_flush(log_dir):
+    log = SegmentedLog(log_dir)
+    log.append('без перевода строки')
+    assert log.size == 0
+    log.flush()
+    assert log.read() == 'без перевода строки'.encode('utf-8')
+
+
+def test_on_write_counts_bytes_on_disk(log_dir):
+    written = []
+    log = SegmentedLog(log_dir, on_write=written.append)
+    log.append(sample_log())
+    log.flush()
+    on_disk = sum(os.path.getsize(os.path.join(log_dir, name)) for name in os.listdir(log_dir))
+    assert sum(written) == on_disk
+
+
+def test_closed_log_ignores_writes_and_does_not_recreate_directory(log_dir):
+    log = write_log(log_dir, sample_log())
+    log.close()
+    for name in os.listdir(log_dir):
+        os.remove(os.path.join(log_dir, name))
+    os.rmdir(log_dir)
+    log.append('ещё строка\n')
+    log.flush()
+    assert not os.path.exists(log_dir)
+
+
+def test_from_file_is_readonly_and_survives_truncation(tmp_path):
+    path = tmp_path / 'output.log'
+    text = sample_log()
+    path.write_text(text, encoding='utf-8')
+    log = SegmentedLog.from_file(str(path))
+    assert [section['name'] for section in log.sections()] == ['GLOBAL CODE GEN', 'FINAL RESULT PARSER CODE']
+    with pytest.raises(ValueError):
+        log.append('x\n')
+    # Внешний генератор укоротил файл - читается то, что осталось
+    path.write_text(text[:50], encoding='utf-8')
+    assert log.read() == text[:50].encode('utf-8')
+    assert log.search('строка') == ([], False)
+
+
+def test_from_file_reads_only_requested_range(tmp_path, monkeypatch):
+    # Маленький блок и частые метки индекса: файл читается по частям, как большой output.log
+    monkeypatch.setattr(segmented_log, 'READ_BLOCK_BYTES', 64)
+    monkeypatch.setattr(segmented_log, 'INDEX_INTERVAL', 128)
+    path = tmp_path / 'output.log'
+    text = sample_log()
+    path.write_text(text, encoding='utf-8')
+    data = text.encode('utf-8')
+    log = SegmentedLog.from_file(str(path))
+    reference = write_log(str(tmp_path / 'log'), text)
+    assert log.sections() == reference.sections()
+
+    reads = []
+    read_range = segmented_log._read_range
+    monkeypatch.setattr(segmented_log, '_read_range',
+                        lambda path, start, end: reads.append(end - start) or read_range(path, start, end))
+    assert log.read(log.tail_offset(3)) == reference.read(reference.tail_offset(3))
+    assert log.time_range_offsets(parse_time(timestamp(12)), parse_time(timestamp(14))) == \
+        reference.time_range_offsets(parse_time(timestamp(12)), parse_time(timestamp(14)))
+    assert reads and max(reads) < len(data)
+
+    assert log.read(100, 700) == data[100:700]
+    assert log.search('строка 3') == reference.search('строка 3')
+    assert log.search('строка', limit=5) == reference.search('строка', limit=5)
+
+
+def test_parallel_search_matches_sequential(log_dir, monkeypatch):
+    text = sample_log() * 5
+    log = write_log(log_dir, text)
+    expected = log.search('строка 3'), log.search('строка', limit=7)
+
+    monkeypatch.setattr(segmented_log, 'SEARCH_WORKERS', 2)
+    monkeypatch.setattr(segmented_log, 'PARALLEL_SEARCH_MIN_BYTES', 0)
+    monkeypatch.setattr(segmented_log, '_search_pool', None)
+    try:
+        assert (log.search('строка 3'), log.search('строка', limit=7)) == expected
+        assert segmented_log._search_pool is not None
+    finally:
+        if segmented_log._search_pool is not None:
+            segmented_log._search_pool.shutdown()
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('14.12.2025 09:47:58', datetime(2025, 12, 14, 9, 47, 58).timestamp()),
+    ('2025-12-14T09:47:58', datetime(2025, 12, 14, 9, 47, 58).timestamp()),
+    ('1765700000', 1765700000.0),
+])
+def test_parse_time(value, expected):
+    assert parse_time(value) == expected
+
+
+@pytest.mark.parametrize('value', ['', 'вчера', '14/12/2025'])
+def test_parse_time_rejects_unknown_format(value):
+    with pytest.raises(ValueError):
+        parse_time(value)
@@ -0,0 +1,202 @@
+"""Тесты серверных сессий (server_session)"""
+import os
+import time
+from datetime import timedelta
+
+import pytest
+from flask import Flask, session
+
+from server_session import FileSession, FileSessionInterface, SessionTooLarge
+
+
+@pytest.fixture
+def interface(tmp_path):
+    return FileSessionInterface(str(tmp_path / 'sessions'), max_bytes=64 * 1024, skip_paths=('/content/',))
+
+
+@pytest.fixture
+def app(interface):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = interface
+    app.permanent_session_lifetime = timedelta(days=1)
+
+    @app.route('/set/<key>/<value>')
+    def set_value(key, value):
+        session[key] = value
+        return 'ok'
+
+    @app.route('/examples/<int:count>')
+    def set_examples(count):
+        session['examples_data'] = {'simple': [{'name': f'товар {n}'} for n in range(count)]}
+        return 'ok'
+
+    @app.route('/get/<key>')
+    def get_value(key):
+        return str(session.get(key))
+
+    @app.route('/content/<name>')
+    def content(name):
+        return type(session._get_current_object()).__name__
+
+    @app.route('/clear')
+    def clear():
+        session.clear()
+        return 'ok'
+
+    return app
+
+
+def files(interface):
+    return sorted(os.listdir(interface.directory)) if os.path.isdir(interface.directory) else []
+
+
+def sid_of(interface):
+    return next(name[:-len('.json')] for name in files(interface) if name.endswith('.json'))
+
+
+def test_data_survives_between_requests(app, interface):
+    client = app.test_client()
+    client.get('/set/selected/price')
+    assert client.get('/get/selected').text == 'price'
+    assert client.get_cookie('session').value.split('.')[0] == sid_of(interface)
+
+
+def test_forged_cookie_starts_new_session(app, interface):
+    client = app.test_client()
+    client.set_cookie('session', 'poller-1')
+    client.get('/set/selected/price')
+    assert client.get_cookie('session').value != 'poller-1'
+    assert client.get('/get/selected').text == 'price'
+
+
+
+def test_bulk_keys_are_stored_separately_and_loaded_on_access(app, interface):
+    client = app.test_client()
+    client.get('/set/selected/price')
+    client.get('/examples/100')
+    sid = sid_of(interface)
+    assert files(interface) == [f'{sid}.bulk', f'{sid}.json', f'{sid}.lock']
+    with open(os.path.join(interface.directory, f'{sid}.json'), encoding='utf-8') as f:
+        assert 'examples_data' not in f.read()
+
+    assert 'товар 99' in client.get('/get/examples_data').text
+    # Изменение другого ключа не переписывает объёмные данные
+    bulk_path = os.path.join(interface.directory, f'{sid}.bulk')
+    os.utime(bulk_path, (0, 0))
+    client.get('/set/selected/name')
+    assert os.path.getmtime(bulk_path) == 0
+    assert 'товар 99' in client.get('/get/examples_data').text
+
+
+def test_lazy_session_loads_bulk_only_when_needed():
+    loads = []
+
+    def load_bulk():
+        loads.append(1)
+        return {'examples_data': {'simple': []}}
+
+    stored = FileSession({'selected_fields': ['price']}, sid='x', load_bulk=load_bulk)
+    assert stored['selected_fields'] == ['price'] and stored
+    assert not loads and not stored.bulk_accessed
+    assert 'examples_data' in stored
+    assert loads == [1]
+    assert sorted(stored) == ['examples_data', 'selected_fields']
+    assert loads == [1] and not stored.modified
+
+
+def test_clear_removes_files(app, interface):
+    client = app.test_client()
+    client.get('/examples/3')
+    client.get('/clear')
+    assert [name for name in files(interface) if not name.endswith('.lock')] == []
+
+
+def test_skip_paths_do_not_open_session(app, interface):
+    client = app.test_client()
+    client.get('/set/selected/price')
+    assert client.get('/content/logo.png').text == 'NullSession'
+
+
+def test_too_large_session_is_not_saved(app, interface):
+    stored = FileSession(sid='big')
+    stored['examples_data'] = {'simple': ['x' * 100_000]}
+    with pytest.raises(SessionTooLarge):
+        interface.check_size(stored)
+
+    client = app.test_client()
+    client.get('/examples/10')
+    # Слишком большие данные не записываются - на диске остаётся прежнее состояние
+    client.get('/examples/10000')
+    assert 'товар 9' in client.get('/get/examples_data').text
+    assert 'товар 9999' not in client.get('/get/examples_data').text
+
+
+def test_expired_session_is_removed(app, interface):
+    client = app.test_client()
+    client.get('/examples/3')
+    sid = sid_of(interface)
+    old = time.time() - 2 * 24 * 3600
+    os.utime(os.path.join(interface.directory, f'{sid}.json'), (old, old))
+    assert client.get('/get/examples_data').text == 'None'
+    assert not os.path.exists(os.path.join(interface.directory, f'{sid}.bulk'))
+
+
+def test_cleanup_removes_old_sessions_with_their_files(interface):
+    interface._write('old', '{}', '{}')
+    interface._write('fresh', '{}', '{}')
+    now = time.time()
+    old = now - 10 * 24 * 3600
+    for name in ('old.json', 'old.bulk'):
+        os.utime(os.path.join(interface.directory, name), (old, old))
+    # Объёмные данные не обновляются при чтении - их возраст сам по себе ничего не значит
+    os.utime(os.path.join(interface.directory, 'fresh.bulk'), (old, old))
+    assert interface.cleanup(max_age=24 * 3600, now=now) == 1
+    assert files(interface) == ['fresh.bulk', 'fresh.json']
+
+
+def test_update_applies_under_lock_and_saves(app, interface):
+    client = app.test_client()
+    client.get('/examples/2')
+    sid = sid_of(interface)
+
+    def add_example(stored):
+        stored['examples_data']['simple'].append({'name': 'новый'})
+        stored.modified = True
+        return len(stored['examples_data']['simple'])
+
+    assert interface.update(sid, add_example) == 3
+    assert 'новый' in client.get('/get/examples_data').text
+    with pytest.raises(KeyError):
+        interface.update('missing', add_example)
+
+
+def test_stale_request_keeps_concurrent_changes(app, interface):
+    interface.counter_keys = ('version',)
+
+    @app.route('/stale')
+    def stale():
+        session.get('examples_data')
+        # Пока запрос выполняется, параллельный запрос меняет сессию под блокировкой
+        def concurrent(stored):
+            stored['examples_data'] = {'simple': [{'name': 'из PATCH'}]}
+            stored['version'] += 1
+            del stored['old']
+        interface.update(session.sid, concurrent)
+        session['selected'] = 'link'
+        session['version'] += 1
+        return 'ok'
+
+    @app.route('/init')
+    def init():
+        session.update(selected='price', old='x', version=1, examples_data={'simple': []})
+        return 'ok'
+
+    client = app.test_client()
+    client.get('/init')
+    client.get('/stale')
+    assert client.get('/get/selected').text == 'link'
+    assert 'из PATCH' in client.get('/get/examples_data').text
+    assert client.get('/get/old').text == 'None'
+    # Оба запроса увеличили версию
+    assert client.get('/get/version').text == '3'
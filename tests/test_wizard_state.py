@@ -0,0 +1,207 @@
+"""Тесты автосохранения шагов 2 и 3 (wizard_state.apply_patch)"""
+from collections import OrderedDict
+
+import pytest
+
+from server_session import FileSession
+from wizard_state import (apply_patch, bump_structure, bump_version, get_structure, get_version, MAX_OPS,
+                          PatchError, VersionConflict)
+
+FIELDS = ['name', 'link', 'price']
+
+
+def sanitize(value):
+    return value.strip().replace('"', r'\"')
+
+
+def make_session(examples=1):
+    session = FileSession({
+        'selected_fields': FIELDS,
+        'examples_data': OrderedDict([('simple', [
+            OrderedDict((field, f'{field}-{n}') for field in FIELDS) for n in range(examples)
+        ])]),
+    }, sid='test')
+    session.modified = False
+    return session
+
+
+def patch(session, ops, version=None, structure=None):
+    body = {'version': get_version(session) if version is None else version, 'ops': ops}
+    if structure is not None:
+        body['structure'] = structure
+    return apply_patch(session, body, FIELDS, sanitize)
+
+
+def names(session):
+    return [example['name'] for example in session['examples_data']['simple']]
+
+
+def test_set_cell_sanitizes_and_bumps_version():
+    session = make_session()
+    assert patch(session, [{'op': 'set_cell', 'example': 0, 'field': 'name', 'value': ' Дрель "Bosch" '}]) == (1, 0)
+    assert session['examples_data']['simple'][0]['name'] == r'Дрель \"Bosch\"'
+    assert session.modified
+
+
+def test_structural_ops_bump_structure_once():
+    session = make_session(2)
+    version, structure = patch(session, [
+        {'op': 'add_example'},
+        {'op': 'set_cell', 'example': 2, 'field': 'name', 'value': 'новый'},
+        {'op': 'remove_example', 'example': 0},
+    ])
+    assert (version, structure) == (1, 1)
+    assert names(session) == ['name-1', 'новый']
+
+
+def test_search_ops_create_search_request():
+    session = make_session()
+    patch(session, [
+        {'op': 'set_search', 'field': 'query', 'value': 'дрель'},
+        {'op': 'set_links_items', 'value': ['https://shop.ru/1', '  ', 'https://shop.ru/2']},
+    ])
+    search_request = session['search_requests_data']['search_requests'][0]
+    assert search_request['query'] == 'дрель'
+    assert search_request['links_items'] == ['https://shop.ru/1', 'https://shop.ru/2']
+
+
+def test_patch_drops_result_json():
+    session = make_session()
+    session['result_json'] = {'simple': []}
+    patch(session, [{'op': 'set_cell', 'example': 0, 'field': 'price', 'value': '10'}])
+    assert 'result_json' not in session
+
+
+def test_first_patch_without_examples_starts_from_empty_example():
+    session = FileSession({'selected_fields': FIELDS}, sid='test')
+    patch(session, [{'op': 'set_cell', 'example': 0, 'field': 'price', 'value': '10'}])
+    assert session['examples_data']['simple'] == [OrderedDict([('name', ''), ('link', ''), ('price', '10')])]
+
+
+@pytest.mark.parametrize('body, message', [
+    (None, 'JSON'),
+    ({'ops': [{'op': 'add_example'}]}, 'версия'),
+    ({'version': True, 'ops': [{'op': 'add_example'}]}, 'версия'),
+    ({'version': 0, 'structure': '1', 'ops': [{'op': 'add_example'}]}, 'структуры'),
+    ({'version': 0, 'ops': []}, 'Нет изменений'),
+    ({'version': 0, 'ops': [{'op': 'add_example'}] * (MAX_OPS + 1)}, 'Слишком много'),
+    ({'version': 0, 'ops': [{'op': 'drop_table'}]}, 'неизвестная операция'),
+    ({'version': 0, 'ops': [{'op': 'set_cell', 'example': 5, 'field': 'name', 'value': 'x'}]}, 'нет примера'),
+    ({'version': 0, 'ops': [{'op': 'set_cell', 'example': 0, 'field': 'stock', 'value': 'x'}]}, 'не выбрано'),
+    ({'version': 0, 'ops': [{'op': 'set_cell', 'example': 0, 'field': 'name', 'value': 1}]}, 'строкой'),
+    ({'version': 0, 'ops': [{'op': 'remove_example', 'example': 0}]}, 'единственный'),
+    ({'version': 0, 'ops': [{'op': 'set_search', 'field': 'links_items', 'value': 'x'}]}, 'неизвестное поле'),
+    ({'version': 0, 'ops': [{'op': 'set_links_items', 'value': 'https://shop.ru'}]}, 'списком строк'),
+])
+def test_invalid_patch_is_rejected(body, message):
+    session = make_session()
+    with pytest.raises(PatchError, match=message):
+        apply_patch(session, body, FIELDS, sanitize)
+    assert get_version(session) == 0
+
+
+def test_invalid_op_applies_nothing():
+    session = make_session()
+    with pytest.raises(PatchError):
+        patch(session, [
+            {'op': 'set_cell', 'example': 0, 'field': 'name', 'value': 'изменено'},
+            {'op': 'set_cell', 'example': 1, 'field': 'name', 'value': 'нет такого'},
+        ])
+    assert names(session) == ['name-0']
+    assert not session.modified
+
+
+def test_validation_follows_added_and_removed_examples():
+    session = make_session()
+    with pytest.raises(PatchError, match='нет примера'):
+        patch(session, [
+            {'op': 'add_example'},
+            {'op': 'remove_example', 'example': 0},
+            {'op': 'set_cell', 'example': 1, 'field': 'name', 'value': 'x'},
+        ])
+
+
+def test_stale_cell_edit_is_rebased_while_structure_is_unchanged():
+    session = make_session()
+    bump_version(session)
+    bump_version(session)
+    version, structure = patch(session, [{'op': 'set_cell', 'example': 0, 'field': 'name', 'value': 'x'}],
+                               version=0, structure=0)
+    assert (version, structure) == (3, 0)
+    assert names(session) == ['x']
+
+
+def test_stale_cell_edit_without_structure_conflicts():
+    session = make_session()
+    bump_version(session)
+    with pytest.raises(VersionConflict) as error:
+        patch(session, [{'op': 'set_cell', 'example': 0, 'field': 'name', 'value': 'x'}], version=0)
+    assert (error.value.version, error.value.structure) == (1, 0)
+
+
+def test_cell_edit_after_structure_change_conflicts():
+    session = make_session()
+    bump_structure(session)
+    with pytest.raises(VersionConflict) as error:
+        patch(session, [{'op': 'set_cell', 'example': 0, 'field': 'name', 'value': 'x'}], structure=0)
+    assert error.value.structure == 1
+    assert names(session) == ['name-0']
+
+
+def test_stale_structural_op_conflicts():
+    session = make_session()
+    bump_version(session)
+    with pytest.raises(VersionConflict):
+        patch(session, [{'op': 'add_example'}], version=0, structure=0)
+    assert len(names(session)) == 1
+
+
+def test_search_edit_ignores_structure_change():
+    session = make_session()
+    bump_version(session)
+    bump_structure(session)
+    assert patch(session, [{'op': 'set_search', 'field': 'query', 'value': 'дрель'}],
+                 version=0, structure=0) == (2, 1)
+    assert get_structure(session) == 1
+
+
+def test_stale_request_does_not_revert_concurrent_patch(tmp_path):
+    from flask import Flask, session as flask_session
+
+    from server_session import FileSessionInterface
+    from wizard_state import STRUCTURE_KEY, VERSION_KEY
+
+    interface = FileSessionInterface(str(tmp_path), counter_keys=(VERSION_KEY, STRUCTURE_KEY))
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = interface
+
+    @app.route('/step2', methods=['POST'])
+    def step2():
+        flask_session['selected_fields'] = FIELDS
+        flask_session['examples_data'] = make_session(2)['examples_data']
+        bump_version(flask_session)
+        bump_structure(flask_session)
+        return 'ok'
+
+    @app.route('/step3', methods=['POST'])
+    def step3():
+        # Запрос прочитал версию и примеры, затем страница шага 2 прислала PATCH
+        assert get_version(flask_session) == 1
+        interface.update(flask_session.sid, lambda stored: patch(stored, [
+            {'op': 'set_cell', 'example': 1, 'field': 'name', 'value': 'из PATCH'}], structure=1))
+        flask_session['search_requests_data'] = {'search_requests': []}
+        bump_version(flask_session)
+        return 'ok'
+
+    @app.route('/state')
+    def state():
+        return {'names': names(flask_session), 'version': get_version(flask_session),
+                'structure': get_structure(flask_session), 'search': 'search_requests_data' in flask_session}
+
+    client = app.test_client()
+    client.post('/step2')
+    client.post('/step3')
+    # Ячейка из PATCH не откатилась, версия выросла на оба изменения
+    assert client.get('/state').json == {'names': ['name-0', 'из PATCH'], 'version': 3, 'structure': 1,
+                                         'search': True}
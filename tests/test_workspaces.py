@@ -0,0 +1,135 @@
+"""Тесты рабочих папок (workspaces.WorkspaceManager): индекс, вытеснение, несколько процессов"""
+import os
+import time
+
+import pytest
+
+from workspaces import WorkspaceManager
+
+ID_A = 'a' * 32
+ID_B = 'b' * 32
+ID_C = 'c' * 32
+
+
+@pytest.fixture
+def root(tmp_path):
+    return str(tmp_path / 'workspaces')
+
+
+def test_write_and_resolve(root):
+    manager = WorkspaceManager(root)
+    path = manager.write(ID_A, 'result_code.ts', 'код')
+    assert manager.resolve(ID_A, 'result_code.ts') == path
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == 'код'
+    assert manager.resolve(ID_A, 'message_global.txt') is None
+    assert manager.resolve(ID_B, 'result_code.ts') is None
+    assert manager.total_bytes == len('код'.encode('utf-8'))
+
+
+@pytest.mark.parametrize('workspace_id, name', [
+    ('../' + 'a' * 29, 'result_code.ts'),
+    ('A' * 32, 'result_code.ts'),
+    (ID_A, '../app.py'),
+])
+def test_write_rejects_bad_names(root, workspace_id, name):
+    with pytest.raises(ValueError):
+        WorkspaceManager(root).write(workspace_id, name, 'x')
+
+
+def test_sweep_removes_expired(root):
+    manager = WorkspaceManager(root, ttl_seconds=100)
+    manager.write(ID_A, 'result_code.ts', 'x')
+    manager.write(ID_B, 'result_code.ts', 'y')
+    # Перед очисткой индекс сверяется с диском: последнее обращение - mtime папки и файлов
+    old = time.time() - 1000
+    for path in (os.path.join(root, ID_A, 'result_code.ts'), os.path.join(root, ID_A)):
+        os.utime(path, (old, old))
+    manager._workspaces[ID_A].last_access = old
+
+    assert manager.sweep() == 1
+    assert not os.path.exists(os.path.join(root, ID_A))
+    assert manager.resolve(ID_B, 'result_code.ts') is not None
+    assert manager.evicted == 1
+
+
+def test_sweep_evicts_least_recently_used_over_quota(root):
+    manager = WorkspaceManager(root, quota_bytes=250)
+    for workspace_id in (ID_A, ID_B, ID_C):
+        manager.write(workspace_id, 'result_code.ts', 'x' * 100)
+    # Обращение к A делает самой давней папку B
+    manager.resolve(ID_A, 'result_code.ts')
+
+    assert manager.sweep() == 1
+    assert manager.resolve(ID_B, 'result_code.ts') is None
+    assert manager.resolve(ID_A, 'result_code.ts') is not None
+    assert manager.resolve(ID_C, 'result_code.ts') is not None
+    assert manager.total_bytes == 200
+
+
+def test_sweep_within_quota_keeps_everything(root):
+    manager = WorkspaceManager(root, quota_bytes=1000)
+    manager.write(ID_A, 'result_code.ts', 'x' * 100)
+    assert manager.sweep() == 0
+    assert manager.usage()['workspaces'] == 1
+
+
+def test_index_is_loaded_from_disk(root):
+    WorkspaceManager(root).write(ID_A, 'message_global.txt', 'сообщение')
+    manager = WorkspaceManager(root)
+    assert manager.resolve(ID_A, 'message_global.txt') is not None
+    assert manager.total_bytes == len('сообщение'.encode('utf-8'))
+
+
+def test_adopt_file_written_by_another_process(root):
+    first = WorkspaceManager(root)
+    second = WorkspaceManager(root)
+    first.write(ID_A, 'result_code.ts', 'x')
+    second.resolve(ID_A, 'result_code.ts')
+    # Второй менеджер уже построил индекс; файл, записанный первым, находится через _adopt
+    first.write(ID_B, 'message_global.txt', 'yy')
+    assert second.resolve(ID_B, 'message_global.txt') == os.path.join(second.root, ID_B, 'message_global.txt')
+    assert second.total_bytes == 3
+
+    # Лог, начатый другим процессом, тоже подхватывается
+    first.open_log(ID_C).append('строка\n')
+    log = second.open_log(ID_C, create=False)
+    assert log is not None and log.read() == 'строка\n'.encode('utf-8')
+
+
+def test_open_log_without_create(root):
+    manager = WorkspaceManager(root)
+    assert manager.open_log(ID_A, create=False) is None
+    manager.write(ID_A, 'result_code.ts', 'x')
+    assert manager.open_log(ID_A, create=False) is None
+    log = manager.open_log(ID_A)
+    assert manager.open_log(ID_A, create=False) is log
+
+
+def test_log_writes_are_accounted(root):
+    manager = WorkspaceManager(root)
+    log = manager.open_log(ID_A)
+    log.append('x' * 9 + '\n')
+    assert manager.total_bytes == 10
+
+
+def test_remove_closes_log(root):
+    manager = WorkspaceManager(root)
+    log = manager.open_log(ID_A)
+    log.append('первая\n')
+    assert manager.remove(ID_A)
+    assert log.closed
+    # Ещё идущая генерация дописывает лог - папка не появляется заново
+    log.append('вторая\n')
+    log.flush()
+    assert not os.path.exists(os.path.join(root, ID_A))
+    assert manager.total_bytes == 0
+    assert not manager.remove(ID_A)
+
+
+def test_usage_hides_ids(root):
+    manager = WorkspaceManager(root)
+    manager.write(ID_A, 'result_code.ts', 'x')
+    usage = manager.usage()
+    assert usage['workspaces'] == 1
+    assert ID_A not in repr(usage)
@@ -0,0 +1,231 @@
+"""
+Модуль инкрементального автосохранения шагов 2 и 3 мастера.
+
+Страница отправляет PATCH /api/wizard с пачкой изменений, версией
+состояния и ревизией структуры примеров, на которых они сделаны:
+    {"version": 7, "structure": 3, "ops": [
+        {"op": "set_cell", "example": 0, "field": "price", "value": "1 990"},
+        {"op": "add_example"},
+        {"op": "remove_example", "example": 2},
+        {"op": "set_search", "field": "query", "value": "дрель"},
+        {"op": "set_links_items", "value": ["https://shop.ru/item-1", "https://shop.ru/item-2"]}
+    ]}
+Изменения применяются к examples_data и search_requests_data в сессии
+либо все, либо ни одно.
+
+Версия меняется при любом изменении, ревизия структуры - когда примеры
+добавляют, удаляют или заменяют целиком (полная отправка шага 2): ячейки
+адресуются номером примера, и после такой смены номер может указывать на
+другой пример. Патч на устаревшей версии всё равно применяется, если в нём
+только значения ячеек и полей поиска, а структура не менялась (последняя
+правка побеждает). Иначе - VersionConflict: страницу нужно обновить.
+"""
+from collections import OrderedDict
+
+# Ключи сессии с версией состояния мастера и ревизией структуры примеров
+VERSION_KEY = 'wizard_version'
+STRUCTURE_KEY = 'wizard_structure'
+
+# Сколько изменений можно прислать одним запросом
+MAX_OPS = 500
+MAX_LINKS_ITEMS = 100
+
+# Поля поискового запроса шага 3, кроме links_items
+SEARCH_FIELDS = ('query', 'url_search_query_page_2', 'count_of_page_on_pagination', 'total_count_of_results')
+
+# Операции, которые можно безопасно повторить на более новой версии
+IDEMPOTENT_OPS = ('set_cell', 'set_search', 'set_links_items')
+# Операции, меняющие номера примеров
+STRUCTURAL_OPS = ('add_example', 'remove_example')
+
+
+class PatchError(ValueError):
+    """Некорректный патч"""
+
+
+class VersionConflict(Exception):
+    """Патч нельзя применить к текущему состоянию; version и structure - текущие"""
+
+    def __init__(self, version, structure):
+        super().__init__(f'Состояние мастера изменилось (текущая версия {version})')
+        self.version = version
+        self.structure = structure
+
+
+def get_version(session):
+    return session.get(VERSION_KEY, 0)
+
+
+def bump_version(session):
+    """Новая версия состояния - вызывается при любой полной перезаписи шагов 2 и 3"""
+    session[VERSION_KEY] = get_version(session) + 1
+    return session[VERSION_KEY]
+
+
+def get_structure(session):
+    return session.get(STRUCTURE_KEY, 0)
+
+
+def bump_structure(session):
+    """Новая ревизия структуры - примеры добавлены, удалены или заменены целиком"""
+    session[STRUCTURE_KEY] = get_structure(session) + 1
+    return session[STRUCTURE_KEY]
+
+
+def empty_example(selected_fields):
+    return OrderedDict((field_key, '') for field_key in selected_fields)
+
+
+def empty_search_request():
+    return OrderedDict([
+        ("query", ""),
+        ("url_search_query_page_2", ""),
+        ("count_of_page_on_pagination", ""),
+        ("total_count_of_results", "0"),
+        ("links_items", []),
+    ])
+
+
+def _index(op, position, count):
+    value = op.get('example')
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value < count:
+        raise PatchError(f'Изменение {position}: нет примера с номером {value!r}')
+    return value
+
+
+def _string(op, position, key='value'):
+    value = op.get(key)
+    if not isinstance(value, str):
+        raise PatchError(f'Изменение {position}: "{key}" должно быть строкой')
+    return value
+
+
+def _validate(ops, example_count, selected_fields):
+    """Проверяет все изменения до применения (с учётом добавления и удаления примеров)"""
+    for position, op in enumerate(ops, 1):
+        if not isinstance(op, dict):
+            raise PatchError(f'Изменение {position}: ожидался объект')
+        kind = op.get('op')
+        if kind == 'set_cell':
+            _index(op, position, example_count)
+            _string(op, position)
+            if op.get('field') not in selected_fields:
+                raise PatchError(f'Изменение {position}: поле {op.get("field")!r} не выбрано на шаге 1')
+        elif kind == 'add_example':
+            example_count += 1
+        elif kind == 'remove_example':
+            _index(op, position, example_count)
+            if example_count == 1:
+                raise PatchError(f'Изменение {position}: нельзя удалить единственный пример')
+            example_count -= 1
+        elif kind == 'set_search':
+            _string(op, position)
+            if op.get('field') not in SEARCH_FIELDS:
+                raise PatchError(f'Изменение {position}: неизвестное поле {op.get("field")!r}')
+        elif kind == 'set_links_items':
+            value = op.get('value')
+            if (not isinstance(value, list) or len(value) > MAX_LINKS_ITEMS
+                    or not all(isinstance(item, str) for item in value)):
+                raise PatchError(f'Изменение {position}: "value" должно быть списком строк '
+                                 f'(не больше {MAX_LINKS_ITEMS})')
+        else:
+            raise PatchError(f'Изменение {position}: неизвестная операция {kind!r}')
+
+
+def apply_patch(session, patch, selected_fields, sanitize):
+    """
+    Применяет патч к состоянию шагов 2 и 3 в сессии.
+
+    Данные меняются на месте: стоимость зависит от количества изменений,
+    а не от количества примеров.
+
+    Args:
+        session: сессия Flask
+        patch: {"version": int, "structure": int, "ops": [...]}
+        selected_fields: поля, выбранные на шаге 1
+        sanitize: функция очистки значений (как при отправке формы)
+
+    Returns:
+        tuple: (новая версия состояния, ревизия структуры)
+
+    Raises:
+        PatchError: некорректный патч (ничего не применено)
+        VersionConflict: патч сделан на другой версии и его нельзя применить поверх
+    """
+    if not isinstance(patch, dict):
+        raise PatchError('Ожидался JSON-объект')
+    version = patch.get('version')
+    structure = patch.get('structure')
+    ops = patch.get('ops')
+    if not isinstance(version, int) or isinstance(version, bool):
+        raise PatchError('Не указана версия состояния')
+    if structure is not None and (not isinstance(structure, int) or isinstance(structure, bool)):
+        raise PatchError('Некорректная ревизия структуры')
+    if not isinstance(ops, list) or not ops:
+        raise PatchError('Нет изменений')
+    if len(ops) > MAX_OPS:
+        raise PatchError(f'Слишком много изменений в одном запросе (максимум {MAX_OPS})')
+    current = get_version(session)
+    current_structure = get_structure(session)
+    kinds = {op.get('op') for op in ops if isinstance(op, dict)}
+    if 'set_cell' in kinds or kinds & set(STRUCTURAL_OPS):
+        # Операции с номерами примеров - только на той структуре, где их сделали
+        if structure is not None and structure != current_structure:
+            raise VersionConflict(current, current_structure)
+    if version != current:
+        # Без структурных операций правки значений можно наложить на более новую версию,
+        # но ячейки - только если известно, что номера примеров не поменялись
+        rebase = kinds <= set(IDEMPOTENT_OPS) and ('set_cell' not in kinds or structure is not None)
+        if not rebase:
+            raise VersionConflict(current, current_structure)
+
+    examples_data = session.get('examples_data')
+    examples = examples_data.get('simple') if isinstance(examples_data, dict) else None
+    _validate(ops, len(examples) if examples else 1, selected_fields)
+
+    structural = any(op['op'] in STRUCTURAL_OPS for op in ops)
+    touches_examples = any(op['op'] in ('set_cell', 'add_example', 'remove_example') for op in ops)
+    touches_search = any(op['op'] in ('set_search', 'set_links_items') for op in ops)
+
+    if touches_examples and not examples:
+        # Шаг 2 ещё не отправлялся - на странице один пустой пример
+        examples = [empty_example(selected_fields)]
+        examples_data = session['examples_data'] = OrderedDict([("simple", examples)])
+    if touches_search:
+        search_requests_data = session.get('search_requests_data')
+        if not isinstance(search_requests_data, dict) or not search_requests_data.get('search_requests'):
+            search_requests_data = session['search_requests_data'] = OrderedDict([
+                ("search_requests", [empty_search_request()])
+            ])
+        search_request = search_requests_data['search_requests'][0]
+
+    for op in ops:
+        kind = op['op']
+        if kind == 'set_cell':
+            example = examples[op['example']]
+            if op['field'] not in example:
+                # Поле выбрано на шаге 1 уже после заполнения примеров
+                for field_key in selected_fields:
+                    example.setdefault(field_key, '')
+            example[op['field']] = sanitize(op['value'])
+        elif kind == 'add_example':
+            examples.append(empty_example(selected_fields))
+        elif kind == 'remove_example':
+            del examples[op['example']]
+        elif kind == 'set_search':
+            search_request[op['field']] = sanitize(op['value'])
+        else:
+            # Как при отправке формы шага 3 - только непустые ссылки
+            search_request['links_items'] = [value for value in map(sanitize, op['value']) if value]
+
+    # Вложенные изменения сессия сама не замечает - присваиваем ключи заново,
+    # чтобы они попали в изменённые (см. FileSession.changed_keys)
+    if touches_examples:
+        session['examples_data'] = examples_data
+    if touches_search:
+        session['search_requests_data'] = search_requests_data
+    # Итоговый JSON шага 4 собирается заново из данных шагов 2 и 3
+    session.pop('result_json', None)
+    if structural:
+        bump_structure(session)
+    return bump_version(session), get_structure(session)
@@ -0,0 +1,349 @@
+"""
+Модуль рабочих папок (workspaces) для артефактов генерации.
+
+Каждая сессия мастера получает свою папку content_files/workspaces/<id>/
+с result_code.ts, message_global.txt и сегментированным логом генерации
+в подпапке log/ (см. segmented_log.py). Менеджер держит индекс
+папок и файлов в памяти, поэтому маршруты /api/* и /download/* находят
+файл за O(1), без обхода каталогов. Фоновый поток удаляет папки с истёкшим
+TTL и самые давно использованные папки, если превышена общая квота на диск.
+
+Индекс строится при первом обращении, а не при импорте. Несколько процессов
+(gunicorn -w N) работают с одной корневой папкой: промах индекса проверяется
+на диске, обращение к папке отмечается её mtime, а перед очисткой индекс
+сверяется с диском - папки, которыми пользуется другой процесс, не удаляются.
+"""
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from segmented_log import SegmentedLog
+
+# Какие файлы можно хранить в рабочей папке
+ARTIFACT_NAMES = ('result_code.ts', 'message_global.txt')
+# Подпапка сегментированного лога генерации
+LOG_DIR = 'log'
+# Как часто (секунд) обращение к папке отмечается на диске (mtime папки)
+TOUCH_INTERVAL = 60
+
+
+class Workspace:
+    """Рабочая папка: файлы и их размеры, лог, время последнего обращения"""
+
+    __slots__ = ('id', 'path', 'files', 'size', 'last_access', 'touched_on_disk', 'log')
+
+    def __init__(self, workspace_id, path, last_access=None):
+        self.id = workspace_id
+        self.path = path
+        self.files = {}
+        self.size = 0
+        self.last_access = time.time() if last_access is None else last_access
+        self.touched_on_disk = 0.0
+        self.log = None
+
+
+def _scan_workspace(path):
+    """
+    Файлы рабочей папки на диске.
+
+    Returns:
+        tuple: ({имя файла: размер}, общий размер с логом, время последнего изменения)
+    """
+    files = {}
+    size = 0
+    last_access = os.stat(path).st_mtime
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name in ARTIFACT_NAMES:
+                stat = entry.stat()
+                files[entry.name] = stat.st_size
+                size += stat.st_size
+                last_access = max(last_access, stat.st_mtime)
+            elif entry.is_dir() and entry.name == LOG_DIR:
+                with os.scandir(entry.path) as log_files:
+                    for log_file in log_files:
+                        stat = log_file.stat()
+                        size += stat.st_size
+                        last_access = max(last_access, stat.st_mtime)
+    return files, size, last_access
+
+
+class WorkspaceManager:
+    """
+    Индекс рабочих папок с квотой и вытеснением.
+
+    Args:
+        root: корневая папка (content_files/workspaces)
+        quota_bytes: суммарный объём всех рабочих папок
+        ttl_seconds: через сколько секунд без обращений папка удаляется
+        sweep_interval: период фоновой очистки (поток запускается при первом
+            обращении к менеджеру); None - только явные sweep()/start_sweeper()
+    """
+
+    def __init__(self, root, quota_bytes=512 * 1024 * 1024, ttl_seconds=7 * 24 * 3600, sweep_interval=None):
+        # Абсолютный путь: send_file считает относительные пути от папки приложения
+        self.root = os.path.abspath(root)
+        self.quota_bytes = quota_bytes
+        self.ttl_seconds = ttl_seconds
+        self.total_bytes = 0
+        self.evicted = 0
+        # Порядок - от давно использованных к недавним (LRU)
+        self._workspaces = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper = None
+        self._stop = threading.Event()
+        self.sweep_interval = sweep_interval
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        """Первое обращение: индекс по папкам на диске и фоновая очистка"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            os.makedirs(self.root, exist_ok=True)
+            self._rescan()
+            self._loaded = True
+            if self.sweep_interval:
+                self.start_sweeper(self.sweep_interval)
+
+    def _rescan(self):
+        """
+        Сверяет индекс с диском: папки, созданные другими процессами, размеры
+        и время последнего обращения (mtime), папки, удалённые другим процессом.
+        """
+        found = {}
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_dir() and _is_valid_id(entry.name):
+                    try:
+                        found[entry.name] = (entry.path, _scan_workspace(entry.path))
+                    except OSError:
+                        # Папку удалили во время обхода
+                        pass
+
+        with self._lock:
+            for workspace_id, workspace in list(self._workspaces.items()):
+                # Пустые папки из индекса ещё не успели появиться на диске - их не трогаем
+                if workspace_id not in found and (workspace.files or workspace.size):
+                    del self._workspaces[workspace_id]
+            for workspace_id, (path, (files, size, last_access)) in found.items():
+                workspace = self._workspaces.get(workspace_id)
+                if workspace is None:
+                    workspace = self._workspaces[workspace_id] = Workspace(workspace_id, path, last_access)
+                workspace.files = files
+                workspace.size = size
+                workspace.last_access = max(workspace.last_access, last_access)
+            self._workspaces = OrderedDict(sorted(self._workspaces.items(), key=lambda item: item[1].last_access))
+            self.total_bytes = sum(workspace.size for workspace in self._workspaces.values())
+
+    def _adopt(self, workspace_id):
+        """Добавляет в индекс папку, записанную другим процессом; None, если её нет на диске"""
+        path = os.path.join(self.root, workspace_id)
+        try:
+            files, size, last_access = _scan_workspace(path)
+        except OSError:
+            return None
+        with self._lock:
+            workspace = self._workspaces.get(workspace_id)
+            if workspace is None:
+                workspace = self._workspaces[workspace_id] = Workspace(workspace_id, path, last_access)
+            self.total_bytes += size - workspace.size
+            workspace.files = files
+            workspace.size = size
+            self._touch(workspace)
+            return workspace
+
+    @staticmethod
+    def new_id():
+        return uuid.uuid4().hex
+
+    def _touch(self, workspace):
+        now = time.time()
+        workspace.last_access = now
+        self._workspaces.move_to_end(workspace.id)
+        if now - workspace.touched_on_disk > TOUCH_INTERVAL:
+            # Обращение видно очистке других процессов
+            workspace.touched_on_disk = now
+            try:
+                os.utime(workspace.path)
+            except OSError:
+                pass
+
+    def resolve(self, workspace_id, name):
+        """
+        Путь к файлу рабочей папки или None.
+        Найденный в индексе файл отдаётся без обращения к диску; промах
+        проверяется на диске - файл мог записать другой процесс.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            workspace = self._workspaces.get(workspace_id)
+            if workspace is not None and name in workspace.files:
+                self._touch(workspace)
+                return os.path.join(workspace.path, name)
+        if not _is_valid_id(workspace_id) or name not in ARTIFACT_NAMES:
+            return None
+        if not os.path.isfile(os.path.join(self.root, workspace_id, name)):
+            return None
+        workspace = self._adopt(workspace_id)
+        if workspace is None or name not in workspace.files:
+            return None
+        return os.path.join(workspace.path, name)
+
+    def write(self, workspace_id, name, data):
+        """
+        Атомарно записывает файл в рабочую папку (создаёт папку при необходимости).
+
+        Raises:
+            ValueError: некорректный идентификатор папки или имя файла
+        """
+        if not _is_valid_id(workspace_id):
+            raise ValueError(f'Некорректный идентификатор рабочей папки: {workspace_id!r}')
+        if name not in ARTIFACT_NAMES:
+            raise ValueError(f'Недопустимое имя файла: {name!r}')
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        self._ensure_loaded()
+        path = os.path.join(self.root, workspace_id)
+        os.makedirs(path, exist_ok=True)
+        tmp_path = os.path.join(path, f'.{name}.{uuid.uuid4().hex}.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(path, name))
+
+        with self._lock:
+            workspace = self._workspaces.get(workspace_id)
+            if workspace is None:
+                workspace = self._workspaces[workspace_id] = Workspace(workspace_id, path)
+            previous = workspace.files.get(name, 0)
+            workspace.files[name] = len(data)
+            workspace.size += len(data) - previous
+            self.total_bytes += len(data) - previous
+            self._touch(workspace)
+        return os.path.join(path, name)
+
+    def open_log(self, workspace_id, create=True):
+        """
+        Сегментированный лог рабочей папки (один объект на папку).
+        create=False - None, если папки или лога ещё нет.
+
+        Raises:
+            ValueError: некорректный идентификатор папки
+        """
+        if not _is_valid_id(workspace_id):
+            raise ValueError(f'Некорректный идентификатор рабочей папки: {workspace_id!r}')
+        self._ensure_loaded()
+        if not create and workspace_id not in self._workspaces:
+            # Лог мог начать писать другой процесс
+            self._adopt(workspace_id)
+        with self._lock:
+            workspace = self._workspaces.get(workspace_id)
+            if workspace is None:
+                if not create:
+                    return None
+                path = os.path.join(self.root, workspace_id)
+                workspace = self._workspaces[workspace_id] = Workspace(workspace_id, path)
+            self._touch(workspace)
+            if workspace.log is None:
+                log_path = os.path.join(workspace.path, LOG_DIR)
+                if not create and not os.path.isdir(log_path):
+                    return None
+                workspace.log = SegmentedLog(log_path, on_write=lambda size: self._account(workspace, size))
+            return workspace.log
+
+    def _account(self, workspace, size):
+        """Учитывает байты, дописанные в лог рабочей папки"""
+        with self._lock:
+            if self._workspaces.get(workspace.id) is not workspace:
+                # Папку уже вытеснили
+                return
+            workspace.size += size
+            self.total_bytes += size
+            self._touch(workspace)
+
+    def remove(self, workspace_id):
+        self._ensure_loaded()
+        with self._lock:
+            workspace = self._workspaces.pop(workspace_id, None)
+            if workspace is None:
+                return False
+            self.total_bytes -= workspace.size
+        if workspace.log is not None:
+            # Ещё идущая генерация больше не дописывает лог и не создаёт папку заново
+            workspace.log.close()
+        shutil.rmtree(workspace.path, ignore_errors=True)
+        return True
+
+    def sweep(self, now=None):
+        """
+        Удаляет папки с истёкшим TTL, затем самые давно использованные,
+        пока суммарный объём превышает квоту. Перед этим индекс сверяется
+        с диском, чтобы учесть записи и обращения других процессов.
+
+        Returns:
+            int: сколько папок удалено
+        """
+        self._ensure_loaded()
+        self._rescan()
+        now = time.time() if now is None else now
+        victims = []
+        with self._lock:
+            total = self.total_bytes
+            for workspace in self._workspaces.values():
+                expired = now - workspace.last_access > self.ttl_seconds
+                if not expired and total <= self.quota_bytes:
+                    # Дальше идут только более свежие папки, а квота уже соблюдена
+                    break
+                victims.append(workspace.id)
+                total -= workspace.size
+
+        removed = sum(1 for workspace_id in victims if self.remove(workspace_id))
+        self.evicted += removed
+        return removed
+
+    def start_sweeper(self, interval=60.0):
+        """Запускает фоновую очистку раз в interval секунд"""
+        if self._sweeper is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep()
+                except OSError as e:
+                    print(f'Ошибка очистки рабочих папок: {e}')
+
+        self._sweeper = threading.Thread(target=loop, name='workspaces-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+    def usage(self, top=10):
+        """
+        Статистика использования диска. Идентификаторов папок в ней нет:
+        по идентификатору можно скачать чужие артефакты.
+        """
+        self._ensure_loaded()
+        with self._lock:
+            largest = sorted(self._workspaces.values(), key=lambda w: w.size, reverse=True)[:top]
+            return {
+                'total_bytes': self.total_bytes,
+                'quota_bytes': self.quota_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                'workspaces': len(self._workspaces),
+                'evicted': self.evicted,
+                'largest': [{'bytes': w.size, 'files': len(w.files),
+                             'last_access': int(w.last_access)} for w in largest],
+            }
+
+
+def _is_valid_id(workspace_id):
+    return isinstance(workspace_id, str) and len(workspace_id) == 32 and all(c in '0123456789abcdef' for c in workspace_id)